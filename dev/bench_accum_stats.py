@@ -0,0 +1,105 @@
+"""
+Benchmark the vectorized stats accumulation used by the compact
+DirectoryWalker backend against the pure-Python leaf-to-root dictionary merge
+used by the networkx backend on the same synthetic tree.
+
+CommandLine:
+    python ~/code/xdev/dev/bench_accum_stats.py
+    python ~/code/xdev/dev/bench_accum_stats.py --num_nodes=100000
+"""
+import random
+import scriptconfig as scfg
+import ubelt as ub
+import networkx as nx
+
+
+class BenchAccumStatsConfig(scfg.DataConfig):
+    num_nodes = scfg.Value(1_000_000, help='number of nodes in the synthetic tree')
+    num_exts = scfg.Value(30, help='number of distinct file extensions')
+    dir_frac = scfg.Value(0.1, help='fraction of nodes that are directories')
+    max_depth = scfg.Value(12, help='maximum depth of the tree')
+    seed = scfg.Value(0)
+
+
+def build_synthetic_trees(config):
+    """
+    Generate a random tree in depth-first preorder and store it both as a
+    networkx DirectoryWalker and as a :class:`CompactTree`.
+    """
+    from xdev.directory_walker import DirectoryWalker, CompactTree
+    rng = random.Random(config.seed)
+    exts = ['ext{}'.format(i) for i in range(config.num_exts)]
+
+    root = ub.Path('/synthetic')
+    g = nx.DiGraph()
+    g.add_node(root, type='dir', name=root.name)
+    tree = CompactTree(root)
+    tree.add_node(-1, root.name, is_dir=True)
+    file_lines = []
+
+    # The stack of open directories as (index, path)
+    stack = [(0, root)]
+    for idx in range(1, config.num_nodes):
+        stack = stack[:rng.randint(1, len(stack))]
+        parent_idx, parent = stack[-1]
+        if rng.random() < config.dir_frac and len(stack) < config.max_depth:
+            name = 'dir{}'.format(idx)
+            node = parent / name
+            g.add_node(node, type='dir', name=name)
+            tree.add_node(parent_idx, name, is_dir=True)
+            stack.append((idx, node))
+        else:
+            ext = rng.choice(exts)
+            name = 'file{}.{}'.format(idx, ext)
+            node = parent / name
+            size = rng.randint(0, 1 << 20)
+            stats = {ext + '.size': size, ext + '.files': 1}
+            if rng.random() < 0.5:
+                stats[ext + '.total_lines'] = rng.randint(0, 5000)
+                file_lines.append((idx, stats))
+            g.add_node(node, type='file', name=name, stats=stats)
+            tree.add_node(parent_idx, name, size=size)
+        g.add_edge(parent, node)
+
+    tree.finalize()
+    for idx, stats in file_lines:
+        tree.set_file_stats(idx, stats)
+
+    walker = DirectoryWalker(root, show_progress=False)
+    walker.graph = g
+    walker._topo_order = list(nx.topological_sort(g))
+    return walker, tree
+
+
+def main():
+    import numpy as np
+    config = BenchAccumStatsConfig.cli(strict=True)
+    print('config = {}'.format(ub.urepr(config, nl=1)))
+
+    with ub.Timer('build synthetic trees', verbose=1):
+        walker, tree = build_synthetic_trees(config)
+
+    with ub.Timer('networkx _accum_stats') as ref_timer:
+        walker._accum_stats()
+
+    with ub.Timer('compact accumulate_stats') as new_timer:
+        tree.accumulate_stats()
+
+    # The trees are in the same preorder, so the dictionaries must agree
+    # including their key order.
+    dir_nodes = [n for n in nx.dfs_preorder_nodes(walker.graph)
+                 if walker.graph.nodes[n]['type'] == 'dir']
+    dir_idxs = np.nonzero(tree.is_dir)[0].tolist()
+    assert len(dir_nodes) == len(dir_idxs)
+    for node, idx in zip(dir_nodes, dir_idxs):
+        ref = walker.graph.nodes[node]['stats']
+        got = tree.node_stats(idx)
+        assert list(ref.items()) == list(got.items()), node
+
+    print('reference  = {:.3f}s'.format(ref_timer.elapsed))
+    print('vectorized = {:.3f}s'.format(new_timer.elapsed))
+    print('speedup    = {:.2f}x'.format(ref_timer.elapsed / new_timer.elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark the single pass :func:`count_python_lines` classifier against the
+previous content parsing in ``parse_file_stats``, which stripped comments and
+docstrings with ``tokenize`` and then parsed docstrings with xdoctest.
+
+CommandLine:
+    python ~/code/xdev/dev/bench_line_counts.py
+    python ~/code/xdev/dev/bench_line_counts.py --num_files=2000 --lines_per_file=500
+"""
+import random
+import scriptconfig as scfg
+import ubelt as ub
+
+
+class BenchLineCountsConfig(scfg.DataConfig):
+    dpath = scfg.Value(None, help='source tree to benchmark on. Defaults to the xdev package')
+    num_files = scfg.Value(500, help='number of files in the synthetic corpus')
+    lines_per_file = scfg.Value(1000, help='approximate lines per synthetic file')
+    seed = scfg.Value(0)
+
+
+def previous_counts(text):
+    """
+    The content analysis parse_file_stats did before count_python_lines
+    """
+    from xdev.directory_walker import strip_comments_and_newlines
+    from xdoctest.static_analysis import TopLevelVisitor
+    stats = {}
+    try:
+        stats['code_lines'] = strip_comments_and_newlines(text).count('\n')
+    except Exception:
+        ...
+    try:
+        calldefs = TopLevelVisitor.parse(text).calldefs
+        stats['doc_lines'] = sum(
+            v.docstr.count('\n') for v in calldefs.values()
+            if v.docstr is not None)
+    except Exception:
+        ...
+    return stats
+
+
+def synthetic_source(rng, num_lines):
+    ddd = chr(34) * 3
+    parts = [ddd, 'Synthetic module', ddd, 'import os', '']
+    idx = 0
+    while len(parts) < num_lines:
+        idx += 1
+        parts.append('')
+        parts.append('# A comment about func{}'.format(idx))
+        parts.append('def func{}(a, b=1):'.format(idx))
+        parts.append('    ' + ddd)
+        parts.extend('    Documentation line {}'.format(i)
+                     for i in range(rng.randint(1, 6)))
+        parts.append('    ' + ddd)
+        for i in range(rng.randint(2, 12)):
+            choice = rng.random()
+            if choice < 0.2:
+                parts.append('    # step {}'.format(i))
+            elif choice < 0.3:
+                parts.append('')
+            else:
+                parts.append('    a = os.path.join(str(a), "x{}")  # note'.format(i))
+        parts.append('    return a')
+    return '\n'.join(parts) + '\n'
+
+
+def bench(name, texts):
+    from xdev.directory_walker import count_python_lines
+    num_lines = sum(t.count('\n') for t in texts)
+    print('{}: {} files, {} lines'.format(name, len(texts), num_lines))
+    with ub.Timer() as prev_timer:
+        for text in texts:
+            previous_counts(text)
+    with ub.Timer() as new_timer:
+        for text in texts:
+            count_python_lines(text)
+    print('    previous = {:.3f}s'.format(prev_timer.elapsed))
+    print('    new      = {:.3f}s'.format(new_timer.elapsed))
+    print('    speedup  = {:.2f}x'.format(prev_timer.elapsed / new_timer.elapsed))
+
+
+def main():
+    config = BenchLineCountsConfig.cli(strict=True)
+    print('config = {}'.format(ub.urepr(config, nl=1)))
+    dpath = config.dpath
+    if dpath is None:
+        dpath = ub.Path(ub.modname_to_modpath('xdev'))
+    texts = [p.read_text() for p in sorted(ub.Path(dpath).glob('**/*.py'))]
+    bench('source tree', texts)
+
+    rng = random.Random(config.seed)
+    texts = [synthetic_source(rng, config.lines_per_file)
+             for _ in range(config.num_files)]
+    bench('synthetic corpus', texts)
+
+
+if __name__ == '__main__':
+    main()
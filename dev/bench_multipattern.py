@@ -0,0 +1,91 @@
+"""
+Benchmark the compiled matcher of :class:`MultiPattern` and its batch version
+:func:`MultiPattern.match_many` against matching each of its patterns one at a
+time with :func:`fnmatch.fnmatch` for every glob, which is what
+:func:`MultiPattern.match` previously did.
+
+CommandLine:
+    python ~/code/xdev/dev/bench_multipattern.py
+    python ~/code/xdev/dev/bench_multipattern.py --num_names=100000 --num_globs=60
+"""
+import fnmatch
+import random
+import scriptconfig as scfg
+import ubelt as ub
+
+
+class BenchMultiPatternConfig(scfg.DataConfig):
+    num_names = scfg.Value(20000, help='number of names to match')
+    num_globs = scfg.Value(30, help='number of extra synthetic exclude globs')
+    seed = scfg.Value(0)
+
+
+def synthetic_names(rng, num):
+    stems = ['setup', 'main', 'util_path', '__init__', 'README', 'conf',
+             'test_patterns', '__pycache__', '_static', 'build', 'data']
+    exts = ['', '.py', '.pyc', '.pyi', '.txt', '.rst', '.json', '.so', '.c']
+    names = []
+    for _ in range(num):
+        name = rng.choice(stems) + rng.choice(exts)
+        if rng.random() < 0.2:
+            name = '.' + name
+        names.append(name)
+    return names
+
+
+def exclude_patterns(rng, num_globs):
+    """
+    The DirectoryStatsCLI --python excludes, and extra globs of the same form
+    """
+    patterns = ['.*', '*.pyc', '*.pyi', '__pycache__', '_static', '_modules',
+                'htmlcov']
+    for idx in range(num_globs):
+        choice = rng.random()
+        if choice < 0.5:
+            patterns.append('*.ext{}'.format(idx))
+        elif choice < 0.8:
+            patterns.append('name{}'.format(idx))
+        else:
+            patterns.append('prefix{}_*'.format(idx))
+    return patterns
+
+
+def previous_match(mpat, name):
+    """
+    The matching MultiPattern did before it compiled its patterns
+    """
+    return any(
+        fnmatch.fnmatch(name, p.pattern) if p.backend == 'glob' else p.match(name)
+        for p in mpat.patterns)
+
+
+def bench(name, mpat, names):
+    with ub.Timer() as prev_timer:
+        prev = [previous_match(mpat, n) for n in names]
+    with ub.Timer() as new_timer:
+        new = [mpat.match(n) for n in names]
+    with ub.Timer() as batch_timer:
+        batch = mpat.match_many(names)
+    assert list(map(bool, prev)) == new == batch
+    print('{}: {} patterns, {} names'.format(name, len(mpat.patterns), len(names)))
+    print('    previous = {:.1f}ns / name'.format(1e9 * prev_timer.elapsed / len(names)))
+    print('    new      = {:.1f}ns / name'.format(1e9 * new_timer.elapsed / len(names)))
+    print('    batch    = {:.1f}ns / name'.format(1e9 * batch_timer.elapsed / len(names)))
+    print('    speedup  = {:.2f}x'.format(prev_timer.elapsed / new_timer.elapsed))
+    print('    batch speedup = {:.2f}x'.format(prev_timer.elapsed / batch_timer.elapsed))
+
+
+def main():
+    from xdev.patterns import MultiPattern
+    config = BenchMultiPatternConfig.cli(strict=True)
+    print('config = {}'.format(ub.urepr(config, nl=1)))
+    rng = random.Random(config.seed)
+    names = synthetic_names(rng, config.num_names)
+    patterns = exclude_patterns(rng, 0)
+    bench('python excludes', MultiPattern.coerce(patterns), names)
+    patterns = exclude_patterns(rng, config.num_globs)
+    bench('python excludes + synthetic', MultiPattern.coerce(patterns), names)
+
+
+if __name__ == '__main__':
+    main()
@@ -116,10 +116,12 @@ __getattr__ = lazy_import(
         'search_replace',
         'tracebacks',
         'util',
+        'util_gitignore',
         'util_networkx',
         'util_path',
         'util_random',
         'util_time',
+        'util_trigram',
     },
     submod_attrs={
         'algo': [
@@ -182,8 +184,16 @@ __getattr__ = lazy_import(
             'view_directory',
         ],
         'directory_walker': [
+            'CONTENT_ANALYZERS',
+            'CompactTree',
+            'ContentAnalyzerRegistry',
             'DirectoryWalker',
+            'FileStatsCache',
             'byte_str',
+            'count_c_like_lines',
+            'count_markdown_lines',
+            'count_python_lines',
+            'find_duplicate_files',
             'parse_file_stats',
             'strip_comments_and_newlines',
             'strip_docstrings',
@@ -245,10 +255,14 @@ __getattr__ = lazy_import(
         ],
         'search_replace': [
             'GrepResult',
+            'SedResult',
+            'afind',
+            'apply_sed_results',
             'find',
             'grep',
             'grepfile',
             'greptext',
+            'iter_grep',
             'sed',
             'sedfile',
         ],
@@ -260,6 +274,10 @@ __getattr__ = lazy_import(
             'conj_phrase',
             'take_column',
         ],
+        'util_gitignore': [
+            'GitignoreMatcher',
+            'compile_gitignore',
+        ],
         'util_networkx': [
             'AsciiDirectedGlyphs',
             'AsciiUndirectedGlyphs',
@@ -289,6 +307,11 @@ __getattr__ = lazy_import(
             'isoformat',
             'timedelta',
         ],
+        'util_trigram': [
+            'TrigramIndex',
+            'file_trigrams',
+            'trigram_query',
+        ],
     },
 )
 
@@ -297,31 +320,39 @@ def __dir__():
     return __all__
 
 __all__ = ['AsciiDirectedGlyphs', 'AsciiUndirectedGlyphs',
-           'AvailablePackageConfig', 'ChDir', 'DOUBLE_QUOTE',
+           'AvailablePackageConfig', 'CONTENT_ANALYZERS', 'ChDir', 'CompactTree',
+           'ContentAnalyzerRegistry', 'DOUBLE_QUOTE',
            'DirectoryStatsCLI', 'DirectoryWalker', 'EmbedOnException',
-           'ExtendedStubGenerator', 'GrepResult', 'IS_PROFILING',
+           'ExtendedStubGenerator', 'FileStatsCache', 'GitignoreMatcher',
+           'GrepResult', 'IS_PROFILING',
            'InteractiveIter', 'MultiPattern', 'Pattern', 'PatternBase',
            'PythonRegexBuilder', 'PythonVersions', 'RE_Pattern',
-           'RegexBuilder', 'ReqPythonVersionSpec', 'SINGLE_QUOTE', 'Stub',
+           'RegexBuilder', 'ReqPythonVersionSpec', 'SINGLE_QUOTE', 'SedResult',
+           'Stub',
            'TRIPLE_DOUBLE_QUOTE', 'TRIPLE_SINGLE_QUOTE', 'TimeTypeError',
+           'TrigramIndex',
            'TimeValueError', 'UtfDirectedGlyphs', 'UtfUndirectedGlyphs',
-           'VimRegexBuilder', 'XdevCLI', 'algo', 'autojit',
+           'VimRegexBuilder', 'XdevCLI', 'afind', 'algo', 'apply_sed_results',
+           'autojit',
            'available_package_versions', 'bubbletext', 'build_package_table',
            'byte_str', 'class_reloader', 'cli', 'coerce_datetime',
            'coerce_timedelta', 'coerce_timezone', 'common_module_aliases',
-           'common_module_names', 'common_unreferenced', 'conj_phrase',
-           'cp_sorter', 'datetime', 'delete_unpaired_pyi_files', 'demo',
+           'common_module_names', 'common_unreferenced', 'compile_gitignore',
+           'conj_phrase',
+           'count_c_like_lines', 'count_markdown_lines',
+           'count_python_lines', 'cp_sorter', 'datetime', 'delete_unpaired_pyi_files', 'demo',
            'desktop_interaction', 'difftext', 'directory_walker', 'dirstats',
            'distext', 'docstr_stubgen', 'edit_distance', 'editfile', 'embed',
            'embed_if_requested', 'embed_on_exception',
            'embed_on_exception_context', 'embeding', 'ensure_rng',
-           'ensure_timezone', 'find', 'fix_embed_globals', 'format_quotes',
+           'ensure_timezone', 'file_trigrams', 'find', 'find_duplicate_files',
+           'fix_embed_globals', 'format_quotes',
            'format_quotes_in_file', 'format_quotes_in_text',
            'format_timedelta', 'generate_network_text', 'generate_typed_stubs',
            'get_func_kwargs', 'get_stack_frame', 'grab_pypi_items',
            'graph_str', 'grep', 'grepfile', 'greptext', 'hacked_typing_info',
            'import_module_from_pyx', 'interactive_iter', 'introspect',
-           'isoformat', 'iter_object_tree', 'knapsack', 'knapsack_greedy',
+           'isoformat', 'iter_grep', 'iter_object_tree', 'knapsack', 'knapsack_greedy',
            'knapsack_ilp', 'knapsack_iterative', 'knapsack_iterative_int',
            'knapsack_iterative_numpy', 'load_snapshot', 'main',
            'make_warnings_print_tracebacks', 'minimum_cross_python_versions',
@@ -335,6 +366,7 @@ __all__ = ['AsciiDirectedGlyphs', 'AsciiUndirectedGlyphs',
            'strip_comments_and_newlines', 'strip_docstrings',
            'summarize_package_availability', 'take_column',
            'test_object_pickleability', 'textfind', 'timedelta', 'tracebacks',
-           'tree', 'tree_repr', 'util', 'util_networkx', 'util_path',
-           'util_random', 'util_time', 'vectorize', 'view_directory',
+           'tree', 'tree_repr', 'trigram_query', 'util', 'util_gitignore',
+           'util_networkx', 'util_path', 'util_random', 'util_time',
+           'util_trigram', 'vectorize', 'view_directory',
            'write_network_text']
@@ -17,7 +17,7 @@ class DirectoryStatsCLI(scfg.DataConfig):
     """
     __command__ = 'dirstats'
 
-    dpath = scfg.Value('.', type=str, help='path to the git repo. If prefixed with ``module:``, then treated as a python module', position=1)
+    dpath = scfg.Value('.', type=str, help='path to the git repo. If prefixed with ``module:``, then treated as a python module. Multiple paths are walked into one tree.', position=1, nargs='+')
 
     exclude_dnames = scfg.Value(None, help='A coercable multi-pattern. If "py:auto" chooses sensible defaults for a Python dev.', nargs='+', alias=['block_dnames'])
 
@@ -30,6 +30,25 @@ class DirectoryStatsCLI(scfg.DataConfig):
     max_files = scfg.Value(None)
     # parse_meta_stats = scfg.Value(True, isflag=True, help='if True parse stats about the content of each file')
 
+    workers = scfg.Value(0, type=int, short_alias=['j'], help='number of parallel workers used to parse file stats. If 0, run serially.')
+    walk_workers = scfg.Value(0, type=int, help='number of threads used to list directories. Useful for multiple roots or high latency filesystems. If 0, run serially.')
+    respect_gitignore = scfg.Value(False, isflag=True, help='if True, skip paths ignored by .gitignore files')
+    mode = scfg.Value('process', choices=['serial', 'thread', 'process'], help='parallel backend used when workers > 0')
+
+    cache = scfg.Value(True, isflag=True, help='if True, reuse content stats from previous runs for files that have not changed. Use --no-cache to disable.')
+    refresh = scfg.Value(False, isflag=True, help='if True, recompute and overwrite any existing cached content stats')
+
+    output = scfg.Value(None, help='if specified, write a row for every file and directory to this .jsonl, .parquet, or .sqlite file while walking instead of printing a report')
+
+    compare_to = scfg.Value(None, help='a snapshot written with --output, or another directory. If specified, print the files that were added, removed, or resized relative to it instead of a report')
+
+    duplicates = scfg.Value(False, isflag=True, help='if True, report groups of files with identical content and how many bytes could be reclaimed')
+
+    backend = scfg.Value('networkx', choices=['networkx', 'compact'], help='The internal tree representation. The compact backend uses much less memory on large trees.')
+
+    budget = scfg.Value(None, help='if specified, stop walking after this much time (e.g. 10s, 2m) and estimate the totals of unexplored directories by sampling. Estimates are marked with a "~".')
+    max_nodes = scfg.Value(None, help='if specified, stop walking after this many nodes (e.g. 1e6) and estimate the totals of unexplored directories by sampling.')
+
     max_walk_depth = scfg.Value(None, short_alias=['L'], help='maximum depth to walk')
     max_display_depth = scfg.Value(None, short_alias=['D'], help='maximum depth to display')
 
@@ -40,8 +59,13 @@ class DirectoryStatsCLI(scfg.DataConfig):
     ignore_dotprefix = scfg.Value(True, isflag=True, help='if True ignore directories and folders with a dot prefix')
 
     def __post_init__(config):
-        if config.dpath.startswith('module:'):
-            config.dpath = ub.modname_to_modpath(config.dpath.split('module:', 1)[1])
+        dpaths = [config.dpath] if isinstance(config.dpath, str) else list(config.dpath)
+        dpaths = [
+            ub.modname_to_modpath(p.split('module:', 1)[1])
+            if p.startswith('module:') else p
+            for p in dpaths
+        ]
+        config.dpath = dpaths[0] if len(dpaths) == 1 else dpaths
 
         if config.exclude_fnames is None:
             config.exclude_fnames = []
@@ -93,12 +117,25 @@ def main(cmdline=1, **kwargs):
     from xdev.directory_walker import DirectoryWalker  # NOQA
     kwargs = ub.udict(config) & {
         'dpath', 'exclude_dnames', 'exclude_fnames', 'include_dnames',
-        'include_fnames', 'max_walk_depth', 'parse_content', 'max_files'
+        'include_fnames', 'max_walk_depth', 'parse_content', 'max_files',
+        'workers', 'mode', 'cache', 'backend', 'budget', 'max_nodes',
+        'walk_workers', 'respect_gitignore',
     }
+    kwargs['refresh_cache'] = config['refresh']
     self = DirectoryWalker(**kwargs)
+    if config.compare_to is not None:
+        self.write_diff(config.compare_to, max_depth=config.max_display_depth)
+        return
+    if config.output is not None:
+        num = self.export(config.output)
+        print(f'Wrote {num} rows to {config.output}')
+        return
     self.build()
     nxtxt_kwargs = {'max_depth': config['max_display_depth']}
     self.write_report(**nxtxt_kwargs)
+    if config.duplicates:
+        print('')
+        self.write_duplicate_report()
 
 
 if __name__ == '__main__':
@@ -109,6 +109,15 @@ class XdevCLI(ModalCLI):
                 'Any directory matching this pattern will be removed from '
                 'traveral.')),
             'recursive': scfg.Value(True),
+            'respect_gitignore': scfg.Value(False, isflag=True, help=(
+                'if True, skip paths ignored by .gitignore files')),
+            'max_workers': scfg.Value(0, type=int, short_alias=['j'], help=(
+                'number of parallel workers used to compute replacements. '
+                'If 0, run serially.')),
+            'mode': scfg.Value('thread', choices=['serial', 'thread', 'process'], help=(
+                'parallel backend used when max_workers > 0')),
+            'all_or_nothing': scfg.Value(False, isflag=True, help=(
+                'if True, restore all files if writing any of them fails')),
             'verbose': scfg.Value(2),
         }
 
@@ -123,14 +132,64 @@ class XdevCLI(ModalCLI):
             if config['dry'] in {'ask', 'auto'}:
                 from rich.prompt import Confirm
                 config['dry'] = True
-                search_replace.sed(**config)
+                results = search_replace.sed(**config)
+                if not results:
+                    return
                 flag = Confirm.ask('Do you want to execute this sed?')
                 if flag:
-                    config['dry'] = False
-                    search_replace.sed(**config)
+                    # Write the replacements that were shown instead of
+                    # searching the files again.
+                    search_replace.apply_sed_results(
+                        results, all_or_nothing=config['all_or_nothing'],
+                        verbose=config['verbose'])
             else:
                 search_replace.sed(**config)
 
+    class GrepCLI(scfg.DataConfig):
+        """
+        Search for a pattern in files
+
+        Example
+        -------
+        xdev grep "def main" --include="*.py" --max_workers=8
+
+        xdev grep "def main" --index
+        """
+        __command__ = 'grep'
+        __default__ = {
+            'regexpr': scfg.Value('', position=1, help='The pattern to search for.'),
+            'dpath': scfg.Value(None, position=2, help='the path to search. Defaults to cwd', alias=['path']),
+            'include': scfg.Value(None, help='If specified, only consider results with matching basenames'),
+            'exclude': scfg.Value(None, help='If specified, do not consider results with matching basenames'),
+            'dirblocklist': scfg.Value(None, help=(
+                'Any directory matching this pattern will be removed from '
+                'traveral.')),
+            'recursive': scfg.Value(True),
+            'respect_gitignore': scfg.Value(False, isflag=True, help=(
+                'if True, skip paths ignored by .gitignore files')),
+            'max_workers': scfg.Value(0, type=int, short_alias=['j'], help=(
+                'number of parallel workers used to search files. '
+                'If 0, search serially.')),
+            'mode': scfg.Value('thread', choices=['serial', 'thread', 'process'], help=(
+                'parallel backend used when max_workers > 0')),
+            'prefetch': scfg.Value(0, type=int, help=(
+                'number of directories to list ahead in a thread pool, which '
+                'helps on slow filesystems')),
+            'index': scfg.Value(False, isflag=True, help=ub.paragraph(
+                '''
+                if True, only search files selected by a persistent trigram
+                index in the xdev cache directory, which is updated with the
+                files that changed. Can also be the path of an index.
+                ''')),
+            'verbose': scfg.Value(1),
+        }
+
+        @classmethod
+        def main(cls, cmdline=False, **kwargs):
+            from xdev import search_replace
+            config = cls.cli(cmdline=cmdline, data=kwargs)
+            search_replace.grep(**config)
+
     class FindCLI(scfg.DataConfig):
         """
         Find matching files or paths in a directory.
@@ -160,6 +219,11 @@ class XdevCLI(ModalCLI):
             'type': scfg.Value('f', help="can be f and/or d"),
             'recursive': scfg.Value(True),
             'followlinks': scfg.Value(False),
+            'respect_gitignore': scfg.Value(False, isflag=True, help=(
+                'if True, skip paths ignored by .gitignore files')),
+            'prefetch': scfg.Value(0, type=int, help=(
+                'number of directories to list ahead in a thread pool, which '
+                'helps on slow filesystems')),
         }
 
         @classmethod
@@ -192,6 +256,10 @@ class XdevCLI(ModalCLI):
             'ignore_dotprefix': scfg.Value(True, isflag=True),
             'max_depth': scfg.Value(
                 None, help='maximum depth to recurse', short_alias=['L']),
+            'stream': scfg.Value(
+                False, isflag=True, help=(
+                    'if True, print lines as the directory is walked '
+                    'instead of after the entire tree is built')),
         }
 
         @classmethod
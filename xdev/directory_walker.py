@@ -1,5 +1,8 @@
 import os
 import rich
+import operator
+import itertools as it
+from functools import partial
 import ubelt as ub
 import networkx as nx
 from xdev.patterns import MultiPattern
@@ -34,10 +37,22 @@ class DirectoryWalker:
                  show_progress=True,
                  ignore_empty_dirs=False,
                  fs=None,
+                 workers=0,
+                 mode='process',
+                 cache=False,
+                 refresh_cache=False,
+                 backend='networkx',
+                 budget=None,
+                 max_nodes=None,
+                 walk_workers=0,
+                 respect_gitignore=False,
                  **kwargs):
         """
         Args:
-            dpath (str | PathLike): the path to walk
+            dpath (str | PathLike | List[str | PathLike]):
+                the path to walk. If multiple paths are given, they are
+                walked into a single tree with a synthetic root at their
+                common path.
 
             exclude_dnames (Coercable[MultiPattern]):
                 blocks directory names matching this pattern
@@ -61,7 +76,59 @@ class DirectoryWalker:
                 if True, include content analysis
 
             fs (fsspec.spec.AbstractFileSystem):
-                experimental: an fsspec filesystem
+                experimental: an fsspec filesystem. Directories are listed
+                with ``ls(detail=True)``, so file sizes are known without a
+                request per file, and all directories on the same level are
+                listed concurrently.
+
+            workers (int):
+                number of parallel workers used to gather per-file stats.
+                If 0, files are processed serially in the main thread.
+
+            mode (str):
+                parallel backend used when workers > 0. Can be 'serial',
+                'thread', or 'process'.
+
+            cache (bool | str | PathLike | FileStatsCache):
+                if truthy, content stats are stored in a persistent
+                :class:`FileStatsCache` and only files whose stat metadata
+                changed are parsed again. A path specifies a custom cache
+                location. Only used when ``parse_content`` is True.
+
+            refresh_cache (bool):
+                if True, ignore existing cache entries and recompute them.
+
+            backend (str):
+                Either 'networkx' or 'compact'. The networkx backend stores
+                every path as a node in a :class:`networkx.DiGraph`. The
+                compact backend stores the tree in a :class:`CompactTree` and
+                only converts the displayed part of it to networkx when
+                rendering, which uses much less memory on large trees.
+
+            budget (None | float | str):
+                if specified, the maximum time to spend walking, either in
+                seconds or as a string like "10s", "500ms", or "2m". The walk
+                is breadth-first, and when the budget runs out directories
+                that were not listed yet are not descended into. Their
+                totals are estimated by sampling (see
+                :func:`_estimate_subtree_stats`) and are marked with a "~" in
+                labels and reports.
+
+            max_nodes (None | int | float | str):
+                if specified, stop walking in the same way as ``budget`` once
+                the tree has this many nodes (e.g. 1e6).
+
+            walk_workers (int):
+                number of threads used to list directories. If 0, directories
+                are listed serially. Each directory listing is a separate
+                job, so idle threads pick up subdirectories of any root,
+                which helps on high latency filesystems (e.g. NFS).
+
+            respect_gitignore (bool):
+                if True, skip the paths ignored by ``.gitignore`` files (and
+                the ``.git`` directory) like git does. Ignored directories
+                are never listed. See
+                :class:`xdev.util_gitignore.GitignoreMatcher`.
 
             **kwargs : passed to label options
         """
@@ -84,7 +151,18 @@ class DirectoryWalker:
                 raise ValueError('mutex with block_dnames')
             exclude_dnames = kwargs.pop('block_dnames')
 
-        self.dpath = ub.Path(dpath).absolute()
+        if isinstance(dpath, (list, tuple)):
+            roots = list(ub.unique(ub.Path(p).absolute() for p in dpath))
+        else:
+            roots = [ub.Path(dpath).absolute()]
+        if len(roots) == 1:
+            self.dpath = roots[0]
+        else:
+            self.dpath = ub.Path(os.path.commonpath(roots))
+            for root in roots:
+                if any(other != root and root in other.parents for other in roots):
+                    raise ValueError(f'The root {root} contains another root')
+        self.roots = roots
         self.exclude_fnames = _null_coerce(MultiPattern, exclude_fnames)
         self.exclude_dnames = _null_coerce(MultiPattern, exclude_dnames)
         self.include_fnames = _null_coerce(MultiPattern, include_fnames)
@@ -94,6 +172,14 @@ class DirectoryWalker:
         self.max_files = max_files
         self.show_progress = show_progress
         self.ignore_empty_dirs = ignore_empty_dirs
+        self.workers = workers
+        self.mode = mode
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.budget = None if budget is None else _coerce_seconds(budget)
+        self.max_nodes = None if max_nodes is None else int(float(max_nodes))
+        self.walk_workers = walk_workers
+        self.respect_gitignore = respect_gitignore
 
         kwargs = ub.udict(kwargs)
 
@@ -110,16 +196,549 @@ class DirectoryWalker:
         if kwargs:
             raise ValueError(f'Unhandled kwargs {kwargs}')
 
+        if backend not in {'networkx', 'compact'}:
+            raise KeyError(backend)
+        if backend == 'compact' and fs is not None:
+            raise NotImplementedError('The compact backend does not support fs')
+        if backend == 'compact' and (budget is not None or max_nodes is not None):
+            raise NotImplementedError('The compact backend does not support budgets')
+        if respect_gitignore and fs is not None:
+            raise NotImplementedError('respect_gitignore does not support fs')
+        if backend == 'compact' and (len(roots) > 1 or walk_workers):
+            raise NotImplementedError('The compact backend only walks a single root serially')
+
         self.fs = fs
+        self.backend = backend
+        self.compact = None
         self.graph = None
+        # The max_depth the graph was converted from the compact tree with
+        self._graph_max_depth = None
         self._topo_order = None
         self._type_to_path = {}
 
     def write_network_text(self, **kwargs):
-        nx.write_network_text(self.graph, rich.print, end='', **kwargs)
+        """
+        Print the tree. Labels are computed while printing, so only the
+        displayed nodes are labeled (see :func:`_make_lazy_labeler`).
+
+        Args:
+            **kwargs: passed to :func:`xdev.util_networkx.write_network_text`
+        """
+        from xdev.util_networkx import write_network_text
+        self._ensure_graph(max_depth=kwargs.get('max_depth', None))
+        kwargs.setdefault('with_labels', self._make_lazy_labeler())
+        if self._topo_order:
+            # The root is known, avoid searching the whole graph for it
+            kwargs.setdefault('sources', self._topo_order[:1])
+        write_network_text(self.graph, rich.print, end='', **kwargs)
+
+    def iter_network_text(self, max_depth=None, ascii_only=False):
+        """
+        Walk the directory and generate lines in the network text format as
+        soon as each node is discovered.
+
+        Unlike :func:`write_network_text`, this does not build a graph, so the
+        first lines are available immediately and memory only grows with the
+        depth of the tree (and the size of the directories along the current
+        path). The text is the same as rendering the result of
+        :func:`_walk`, but stats are never computed, so labels do not
+        include them.
+
+        Args:
+            max_depth (int | None): maximum depth to display
+            ascii_only (bool): if True only use ASCII characters
+
+        Yields:
+            str: a line of text
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> from xdev.util_networkx import generate_network_text
+            >>> dpath = ub.Path(ub.modname_to_modpath('xdev'))
+            >>> kw = dict(exclude_dnames=['__pycache__'], show_progress=False,
+            >>>           colors=False, max_files=20)
+            >>> walker = DirectoryWalker(dpath, **kw)
+            >>> walker._walk()
+            >>> walker._update_labels()
+            >>> for max_depth in [None, 0, 1, 2]:
+            >>>     expected = list(generate_network_text(walker.graph, max_depth=max_depth))
+            >>>     got = list(DirectoryWalker(dpath, **kw).iter_network_text(max_depth=max_depth))
+            >>>     assert got == expected
+        """
+        from xdev.util_networkx import AsciiDirectedGlyphs, UtfDirectedGlyphs
+        glyphs = AsciiDirectedGlyphs if ascii_only else UtfDirectedGlyphs
+        label_node = self._make_labeler()
+        if len(self.roots) > 1:
+            raise NotImplementedError('Streaming only supports a single root')
+
+        if max_depth == 0:
+            yield glyphs.empty + ' ...'
+            return
+
+        root_data = {'type': 'dir', 'name': self.dpath.name, 'is_root': True}
+        # Each item is the path, its node data, depth, indentation, and a flag
+        # indicating if it is the last child of its parent.
+        stack = [(self.dpath, root_data, 0, [], True)]
+        while stack:
+            path, node_data, depth, indents, islast = stack.pop()
+            if depth == 0:
+                this_prefix = indents + [glyphs.newtree_last]
+                next_prefix = indents + [glyphs.endof_forest]
+            elif islast:
+                this_prefix = indents + [glyphs.last]
+                next_prefix = indents + [glyphs.endof_forest]
+            else:
+                this_prefix = indents + [glyphs.mid]
+                next_prefix = indents + [glyphs.within_tree]
+
+            if path is Ellipsis:
+                yield ''.join(this_prefix) + ' ...'
+                continue
+
+            children = []
+            if node_data['type'] == 'dir' and not node_data.get('islink', False):
+                children = self._list_children(path, node_data, depth)
+
+            self._update_node_metadata(path, node_data)
+            yield ''.join(this_prefix) + label_node(path, node_data)
+
+            if max_depth is not None and depth == max_depth - 1 and children:
+                children = [(Ellipsis, None)]
+            # Push in reverse so children are popped in their listed order
+            for idx, (child, child_data) in enumerate(children[::-1]):
+                stack.append((child, child_data, depth + 1, next_prefix, idx == 0))
+
+    def _list_children(self, dpath, node_data, depth):
+        """
+        List the children of a single directory the same way :func:`_walk`
+        does and update the attributes of the directory node.
+
+        Returns:
+            List[Tuple[ub.Path, Dict]]: the path and node data of each child
+        """
+        if self.fs is None:
+            try:
+                dnames, fnames, entry_info = _scandir_list(dpath)
+            except OSError:
+                return []
+        else:
+            listing = _fsspec_list(self.fs, os.fspath(dpath))
+            if listing is None:
+                return []
+            dnames, fnames, entry_info = listing
+        gitignore = self._gitignore_for(
+            dpath, fnames, node_data.pop('_parent_gitignore', None))
+        root_attrs = self._prune_listing(dnames, fnames, depth, gitignore)
+        node_data.update(root_attrs)
+        children = []
+        if not root_attrs.get('too_many_files', False):
+            for f in fnames:
+                children.append((dpath / f, dict(
+                    name=f, type='file', **entry_info.get(f, {}))))
+        for d in dnames:
+            child_data = dict(name=d, type='dir', **entry_info.get(d, {}))
+            if gitignore is not None:
+                child_data['_parent_gitignore'] = gitignore
+            children.append((dpath / d, child_data))
+        return children
+
+    def iter_rows(self):
+        r"""
+        Walk the directory and generate a flat row for every node without
+        building a graph.
+
+        Files are emitted as soon as they are listed. Directories are emitted
+        after all of their descendants, with the total size and line count
+        of their subtree, so memory only grows with the depth of the tree
+        (and the size of the directories along the current path).
+
+        Yields:
+            Dict: a row with the keys:
+                path (str): the path of the node
+                parent (str | None): the path of its parent directory
+                type (str): "file" or "dir"
+                size (int): size in bytes (total for directories)
+                lines (int | None): number of lines (total for directories)
+                    or None if content was not parsed or the file is binary
+                ext (str | None): the file extension without a dot, or None
+                    for directories
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/walker_rows').delete().ensuredir()
+            >>> (dpath / 'sub').ensuredir()
+            >>> (dpath / 'sub/a.py').write_text('a = 1\nb = 2\n')
+            >>> (dpath / 'b.txt').write_text('hello\n')
+            >>> self = DirectoryWalker(dpath, parse_content=True, show_progress=False)
+            >>> rows = list(self.iter_rows())
+            >>> for row in rows:
+            >>>     row['path'] = ub.Path(row['path']).relative_to(dpath).as_posix()
+            >>>     row['parent'] = row['parent'] and ub.Path(row['parent']).relative_to(dpath).as_posix()
+            >>>     print(row)
+            {'path': 'b.txt', 'parent': '.', 'type': 'file', 'size': 6, 'lines': 1, 'ext': 'txt'}
+            {'path': 'sub/a.py', 'parent': 'sub', 'type': 'file', 'size': 12, 'lines': 2, 'ext': 'py'}
+            {'path': 'sub', 'parent': '.', 'type': 'dir', 'size': 12, 'lines': 2, 'ext': None}
+            {'path': '.', 'parent': None, 'type': 'dir', 'size': 18, 'lines': 3, 'ext': None}
+        """
+        if len(self.roots) > 1:
+            raise NotImplementedError('Streaming only supports a single root')
+        parse_content = self.parse_content
+        root_data = {'type': 'dir', 'name': self.dpath.name, 'is_root': True}
+        # Each frame holds the directory, the iterator over its children, and
+        # the running totals of its subtree.
+        stack = [self._row_frame(self.dpath, root_data, 0)]
+        while stack:
+            frame = stack[-1]
+            child = next(frame['children'], None)
+            if child is None:
+                stack.pop()
+                parent = stack[-1] if stack else None
+                keep = (not self.ignore_empty_dirs or frame['files'] or
+                        parent is None)
+                if keep:
+                    yield {
+                        'path': os.fspath(frame['path']),
+                        'parent': None if parent is None else os.fspath(parent['path']),
+                        'type': 'dir',
+                        'size': frame['size'],
+                        'lines': frame['lines'],
+                        'ext': None,
+                    }
+                if parent is not None:
+                    parent['size'] += frame['size']
+                    parent['files'] += frame['files']
+                    if frame['lines'] is not None:
+                        parent['lines'] = (parent['lines'] or 0) + frame['lines']
+                continue
+
+            path, node_data = child
+            if node_data['type'] == 'dir':
+                stack.append(self._row_frame(path, node_data, len(stack)))
+                continue
+
+            stats = parse_file_stats(
+                path, parse_content=parse_content, fs=self.fs,
+                stat_result=node_data.get('stat_result', None),
+                size=node_data.get('size', None))
+            ext = path.suffix.lstrip('.')
+            size = stats[ext + '.size']
+            lines = stats.get(ext + '.total_lines', None)
+            frame['size'] += size
+            frame['files'] += 1
+            if lines is not None:
+                frame['lines'] = (frame['lines'] or 0) + lines
+            yield {
+                'path': os.fspath(path),
+                'parent': os.fspath(frame['path']),
+                'type': 'file',
+                'size': size,
+                'lines': lines,
+                'ext': ext,
+            }
+
+    def _row_frame(self, dpath, node_data, depth):
+        if node_data.get('islink', False):
+            # Like the walk, do not follow links to directories
+            children = []
+        else:
+            children = self._list_children(dpath, node_data, depth)
+        return {
+            'path': dpath,
+            'children': iter(children),
+            'size': 0,
+            'lines': None,
+            'files': 0,
+        }
+
+    def export(self, fpath, format=None):
+        """
+        Stream the rows from :func:`iter_rows` into a file.
+
+        Args:
+            fpath (str | PathLike): the output path. Any existing file is
+                replaced.
+
+            format (str | None):
+                "jsonl", "parquet", or "sqlite". If unspecified, this is
+                inferred from the extension of ``fpath``. SQLite files
+                contain a single "nodes" table and Parquet requires pyarrow.
+
+        Returns:
+            int: the number of rows written
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> import sqlite3
+            >>> dpath = ub.Path(ub.modname_to_modpath('xdev'))
+            >>> out_dpath = ub.Path.appdir('xdev/tests/walker_export').delete().ensuredir()
+            >>> self = DirectoryWalker(dpath, exclude_dnames=['__pycache__'], show_progress=False)
+            >>> num = self.export(out_dpath / 'stats.sqlite')
+            >>> assert num == self.export(out_dpath / 'stats.jsonl')
+            >>> assert num == len((out_dpath / 'stats.jsonl').read_text().splitlines())
+            >>> conn = sqlite3.connect(out_dpath / 'stats.sqlite')
+            >>> query = "SELECT size FROM nodes WHERE parent IS NULL"
+            >>> root_size = conn.execute(query).fetchone()[0]
+            >>> query = "SELECT SUM(size) FROM nodes WHERE type = 'file'"
+            >>> assert root_size == conn.execute(query).fetchone()[0]
+            >>> conn.close()
+
+        Example:
+            >>> # xdoctest: +REQUIRES(module:pyarrow)
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> import pyarrow.parquet as pq
+            >>> dpath = ub.Path(ub.modname_to_modpath('xdev'))
+            >>> out_dpath = ub.Path.appdir('xdev/tests/walker_export').ensuredir()
+            >>> self = DirectoryWalker(dpath, exclude_dnames=['__pycache__'], show_progress=False)
+            >>> num = self.export(out_dpath / 'stats.parquet')
+            >>> assert pq.read_table(out_dpath / 'stats.parquet').num_rows == num
+        """
+        fpath = ub.Path(fpath)
+        if format is None:
+            format = fpath.suffix.lstrip('.').lower()
+        writers = {
+            'jsonl': _write_rows_jsonl,
+            'parquet': _write_rows_parquet,
+            'sqlite': _write_rows_sqlite,
+        }
+        if format not in writers:
+            raise KeyError('Unknown export format {!r}. Expected one of {}'.format(
+                format, list(writers)))
+        writer = writers[format]
+        rows = self.iter_rows()
+        pman = ProgressManager(enabled=self.show_progress)
+        with pman:
+            rows = pman.progiter(rows, desc='Export rows')
+            if fpath.exists():
+                fpath.delete()
+            num = writer(rows, fpath)
+        return num
+
+    def _file_sizes(self):
+        """
+        Map the path of each file relative to the root to its size, using the
+        walked tree if available.
+
+        Returns:
+            Dict[str, int]
+        """
+        from os.path import relpath
+        root = os.fspath(self.dpath)
+        sizes = {}
+        if self.compact is not None:
+            tree = self.compact
+            idxs = tree.file_indices()
+            for idx, size in zip(idxs, tree.columns['size'][idxs].tolist()):
+                sizes[relpath(tree.path(idx), root)] = size
+        elif self.graph is not None and all(
+                'stats' in d for d in self.graph.nodes.values()):
+            for path, node_data in self.graph.nodes(data=True):
+                if node_data['type'] == 'file':
+                    stats = node_data['stats']
+                    size = sum(v for k, v in stats.items() if k.endswith('.size'))
+                    sizes[relpath(path, root)] = size
+        else:
+            for row in self.iter_rows():
+                if row['type'] == 'file':
+                    sizes[relpath(row['path'], root)] = row['size']
+        return sizes
+
+    def diff(self, other):
+        r"""
+        Compare the files in this walk against another walk or snapshot.
+
+        Files are joined on their path relative to each root with a hash
+        table, so this is linear in the number of files. Changed files and
+        their ancestor directories form a tree, and the per-file deltas are
+        summed into the directories like the stats of a normal walk.
+
+        Args:
+            other (DirectoryWalker | str | PathLike):
+                the baseline. Can be another walker, a snapshot written by
+                :func:`export`, or a directory, which is walked with the same
+                filters as this walker.
+
+        Returns:
+            nx.DiGraph:
+                A tree keyed by relative path (the root is "."). Each node has
+                a "type", "name", "label", and "stats" with the keys
+                size_delta, added, removed, and resized. Files also have a
+                "status" of "added", "removed", or "resized". Children are
+                ordered by the magnitude of their size change.
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/walker_diff').delete().ensuredir()
+            >>> old_dpath = (dpath / 'old').ensuredir()
+            >>> new_dpath = (dpath / 'new').ensuredir()
+            >>> (old_dpath / 'sub').ensuredir()
+            >>> (new_dpath / 'sub').ensuredir()
+            >>> (old_dpath / 'same.txt').write_text('abc')
+            >>> (new_dpath / 'same.txt').write_text('abc')
+            >>> (old_dpath / 'sub/grow.txt').write_text('abc')
+            >>> (new_dpath / 'sub/grow.txt').write_text('abcdef')
+            >>> (old_dpath / 'sub/gone.txt').write_text('a')
+            >>> (new_dpath / 'sub/new.txt').write_text('abcdefghij')
+            >>> kw = dict(show_progress=False, colors=False)
+            >>> old = DirectoryWalker(old_dpath, **kw)
+            >>> snapshot = dpath / 'old.jsonl'
+            >>> old.export(snapshot)
+            >>> self = DirectoryWalker(new_dpath, **kw).build()
+            >>> graph = self.diff(snapshot)
+            >>> print(graph.nodes['.']['stats'])
+            {'size_delta': 12, 'added': 1, 'removed': 1, 'resized': 1}
+            >>> nx.write_network_text(graph)
+            ╙── new: size_delta=+12 B,added=1,removed=1,resized=1
+                └─╼ sub: size_delta=+12 B,added=1,removed=1,resized=1
+                    ├─╼ + new.txt (+10 B)
+                    ├─╼ ~ grow.txt (+3 B)
+                    └─╼ - gone.txt (-1 B)
+            >>> # Comparing against a walker or a directory is the same
+            >>> assert nx.utils.graphs_equal(graph, self.diff(old))
+            >>> assert nx.utils.graphs_equal(graph, self.diff(old_dpath))
+
+        Example:
+            >>> # A directory baseline is walked with the same gitignore rules
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/walker_diff_gitignore').delete().ensuredir()
+            >>> old_dpath = (dpath / 'old').ensuredir()
+            >>> new_dpath = (dpath / 'new').ensuredir()
+            >>> for root in [old_dpath, new_dpath]:
+            >>>     (root / '.git').ensuredir()
+            >>>     (root / '.gitignore').write_text('build/\n')
+            >>>     (root / 'main.py').write_text('a = 1')
+            >>> (old_dpath / 'build').ensuredir()
+            >>> (old_dpath / 'build/big.o').write_text('x' * 100)
+            >>> kw = dict(show_progress=False, colors=False, respect_gitignore=True)
+            >>> self = DirectoryWalker(new_dpath, **kw).build()
+            >>> graph = self.diff(old_dpath)
+            >>> print(graph.nodes['.']['stats'])
+            {'size_delta': 0, 'added': 0, 'removed': 0, 'resized': 0}
+        """
+        from os.path import relpath
+        if isinstance(other, DirectoryWalker):
+            old_sizes = other._file_sizes()
+        else:
+            other = ub.Path(other)
+            if self.fs is None:
+                is_dir = other.is_dir()
+            else:
+                is_dir = self.fs.isdir(os.fspath(other))
+            if is_dir:
+                other = DirectoryWalker(
+                    other,
+                    exclude_fnames=self.exclude_fnames,
+                    exclude_dnames=self.exclude_dnames,
+                    include_fnames=self.include_fnames,
+                    include_dnames=self.include_dnames,
+                    max_walk_depth=self.max_walk_depth,
+                    max_files=self.max_files,
+                    show_progress=self.show_progress,
+                    ignore_empty_dirs=self.ignore_empty_dirs,
+                    respect_gitignore=self.respect_gitignore,
+                    fs=self.fs,
+                )
+                old_sizes = other._file_sizes()
+            else:
+                old_sizes = {}
+                rows = list(_read_snapshot_rows(other))
+                roots = [row['path'] for row in rows if row['parent'] is None]
+                if len(roots) != 1:
+                    raise ValueError('Snapshot does not have a single root')
+                for row in rows:
+                    if row['type'] == 'file':
+                        old_sizes[relpath(row['path'], roots[0])] = row['size']
+        new_sizes = self._file_sizes()
+
+        changes = []
+        for key, size in new_sizes.items():
+            old_size = old_sizes.get(key, None)
+            if old_size is None:
+                changes.append((key, 'added', size))
+            elif old_size != size:
+                changes.append((key, 'resized', size - old_size))
+        for key, old_size in old_sizes.items():
+            if key not in new_sizes:
+                changes.append((key, 'removed', -old_size))
+
+        root = '.'
+        empty = {'size_delta': 0, 'added': 0, 'removed': 0, 'resized': 0}
+        graph = nx.DiGraph()
+        graph.add_node(root, type='dir', name=self.dpath.name)
+        for key, status, delta in changes:
+            stats = dict(empty, size_delta=delta)
+            stats[status] = 1
+            parts = key.replace(os.path.sep, '/').split('/')
+            graph.add_node(key, type='file', name=parts[-1], status=status,
+                           stats=stats)
+            # Add ancestors until reaching one that already exists
+            child = key
+            for idx in range(len(parts) - 1, 0, -1):
+                parent = '/'.join(parts[:idx])
+                exists = parent in graph
+                if not exists:
+                    graph.add_node(parent, type='dir', name=parts[idx - 1])
+                graph.add_edge(parent, child)
+                child = parent
+                if exists:
+                    break
+            else:
+                graph.add_edge(root, child)
+
+        _accum_graph_stats(graph, list(nx.topological_sort(graph)))
+        # The root has no stats to accumulate if nothing changed
+        graph.nodes[root]['stats'] = dict(empty, **graph.nodes[root]['stats'])
+
+        # Rebuild the graph with the largest changes first and add labels
+        colors = self.label_options['colors']
+        status_style = {
+            'added': ('+', 'green'),
+            'removed': ('-', 'red'),
+            'resized': ('~', 'yellow'),
+        }
+        ordered = nx.DiGraph()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node_data = graph.nodes[node]
+            stats = node_data['stats']
+            delta = stats['size_delta']
+            delta_text = _signed_byte_str(delta)
+            if node_data['type'] == 'file':
+                marker, color = status_style[node_data['status']]
+                label = f'{marker} {node_data["name"]} ({delta_text})'
+                if colors:
+                    label = f'[{color}]{label}[/{color}]'
+            else:
+                disp_stats = {'size_delta': delta_text}
+                disp_stats.update({k: stats[k] for k in status_style if stats[k]})
+                stats_text = ub.urepr(disp_stats, nl=0, compact=1)
+                label = f'{node_data["name"]}: {stats_text}'
+            ordered.add_node(node, label=label, **node_data)
+            children = sorted(graph.succ[node],
+                              key=lambda c: -abs(graph.nodes[c]['stats']['size_delta']))
+            for child in children:
+                ordered.add_edge(node, child)
+            stack.extend(children[::-1])
+        return ordered
+
+    def write_diff(self, other, max_depth=None):
+        """
+        Print the tree of changes computed by :func:`diff` and a summary.
+
+        Args:
+            other (DirectoryWalker | str | PathLike): the baseline
+            max_depth (int | None): maximum depth to display
+        """
+        graph = self.diff(other)
+        nx.write_network_text(graph, rich.print, end='', max_depth=max_depth)
+        stats = graph.nodes['.']['stats']
+        delta = stats['size_delta']
+        rich.print('{added} added, {removed} removed, {resized} resized, size change: {delta}'.format(
+            delta=_signed_byte_str(delta), **stats))
 
     def write_report(self, **nxtxt_kwargs):
         import pandas as pd
+        self._ensure_graph(max_depth=nxtxt_kwargs.get('max_depth', None))
         try:
             self.write_network_text(**nxtxt_kwargs)
         except KeyboardInterrupt:
@@ -166,6 +785,8 @@ class DirectoryWalker:
                 disp_piv = _node_table(node)
                 row = disp_piv.iloc[-1].to_dict()
                 row['name'] = self.graph.nodes[node]['name']
+                if self.graph.nodes[node].get('estimated', False):
+                    row['name'] = '~' + row['name']
                 child_rows.append(row)
             if child_rows:
                 print('')
@@ -177,9 +798,18 @@ class DirectoryWalker:
                 # print(f'node={node}')
 
             disp_piv = _node_table(root_node)
+            root_data = self.graph.nodes[root_node]
+            if root_data.get('estimated', False):
+                disp_piv = disp_piv.rename(index={'∑ total': '~∑ total'})
             print('')
             rich.print(disp_piv[:-1])
             rich.print(disp_piv[-1:])
+            if root_data.get('estimated', False):
+                num_estimated = sum(
+                    'estimated_stats' in d for d in self.graph.nodes.values())
+                rich.print(
+                    f'~ The walk budget ran out. Totals include sampled '
+                    f'estimates for {num_estimated} unexplored directories.')
         print('root_node = {}'.format(ub.urepr(root_node, nl=1)))
 
         if 0:
@@ -203,97 +833,262 @@ class DirectoryWalker:
         # rich.print('stats = {}'.format(ub.urepr(disp_stats, nl=1)))
 
     def build(self):
-        """
+        r"""
         Build the internal graph structure with requested metadata
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path(ub.modname_to_modpath('xdev'))
+            >>> kw = dict(exclude_dnames=['__pycache__'], parse_content=True, show_progress=False)
+            >>> graph_walker = DirectoryWalker(dpath, **kw).build()
+            >>> compact_walker = DirectoryWalker(dpath, backend='compact', **kw).build()
+            >>> compact_walker._ensure_graph()
+            >>> g1 = graph_walker.graph
+            >>> g2 = compact_walker.graph
+            >>> assert set(g1.nodes) == set(g2.nodes)
+            >>> assert set(g1.edges) == set(g2.edges)
+            >>> assert dict(g1.nodes(data='stats')) == dict(g2.nodes(data='stats'))
+            >>> graph_walker._update_labels()
+            >>> compact_walker._update_labels()
+            >>> assert dict(g1.nodes(data='label')) == dict(g2.nodes(data='label'))
+
+        Example:
+            >>> # Walk multiple roots concurrently into one tree
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/multi_root').delete().ensuredir()
+            >>> for name in ['vol1', 'vol2', 'mnt/vol3']:
+            >>>     (dpath / name / 'sub').ensuredir()
+            >>>     (dpath / name / 'sub/data.txt').write_text('x' * 10)
+            >>> (dpath / 'ignored.txt').write_text('not walked')
+            >>> roots = [dpath / 'vol1', dpath / 'vol2', dpath / 'mnt/vol3']
+            >>> kw = dict(show_progress=False, colors=False, abs_root_label=False)
+            >>> serial = DirectoryWalker(roots, **kw).build()
+            >>> threaded = DirectoryWalker(roots, walk_workers=4, **kw).build()
+            >>> assert set(serial.graph.edges) == set(threaded.graph.edges)
+            >>> serial.write_network_text()
+            ╙── multi_root: txt.size=0.03 KB,txt.files=3
+                ├─╼ vol1: txt.size=0.01 KB,txt.files=1
+                │   └─╼ sub: txt.size=0.01 KB,txt.files=1
+                │       └─╼ data.txt: size=0.01 KB
+                ├─╼ vol2: txt.size=0.01 KB,txt.files=1
+                │   └─╼ sub: txt.size=0.01 KB,txt.files=1
+                │       └─╼ data.txt: size=0.01 KB
+                └─╼ mnt/vol3: txt.size=0.01 KB,txt.files=1
+                    └─╼ sub: txt.size=0.01 KB,txt.files=1
+                        └─╼ data.txt: size=0.01 KB
+
+        Example:
+            >>> # Skip paths ignored by git
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/walk_gitignore').delete().ensuredir()
+            >>> (dpath / '.git/objects').ensuredir()
+            >>> (dpath / '.gitignore').write_text('build/\n*.log\n')
+            >>> (dpath / 'build').ensuredir()
+            >>> (dpath / 'build/out.txt').touch()
+            >>> (dpath / 'src/data').ensuredir()
+            >>> (dpath / 'src/.gitignore').write_text('data/\n!keep.log\n')
+            >>> for name in ['src/main.py', 'src/debug.log', 'src/keep.log', 'src/data/x.csv']:
+            >>>     (dpath / name).touch()
+            >>> kw = dict(show_progress=False, respect_gitignore=True)
+            >>> walker = DirectoryWalker(dpath, **kw).build()
+            >>> paths = sorted(p.relative_to(dpath).as_posix() for p in walker.graph.nodes)
+            >>> print(paths)
+            ['.', '.gitignore', 'src', 'src/.gitignore', 'src/keep.log', 'src/main.py']
+            >>> threaded = DirectoryWalker(dpath, walk_workers=2, **kw).build()
+            >>> compact = DirectoryWalker(dpath, backend='compact', **kw).build()
+            >>> compact._ensure_graph()
+            >>> assert set(threaded.graph.nodes) == set(walker.graph.nodes)
+            >>> assert set(compact.graph.nodes) == set(walker.graph.nodes)
         """
         self._walk()
         self._update_stats()
-        self._update_labels()
-        self._sort()
+        if self.compact is None:
+            self._sort()
         return self
 
+    def _ensure_graph(self, max_depth=None):
+        """
+        When using the compact backend, convert the part of the tree that will
+        be displayed into a networkx graph. The graph is converted again if a
+        later call needs more depth than the previous conversion had.
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/ensure_graph').delete().ensuredir()
+            >>> (dpath / 'a/b').ensuredir()
+            >>> (dpath / 'a/b/x.txt').touch()
+            >>> (dpath / 'a/y.txt').touch()
+            >>> walker = DirectoryWalker(dpath, backend='compact', show_progress=False).build()
+            >>> walker._ensure_graph(max_depth=1)
+            >>> assert len(walker.graph) == 2
+            >>> walker._ensure_graph(max_depth=0)
+            >>> assert len(walker.graph) == 2
+            >>> walker._ensure_graph()
+            >>> assert len(walker.graph) == 5
+        """
+        if self.compact is None:
+            return
+        if self.graph is not None:
+            have = self._graph_max_depth
+            if have is None or (max_depth is not None and max_depth <= have):
+                return
+        self.graph = self.compact.to_networkx(max_depth=max_depth)
+        self._graph_max_depth = max_depth
+        self._topo_order = list(self.graph.nodes)
+        self._sort()
+
     def _inplace_filter_dnames(self, dnames):
-        if self.include_dnames is not None:
-            dnames[:] = [d for d in dnames if self.include_dnames.match(d)]
-        if self.exclude_dnames is not None:
-            dnames[:] = [d for d in dnames if not self.exclude_dnames.match(d)]
+        _inplace_filter_names(dnames, self.include_dnames, self.exclude_dnames)
 
     def _inplace_filter_fnames(self, fnames):
-        if self.include_fnames is not None:
-            fnames[:] = [f for f in fnames if self.include_fnames.match(f)]
-        if self.exclude_fnames is not None:
-            fnames[:] = [f for f in fnames if not self.exclude_fnames.match(f)]
+        _inplace_filter_names(fnames, self.include_fnames, self.exclude_fnames)
 
-    def _walk(self):
-        dpath = self.dpath
-        g = nx.DiGraph()
+    def _prune_listing(self, dnames, fnames, depth, gitignore=None):
+        """
+        Apply the depth limit and the include / exclude patterns to the
+        listing of a directory in place.
+
+        Args:
+            dnames (List[str]): directory names, modified inplace
+            fnames (List[str]): file names, modified inplace
+            depth (int | None): depth of the directory relative to the root
+            gitignore (GitignoreMatcher | None): the matcher of the directory
+
+        Returns:
+            Dict: attributes to store on the directory node
+        """
+        attrs = {}
+        attrs['unfiltered_num_dirs'] = len(dnames)
+        attrs['unfiltered_num_files'] = len(fnames)
+
+        if gitignore is not None:
+            gitignore.filter(dnames, fnames)
 
-        g.add_node(self.dpath, label=self.dpath.name, type='dir', is_root=True)
+        if self.max_walk_depth is not None and depth >= self.max_walk_depth:
+            del dnames[:]
+
+        # Remove directories / files that match the blocklist or dont
+        # match the include list
+        self._inplace_filter_dnames(dnames)
+        self._inplace_filter_fnames(fnames)
+
+        attrs['num_dirs'] = len(dnames)
+        attrs['num_files'] = num_files = len(fnames)
 
         max_files = self.max_files
+        too_many_files = max_files is not None and num_files >= max_files
+        if too_many_files:
+            attrs['too_many_files'] = too_many_files
+        return attrs
 
-        pman = ProgressManager(enabled=self.show_progress)
-        with pman:
-            prog = pman.progiter(desc='Walking directory')
+    def _gitignore_for(self, root, fnames, parent_gitignore=None):
+        """
+        Get the gitignore matcher for a directory that was just listed.
 
-            if self.max_walk_depth is not None:
-                start_depth = str(self.dpath).count(os.path.sep)
+        Args:
+            root (str | PathLike): the directory
+            fnames (List[str]): the unfiltered file names in the directory
+            parent_gitignore (GitignoreMatcher | None):
+                the matcher of its parent if it was walked.
 
-            if self.fs is None:
-                walkgen = self.dpath.walk()
-            else:
-                walkgen = self.fs.walk(os.fspath(dpath))
+        Returns:
+            GitignoreMatcher | None: None if gitignore files are not respected
+        """
+        if not self.respect_gitignore:
+            return None
+        from xdev.util_gitignore import GitignoreMatcher
+        if parent_gitignore is None:
+            return GitignoreMatcher.for_directory(root)
+        return parent_gitignore.descend(
+            os.path.basename(root), has_gitignore='.gitignore' in fnames)
 
-            for root, dnames, fnames in walkgen:
+    def _walk(self):
+        if self.backend == 'compact':
+            return self._walk_compact()
+        g = nx.DiGraph()
 
-                if self.fs is not None:
-                    root = ub.Path(root)
+        g.add_node(self.dpath, name=self.dpath.name, label=self.dpath.name,
+                   type='dir', is_root=True)
+        if len(self.roots) > 1:
+            # The roots are children of a synthetic root at their common path
+            g.nodes[self.dpath]['is_synthetic'] = True
+            for top in self.roots:
+                name = os.path.relpath(top, self.dpath)
+                g.add_node(top, name=name, label=name, type='dir')
+                g.add_edge(self.dpath, top)
 
-                prog.step()
+        pman = ProgressManager(enabled=self.show_progress)
+        with pman:
+            prog = pman.progiter(desc='Walking directory')
 
-                root_attrs = {}
+            # The depth and parent gitignore matcher of each directory that
+            # is waiting to be listed
+            depth_of = {top: 0 for top in self.roots}
+            parent_gitignore_of = {}
+            track_depth = self.max_walk_depth is not None
+
+            def mark_unreadable(root):
+                # Distinguish directories that could not be listed from
+                # the ones the budget did not reach
+                if root in g:
+                    g.nodes[root]['unreadable'] = True
+
+            # With a budget, the levels of all roots are walked together so
+            # one root does not use the whole budget
+            budgeted = self.budget is not None or self.max_nodes is not None
+            if self.fs is not None:
+                walkgen = _fsspec_walk(
+                    self.fs, [os.fspath(top) for top in self.roots],
+                    max_workers=self.walk_workers or 8,
+                    on_unreadable=mark_unreadable)
+            elif self.walk_workers:
+                walkgen = _threaded_scandir_walk(
+                    self.roots, max_workers=self.walk_workers,
+                    on_unreadable=mark_unreadable)
+            else:
+                walkgen = _scandir_walk(self.roots, breadth_first=budgeted,
+                                        on_unreadable=mark_unreadable)
 
-                root_attrs['unfiltered_num_dirs'] = len(dnames)
-                root_attrs['unfiltered_num_files'] = len(fnames)
+            timer = ub.Timer().tic()
+            for root, dnames, fnames, entry_info in walkgen:
 
-                if self.max_walk_depth is not None:
-                    curr_depth = str(root).count(os.path.sep)
-                    rel_depth = (curr_depth - start_depth)
-                    if rel_depth >= self.max_walk_depth:
-                        del dnames[:]
+                prog.step()
 
-                # Remove directories / files that match the blocklist or dont
-                # match the include list
-                self._inplace_filter_dnames(dnames)
-                self._inplace_filter_fnames(fnames)
+                rel_depth = depth_of.pop(root, None) if track_depth else None
+                gitignore = self._gitignore_for(
+                    root, fnames, parent_gitignore_of.pop(root, None))
 
-                root_attrs['num_dirs'] = len(dnames)
-                root_attrs['num_files'] = num_files = len(fnames)
+                root_attrs = self._prune_listing(dnames, fnames, rel_depth,
+                                                 gitignore)
+                too_many_files = root_attrs.get('too_many_files', False)
 
-                too_many_files = max_files is not None and num_files >= max_files
-                if too_many_files:
-                    root_attrs['too_many_files'] = too_many_files
-
-                g.add_node(
-                    root,
-                    type='dir',
-                    name=root.name,
-                    label=root.name,
-                    **root_attrs,
-                )
-                # if root != dpath:
-                #     g.add_edge(root.parent, root)
+                # The node was added when its parent was listed
+                g.add_node(root, type='dir', **root_attrs)
 
                 if not too_many_files:
                     for f in fnames:
                         fpath = root / f
-                        g.add_node(fpath, name=fpath.name, label=fpath.name, type='file')
+                        g.add_node(fpath, name=f, label=f, type='file',
+                                   **entry_info.get(f, {}))
                         g.add_edge(root, fpath)
 
                 for d in dnames:
                     dpath = root / d
-                    g.add_node(dpath, name=dpath.name, label=dpath.name, type='dir')
+                    g.add_node(dpath, name=d, label=d, type='dir',
+                               **entry_info.get(d, {}))
                     g.add_edge(root, dpath)
+                    if track_depth:
+                        depth_of[dpath] = rel_depth + 1
+                    if gitignore is not None:
+                        parent_gitignore_of[dpath] = gitignore
+
+                if budgeted and (
+                        (self.budget is not None and timer.toc() > self.budget) or
+                        (self.max_nodes is not None and len(g) >= self.max_nodes)):
+                    break
+
+            if budgeted:
+                self._estimate_unexplored(g, pman)
 
         self._topo_order = list(nx.topological_sort(g))
         self.graph = g
@@ -308,7 +1103,7 @@ class DirectoryWalker:
             to_remove = []
             for node in self._topo_order[::-1]:
                 node_data = g.nodes[node]
-                if node_data['stats'].get('file', 0) == 0:
+                if node_data['stats'].get('file', 0) == 0 and not node_data.get('estimated', False):
                     to_remove.append(node)
 
             g.remove_nodes_from(to_remove)
@@ -322,92 +1117,428 @@ class DirectoryWalker:
                 self._type_to_path[t] = []
             self._type_to_path[t].append(p)
 
+    def _walk_compact(self):
+        """
+        Walk the directory into a :class:`CompactTree` without creating a
+        networkx node or a path object for each entry.
+        """
+        tree = CompactTree(self.dpath)
+        max_files = self.max_files
+        max_walk_depth = self.max_walk_depth
+
+        pman = ProgressManager(enabled=self.show_progress)
+        with pman:
+            prog = pman.progiter(desc='Walking directory')
+            # Each item is a directory with its parent index and depth.
+            # Nodes are added when they are popped, so the tree is stored in
+            # depth-first preorder.
+            stack = [(os.fspath(self.dpath), -1, 0, False, None)]
+            while stack:
+                root, parent_idx, depth, islink, parent_gitignore = stack.pop()
+                if parent_idx < 0:
+                    root_idx = tree.add_node(-1, self.dpath.name, is_dir=True)
+                else:
+                    root_idx = tree.add_node(
+                        parent_idx, os.path.basename(root), is_dir=True,
+                        islink=islink)
+                if islink:
+                    # Like os.walk, list directory links but do not follow
+                    continue
+                prog.step()
+
+                try:
+                    # Files are stat-ed below, only if they are kept
+                    dnames, fnames, entry_info = _scandir_list(root, stat=False)
+                except OSError:
+                    continue
+
+                tree.set_dir_attrs(
+                    root_idx,
+                    unfiltered_num_dirs=len(dnames),
+                    unfiltered_num_files=len(fnames))
+
+                gitignore = self._gitignore_for(root, fnames, parent_gitignore)
+                if gitignore is not None:
+                    gitignore.filter(dnames, fnames)
+
+                if max_walk_depth is not None and depth >= max_walk_depth:
+                    del dnames[:]
+                self._inplace_filter_dnames(dnames)
+                self._inplace_filter_fnames(fnames)
+
+                num_files = len(fnames)
+                too_many_files = max_files is not None and num_files >= max_files
+                tree.set_dir_attrs(root_idx, num_dirs=len(dnames),
+                                   num_files=num_files,
+                                   too_many_files=too_many_files)
+
+                if not too_many_files:
+                    for f in fnames:
+                        info = entry_info[f]
+                        isfile = info['isfile']
+                        islink = info['islink']
+                        try:
+                            st = info['entry'].stat()
+                        except OSError:
+                            tree.add_node(root_idx, f, is_dir=False,
+                                          isfile=isfile, islink=islink,
+                                          broken=True)
+                        else:
+                            tree.add_node(root_idx, f, is_dir=False,
+                                          isfile=isfile, islink=islink,
+                                          is_exec=bool(st.st_mode & 0o111),
+                                          size=st.st_size,
+                                          mtime_ns=st.st_mtime_ns,
+                                          inode=st.st_ino)
+
+                # Push in reverse so subdirectories are visited in listed order
+                for d in reversed(dnames):
+                    stack.append((os.path.join(root, d), root_idx, depth + 1,
+                                  entry_info[d]['islink'], gitignore))
+
+        tree.finalize()
+        if self.ignore_empty_dirs:
+            tree.remove_empty_dirs()
+        self.compact = tree
+        self.graph = None
+        self._graph_max_depth = None
+        self._topo_order = None
+
+    def _estimate_unexplored(self, g, pman, max_probes=64, seed=0):
+        """
+        Estimate the stats of directories that were discovered but not listed
+        because the walk ran out of budget. Directories that could not be
+        listed (marked as "unreadable") are not estimated.
+
+        A random subset of at most ``max_probes`` unexplored directories is
+        probed with :func:`_estimate_subtree_stats`, and the remaining ones
+        are assigned the mean of the probed estimates. The estimates are
+        stored in the "estimated_stats" attribute of each directory node and
+        are included when stats are accumulated.
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/budget_walk').delete().ensuredir()
+            >>> for i in range(4):
+            >>>     for j in range(5):
+            >>>         (dpath / f'd{i}/e{j}').ensuredir()
+            >>>         (dpath / f'd{i}/e{j}/data.bin').write_bytes(b'x' * 10)
+            >>> self = DirectoryWalker(dpath, max_nodes=10, show_progress=False,
+            >>>                        colors=False, abs_root_label=False).build()
+            >>> self._update_labels()
+            >>> assert len(self.graph) < 4 * 5 * 2
+            >>> # In a balanced tree the estimated totals are exact
+            >>> print(self.graph.nodes[dpath]['label'])
+            budget_walk: ~bin.size=0.20 KB,bin.files=20
+
+        Example:
+            >>> # Unreadable directories are not estimated
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> from xdev import directory_walker
+            >>> import unittest.mock
+            >>> dpath = ub.Path.appdir('xdev/tests/budget_unreadable').delete().ensuredir()
+            >>> for i in range(6):
+            >>>     (dpath / f'd{i}').ensuredir()
+            >>>     (dpath / f'd{i}/data.bin').write_bytes(b'x' * 10)
+            >>> (dpath / 'locked').ensuredir()
+            >>> def scandir_list(root, _orig=directory_walker._scandir_list):
+            >>>     if root.name == 'locked':
+            >>>         raise PermissionError(root)
+            >>>     return _orig(root)
+            >>> with unittest.mock.patch.object(directory_walker, '_scandir_list', scandir_list):
+            >>>     self = DirectoryWalker(dpath, max_nodes=12, show_progress=False).build()
+            >>> node_data = self.graph.nodes[dpath / 'locked']
+            >>> assert node_data['unreadable']
+            >>> assert not node_data.get('estimated', False)
+            >>> assert any(d.get('estimated', False) for _, d in self.graph.nodes(data=True))
+
+        Example:
+            >>> # With several roots, the budget is shared between them
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/budget_multi_root').delete().ensuredir()
+            >>> roots = [dpath / 'vol1', dpath / 'vol2']
+            >>> for root in roots:
+            >>>     for i in range(10):
+            >>>         (root / f'd{i}').ensuredir()
+            >>>         (root / f'd{i}/data.bin').write_bytes(b'x' * 10)
+            >>> self = DirectoryWalker(roots, max_nodes=15, show_progress=False).build()
+            >>> listed = [n for n, d in self.graph.nodes(data=True) if 'num_files' in d]
+            >>> assert all(root in listed for root in roots)
+        """
+        import random
+        unexplored = [
+            node for node, node_data in g.nodes(data=True)
+            if node_data['type'] == 'dir' and 'num_files' not in node_data and
+            not node_data.get('islink', False) and
+            not node_data.get('unreadable', False)
+        ]
+        if not unexplored:
+            return
+        def filter_listing(dnames, fnames):
+            self._inplace_filter_dnames(dnames)
+            self._inplace_filter_fnames(fnames)
+
+        rng = random.Random(seed)
+        probed = rng.sample(unexplored, min(max_probes, len(unexplored)))
+        estimates = {}
+        for node in pman.progiter(probed, desc='Estimating unexplored directories'):
+            estimates[node] = _estimate_subtree_stats(
+                node, fs=self.fs, rng=rng, filter_listing=filter_listing)
+        mean_stats = ub.ddict(float)
+        for stats in estimates.values():
+            for key, value in stats.items():
+                mean_stats[key] += value / len(estimates)
+        mean_stats = {k: int(round(v)) for k, v in mean_stats.items()}
+        for node in unexplored:
+            node_data = g.nodes[node]
+            node_data['estimated'] = True
+            node_data['estimated_stats'] = estimates.get(node, mean_stats)
+
     @property
     def file_paths(self):
+        if self.compact is not None:
+            return self.compact.file_paths()
         return self._type_to_path.get('file', [])
 
     @property
     def dir_paths(self):
+        if self.compact is not None:
+            return self.compact.dir_paths()
         return self._type_to_path.get('dir', [])
 
     def _accum_stats(self):
-        g = self.graph
-        # Accumulate size stats
-        ### Iterate from leaf-to-root, and accumulate info in directories
-        for node in self._topo_order[::-1]:
-            children = g.succ[node]
-            node_data = g.nodes[node]
-            if node_data['type'] == 'dir':
-                node_data['stats'] = accum_stats = {}
-                for child in children:
-                    child_data = g.nodes[child]
-                    child_stats = child_data.get('stats', {})
-                    for key, stat_value in child_stats.items():
-                        # a collections.Counter might be more efficient
-                        # but we probably want to serialize to dictionary
-                        # after.
-                        if key not in accum_stats:
-                            accum_stats[key] = 0
-                        accum_stats[key] += stat_value
+        """
+        Accumulate the stats of each file into all of its ancestor
+        directories.
+
+        Note:
+            The compact backend does this with a vectorized rollup (see
+            :func:`CompactTree.accumulate_stats`). For a networkx graph,
+            flattening the nodes into arrays costs about as much as this
+            dictionary merge, so it is kept. See
+            ``dev/bench_accum_stats.py``.
+        """
+        _accum_graph_stats(self.graph, self._topo_order)
 
     def _update_stats(self):
+        """
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path(ub.modname_to_modpath('xdev'))
+            >>> serial = DirectoryWalker(dpath, parse_content=True, show_progress=False)
+            >>> serial._walk()
+            >>> serial._update_stats()
+            >>> parallel = DirectoryWalker(dpath, parse_content=True, show_progress=False, workers=2, mode='thread')
+            >>> parallel._walk()
+            >>> parallel._update_stats()
+            >>> s1 = dict(serial.graph.nodes(data='stats'))
+            >>> s2 = dict(parallel.graph.nodes(data='stats'))
+            >>> assert s1 == s2
+        """
+        if self.compact is not None:
+            return self._update_stats_compact()
+
         g = self.graph
-        fs = self.fs
+        func = partial(parse_file_stats, parse_content=self.parse_content,
+                       fs=self.fs)
 
-        # Get size stats for each file.
-        pman = ProgressManager()
-        with pman:
-            prog = pman.progiter(desc='Parse File Info', total=len(g))
-            for fpath, node_data in g.nodes(data=True):
-                if node_data['type'] == 'file':
-                    stats = parse_file_stats(fpath,
-                                             parse_content=self.parse_content, fs=fs)
-                    node_data['stats'] = stats
-                prog.step()
+        cache = None
+        if self.cache and self.parse_content and self.fs is None:
+            cache = FileStatsCache.coerce(self.cache)
+
+        if cache is None:
+            fpaths = None
+        else:
+            # Only parse the files that changed since the last run
+            fpath_to_key = {}
+            for fpath in self.file_paths:
+                key = FileStatsCache.stat_key(
+                    fpath, g.nodes[fpath].get('stat_result', None))
+                if key is not None:
+                    fpath_to_key[fpath] = key
+            if self.refresh_cache:
+                hits = {}
+            else:
+                hits = cache.lookup(fpath_to_key)
+            for fpath, stats in hits.items():
+                g.nodes[fpath]['stats'] = stats
+            fpaths = [p for p in self.file_paths if p not in hits]
+
+        results = self._parallel_process_files(
+            func, desc='Parse File Info', max_workers=self.workers,
+            mode=self.mode, fpaths=fpaths, attrs=['stat_result', 'size'])
+
+        new_entries = []
+        for fpath, stats in results:
+            g.nodes[fpath]['stats'] = stats
+            if cache is not None and fpath in fpath_to_key:
+                new_entries.append((fpath, fpath_to_key[fpath], stats))
+
+        if cache is not None:
+            cache.update(new_entries)
+            cache.close()
         self._accum_stats()
 
-    def _update_stats2(self):
+    def _update_stats_compact(self):
+        """
+        The sizes were captured by the walk, so only content stats need to be
+        computed for the compact backend. The stat results of the walk are
+        reused for the cache keys and sizes, so files are not stat-ed again.
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path(ub.modname_to_modpath('xdev'))
+            >>> cache_fpath = ub.Path.appdir('xdev/tests/compact_cache').delete().ensuredir() / 'cache.sqlite'
+            >>> kw = dict(exclude_dnames=['__pycache__'], parse_content=True, show_progress=False)
+            >>> walker = DirectoryWalker(dpath, backend='compact', cache=cache_fpath, **kw)
+            >>> walker._walk_compact()
+            >>> # Files are not stat-ed again, with and without cache hits
+            >>> import unittest.mock
+            >>> stated = []
+            >>> def record_stat(path, *args, _stat=os.stat, **kwargs):
+            >>>     stated.append(os.fspath(path))
+            >>>     return _stat(path, *args, **kwargs)
+            >>> for _ in range(2):
+            >>>     with unittest.mock.patch('os.stat', side_effect=record_stat):
+            >>>         walker._update_stats_compact()
+            >>> fpaths = set(map(os.fspath, walker.compact.file_paths()))
+            >>> assert len(fpaths) > 10 and not fpaths & set(stated)
+            >>> expected = DirectoryWalker(dpath, cache=False, **kw).build()
+            >>> walker._ensure_graph()
+            >>> assert dict(walker.graph.nodes(data='stats')) == dict(expected.graph.nodes(data='stats'))
+        """
+        tree = self.compact
+        if not self.parse_content:
+            return
+
+        file_idxs = tree.file_indices()
+        fpaths = [tree.path(idx) for idx in file_idxs]
+        path_to_idx = dict(zip(fpaths, file_idxs))
+        broken = (tree.flags & tree.IS_BROKEN) > 0
+        sizes = tree.columns['size']
+
+        # The (mtime_ns, size, inode) key of each file that could be stat-ed
+        fpath_to_key = {
+            fpath: (int(tree.mtime_ns[idx]), int(sizes[idx]), int(tree.inode[idx]))
+            for fpath, idx in zip(fpaths, file_idxs)
+            if not broken[idx]
+        }
 
-        # Variant that uses parallel process boilerplate
-        def worker(fpath):
-            stats = parse_file_stats(fpath, parse_content=self.parse_content)
-            return stats
+        cache = None
+        todo = fpaths
+        if self.cache:
+            cache = FileStatsCache.coerce(self.cache)
+            hits = {} if self.refresh_cache else cache.lookup(fpath_to_key)
+            for fpath, stats in hits.items():
+                tree.set_file_stats(path_to_idx[fpath], stats)
+            todo = [p for p in fpaths if p not in hits]
+
+        # Pass the known sizes so parse_file_stats does not stat the files.
+        # Broken links are stat-ed to record them like the networkx backend.
+        todo_kwargs = [
+            {'size': fpath_to_key[fpath][1]} if fpath in fpath_to_key else {}
+            for fpath in todo
+        ]
+        func = partial(parse_file_stats, parse_content=True)
+        results = self._parallel_process_files(
+            func, desc='Parse File Info', max_workers=self.workers,
+            mode=self.mode, fpaths=todo, file_kwargs=todo_kwargs)
+        new_entries = []
+        for fpath, stats in results:
+            tree.set_file_stats(path_to_idx[fpath], stats)
+            if cache is not None and fpath in fpath_to_key:
+                new_entries.append((fpath, fpath_to_key[fpath], stats))
+        if cache is not None:
+            cache.update(new_entries)
+            cache.close()
+
+    def _parallel_process_files(self, func, desc=None, max_workers=8,
+                                mode='thread', chunksize=None, fpaths=None,
+                                attrs=None, file_kwargs=None):
+        """
+        Applies a function to every file node.
 
-        self._parallel_process_files(worker, 'Parse File Info')
-        self._accum_stats()
+        Files are grouped into chunks so the per-job overhead of the process
+        backend is amortized. Results are yielded in graph order regardless of
+        the order in which the jobs finish.
 
-    def _parallel_process_files(self, func, desc=None, max_workers=8, mode='thread'):
-        """
-        Applies a function to every node.
+        Args:
+            func (Callable[[ub.Path], Any]):
+                function to apply. Must be picklable for the process backend.
+
+            desc (str | None): progress description
+
+            max_workers (int): number of workers. If 0, runs serially.
+
+            mode (str): can be 'serial', 'thread', or 'process'
+
+            chunksize (int | None):
+                number of files per job. Defaults to a value that gives each
+                worker several jobs.
+
+            fpaths (List[ub.Path] | None):
+                the file nodes to process. Defaults to all of them.
+
+            attrs (List[str] | None):
+                names of node attributes that are passed to ``func`` as
+                keyword arguments (None if the node does not have it).
+
+            file_kwargs (List[Dict] | None):
+                keyword arguments passed to ``func`` for each of ``fpaths``.
+                Can be used instead of ``attrs`` when there is no graph.
+
+        Yields:
+            Tuple[ub.Path, Any]: each file path and its result
         """
         graph = self.graph
 
         if desc is None:
             desc = str(func)
 
-        # Get size stats for each file.
-        jobs = ub.JobPool(mode=mode, max_workers=max_workers)
-        pman = ProgressManager(backend='progiter')
-        submit_desc = 'Submit: ' + desc
-        collect_desc = 'Collect: ' + desc
-
-        with pman, jobs:
-            # Get the files from the graph first.
+        if fpaths is None:
             fpaths = [
                 path
                 for path, data in graph.nodes(data=True)
-                if data['isfile']
+                if data['type'] == 'file'
+            ]
+
+        if file_kwargs is not None:
+            items = list(zip(fpaths, file_kwargs))
+        elif attrs:
+            items = [
+                (fpath, {a: graph.nodes[fpath].get(a, None) for a in attrs})
+                for fpath in fpaths
             ]
-            prog = ub.ProgIter(fpaths, desc=submit_desc, total=len(fpaths),
-                               homogeneous=False)
-            for fpath in prog:
-                job = jobs.submit(func, fpath)
-                job.fpath = fpath
-
-            for job in ub.ProgIter(jobs.as_completed(), desc=collect_desc,
-                                   total=len(jobs)):
-                fpath = job.fpath
-                result = job.result()
+        else:
+            items = [(fpath, {}) for fpath in fpaths]
+
+        if max_workers == 0 or mode == 'serial':
+            pman = ProgressManager(enabled=self.show_progress)
+            with pman:
+                for fpath, kw in pman.progiter(items, desc=desc, total=len(items)):
+                    yield fpath, func(fpath, **kw)
+            return
+
+        if chunksize is None:
+            chunksize = max(1, min(512, len(fpaths) // (max_workers * 4)))
+        chunks = list(ub.chunks(items, chunksize=chunksize))
+
+        jobs = ub.JobPool(mode=mode, max_workers=max_workers)
+        pman = ProgressManager(enabled=self.show_progress)
+        with pman, jobs:
+            for chunk_idx, chunk in enumerate(chunks):
+                job = jobs.submit(_apply_chunk, func, chunk)
+                job.chunk_idx = chunk_idx
+
+            chunk_results = [None] * len(chunks)
+            prog = pman.progiter(desc=desc, total=len(fpaths))
+            for job in jobs.as_completed():
+                results = job.result()
+                chunk_results[job.chunk_idx] = results
+                prog.step(len(results))
+
+        for chunk, results in zip(chunks, chunk_results):
+            for (fpath, _), result in zip(chunk, results):
                 yield fpath, result
 
     def _humanize_stats(self, stats, node_type, reduce_prefix=False):
@@ -433,63 +1564,185 @@ class DirectoryWalker:
             raise KeyError(node_type)
         return disp_stats
 
-    def _find_duplicate_files(self):
-        hasher = 'blake3'
-        for path, node_data in self.graph.nodes(data=True):
-            if node_data['isfile']:
-                node_data[hasher] = ub.hash_file(path, hasher=hasher)
+    def find_duplicates(self, max_workers=8, hasher='blake2b'):
+        """
+        Find groups of files with identical content.
 
-        hash_to_paths = ub.ddict(list)
-        for path, node_data in self.graph.nodes(data=True):
-            if node_data['isfile']:
-                hash = node_data[hasher]
-                hash_to_paths[hash].append(path)
-
-        hash_to_paths = ub.udict(hash_to_paths)
-        dups = []
-        for k, v in hash_to_paths.items():
-            if len(v) > 1:
-                dups.append(k)
-        dup_hash_to_paths = hash_to_paths & dups
-        print('dup_hash_to_paths = {}'.format(ub.urepr(dup_hash_to_paths, nl=2)))
+        This uses the sizes captured while walking, so only files that share
+        a size with another file are ever read. See
+        :func:`find_duplicate_files` for details.
+
+        Args:
+            max_workers (int): number of threads used to hash files
+            hasher (str): a hashlib algorithm or "blake3"
+
+        Returns:
+            List[Dict]: the duplicate groups
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path.appdir('xdev/tests/walker_dups').delete().ensuredir()
+            >>> (dpath / 'a.txt').write_text('same')
+            >>> (dpath / 'sub').ensuredir()
+            >>> (dpath / 'sub/b.txt').write_text('same')
+            >>> (dpath / 'sub/c.txt').write_text('diff')
+            >>> for backend in ['networkx', 'compact']:
+            >>>     self = DirectoryWalker(dpath, show_progress=False, backend=backend).build()
+            >>>     groups = self.find_duplicates()
+            >>>     assert len(groups) == 1
+            >>>     assert sorted(p.name for p in groups[0]['paths']) == ['a.txt', 'b.txt']
+            >>> self.write_duplicate_report(groups)
+        """
+        if self.fs is not None:
+            raise NotImplementedError('Finding duplicates does not support fs')
+        if self.graph is None and self.compact is None:
+            self._walk()
+        if self.compact is not None:
+            import numpy as np
+            tree = self.compact
+            flags = tree.flags
+            is_real_file = ((flags & tree.IS_FILE) > 0) & ((flags & tree.IS_LINK) == 0)
+            idxs = np.nonzero(is_real_file)[0]
+            fpaths = [tree.path(idx) for idx in idxs]
+            sizes = tree.columns['size'][idxs].tolist()
+        else:
+            fpaths = []
+            sizes = []
+            for path, node_data in self.graph.nodes(data=True):
+                if node_data['type'] != 'file':
+                    continue
+                islink = node_data.get('islink', None)
+                isfile = node_data.get('isfile', None)
+                if islink is None or isfile is None:
+                    islink = os.path.islink(path)
+                    isfile = os.path.isfile(path)
+                if isfile and not islink:
+                    stat_result = node_data.get('stat_result', None)
+                    fpaths.append(path)
+                    sizes.append(None if stat_result is None else stat_result.st_size)
+        return find_duplicate_files(
+            fpaths, sizes=sizes, max_workers=max_workers, hasher=hasher,
+            show_progress=self.show_progress)
+
+    def write_duplicate_report(self, groups=None):
+        """
+        Print the groups found by :func:`find_duplicates` and the number of
+        bytes that could be reclaimed by removing all but one copy of each.
+
+        Args:
+            groups (List[Dict] | None): precomputed duplicate groups
+        """
+        if groups is None:
+            groups = self.find_duplicates()
+        total_reclaimable = 0
+        for group in sorted(groups, key=lambda g: g['reclaimable']):
+            total_reclaimable += group['reclaimable']
+            rich.print('[yellow]{} copies of {} ({} reclaimable)'.format(
+                len(group['paths']), byte_str(group['size']),
+                byte_str(group['reclaimable'])))
+            for path in group['paths']:
+                print('    ' + os.fspath(path))
+        num_dups = sum(len(group['paths']) - 1 for group in groups)
+        rich.print('Found {} duplicate files in {} groups, {} reclaimable'.format(
+            num_dups, len(groups), byte_str(total_reclaimable)))
 
     def _update_path_metadata(self):
         g = self.graph
         for path in self._topo_order:
             node_data = g.nodes[path]
-
+            self._update_node_metadata(path, node_data)
+
+    def _update_node_metadata(self, path, node_data):
+        if 'islink' in node_data:
+            # Reuse the file types captured while walking
+            islink = node_data['islink']
+            isfile = node_data['isfile']
+            isdir = node_data['isdir']
+        else:
             islink = os.path.islink(path)
             isfile = os.path.isfile(path)
             isdir = os.path.isdir(path)
 
-            if islink:
-                target = os.readlink(path)
-                isbroken = not isdir and not isfile
-                node_data['broken'] = isbroken
-                node_data['target'] = target
+        if islink:
+            target = os.readlink(path)
+            isbroken = not isdir and not isfile
+            node_data['broken'] = isbroken
+            node_data['target'] = target
 
-            if isfile:
+        if isfile and 'X_ok' not in node_data:
+            stat_result = node_data.get('stat_result', None)
+            if stat_result is None:
                 node_data['X_ok'] = os.access(path, os.X_OK)
+            else:
+                node_data['X_ok'] = bool(stat_result.st_mode & 0o111)
+
+        types = []
+        if islink:
+            types.append('L')
+            if isbroken:
+                types.append('B')
+        if isfile:
+            types.append('F')
+        if isdir:
+            types.append('D')
+        typelabel = ''.join(types)
+
+        node_data['islink'] = islink
+        node_data['isfile'] = isfile
+        node_data['isdir'] = isdir
+        node_data['typelabel'] = typelabel
 
-            types = []
-            if islink:
-                types.append('L')
-                if isbroken:
-                    types.append('B')
-            if isfile:
-                types.append('F')
-            if isdir:
-                types.append('D')
-            typelabel = ''.join(types)
+    def _update_labels(self):
+        """
+        Update how each node will be displayed.
 
-            node_data['islink'] = islink
-            node_data['isfile'] = isfile
-            node_data['isdir'] = isdir
-            node_data['typelabel'] = typelabel
+        Note:
+            Rendering does not need this, because :func:`write_network_text`
+            labels nodes on demand. This is only useful to inspect the
+            "label" of every node.
+        """
+        self._update_path_metadata()
+        label_node = self._make_labeler()
+        for path, node_data in self.graph.nodes(data=True):
+            node_data['label'] = label_node(path, node_data)
 
-    def _update_labels(self):
+    def _make_lazy_labeler(self):
         """
-        Update how each node will be displayed
+        Build a label callback for :func:`xdev.util_networkx.write_network_text`
+        that computes the metadata and label of a node only when its line is
+        written, so the cost scales with the number of displayed lines
+        instead of the number of nodes. The label is also stored on the node.
+
+        Returns:
+            Callable[[ub.Path], str]
+
+        Example:
+            >>> from xdev.directory_walker import *  # NOQA
+            >>> dpath = ub.Path(ub.modname_to_modpath('xdev'))
+            >>> self = DirectoryWalker(dpath, exclude_dnames=['__pycache__'],
+            >>>                        show_progress=False, colors=False).build()
+            >>> self.write_network_text(max_depth=1)
+            >>> labeled = [n for n, d in self.graph.nodes(data=True) if 'typelabel' in d]
+            >>> assert labeled == [self.dpath]
+        """
+        label_node = self._make_labeler()
+        nodes = self.graph.nodes
+
+        def lazy_label(path):
+            node_data = nodes[path]
+            if 'typelabel' not in node_data:
+                self._update_node_metadata(path, node_data)
+            node_data['label'] = label = label_node(path, node_data)
+            return label
+        return lazy_label
+
+    def _make_labeler(self):
+        """
+        Build a function that computes the display label of a single node from
+        its path and node data (after :func:`_update_node_metadata`).
+
+        Returns:
+            Callable[[ub.Path, Dict], str]
         """
         from os.path import relpath
         from rich.markup import escape
@@ -519,9 +1772,7 @@ class DirectoryWalker:
         else:
             raise KeyError(pathstyle)
 
-        self._update_path_metadata()
-
-        for path, node_data in self.graph.nodes(data=True):
+        def label_node(path, node_data):
             stats = node_data.get('stats', None)
             node_type = node_data.get('type', None)
 
@@ -533,6 +1784,9 @@ class DirectoryWalker:
             if stats:
                 disp_stats = self._humanize_stats(stats, node_type)
                 stats_text = ub.urepr(disp_stats, nl=0, compact=1)
+                if node_data.get('estimated', False):
+                    # The stats include estimates of unexplored directories
+                    stats_text = '~' + stats_text
                 suffix = ': ' + stats_text
             else:
                 suffix = ''
@@ -601,7 +1855,9 @@ class DirectoryWalker:
                 prefix = ' '.join(prefix_parts) + ' '
             else:
                 prefix = ''
-            node_data['label'] = prefix + pathrep + suffix
+            return prefix + pathrep + suffix
+
+        return label_node
 
     def _sort(self):
         g = self.graph
@@ -627,72 +1883,2118 @@ class DirectoryWalker:
         self.graph = new
 
 
-def parse_file_stats(fpath, parse_content=True, fs=None):
+def _accum_graph_stats(g, topo_order):
     """
-    Get information about a file, including things like number of code lines /
-    documentation lines, if that sort of information is available.
+    Sum the "stats" dictionaries of the children of every "dir" node into
+    the node, from leaf-to-root.
+
+    Directories with "estimated_stats" (see
+    :func:`DirectoryWalker._estimate_unexplored`) start from those, and the
+    "estimated" flag is propagated to their ancestors.
+
+    Args:
+        g (nx.DiGraph): a tree where nodes have a "type" attribute
+        topo_order (List): the nodes of ``g`` in topological order
     """
-    ext = fpath.suffix
-    prefix = ext.lstrip('.') + '.'
-    stats = {}
-    try:
-        if fs is None:
-            stat_obj = fpath.stat()
-            size = stat_obj.st_size
-        else:
-            stat_obj = fs.stat(os.fspath(fpath))
-            size = stat_obj['size']
-    except FileNotFoundError:
-        is_broken = True
-        stats['broken_link'] = True
-        stats['size'] = 0
-    else:
-        is_broken = False
-        stats['size'] = size
+    # Accumulate size stats
+    ### Iterate from leaf-to-root, and accumulate info in directories
+    for node in topo_order[::-1]:
+        children = g.succ[node]
+        node_data = g.nodes[node]
+        if node_data['type'] == 'dir':
+            node_data['stats'] = accum_stats = dict(node_data.get('estimated_stats', {}))
+            for child in children:
+                child_data = g.nodes[child]
+                if child_data.get('estimated', False):
+                    node_data['estimated'] = True
+                child_stats = child_data.get('stats', {})
+                for key, stat_value in child_stats.items():
+                    # a collections.Counter might be more efficient
+                    # but we probably want to serialize to dictionary
+                    # after.
+                    if key not in accum_stats:
+                        accum_stats[key] = 0
+                    accum_stats[key] += stat_value
+
+
+class FileStatsCache:
+    r"""
+    A persistent cache of :func:`parse_file_stats` results.
+
+    Entries are stored in a sqlite database and are keyed on the path of the
+    file. An entry is only considered valid if the (mtime, size, inode) of the
+    file are unchanged. The number of entries is bounded, and when the bound
+    is exceeded the least recently used entries are evicted.
 
-    stats['files'] = 1
+    Example:
+        >>> from xdev.directory_walker import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/stats_cache').delete().ensuredir()
+        >>> fpath1 = dpath / 'file1.py'
+        >>> fpath2 = dpath / 'file2.txt'
+        >>> fpath1.write_text('a = 1\nb = 2\n')
+        >>> fpath2.write_text('foo\n')
+        >>> cache = FileStatsCache(dpath / 'cache.sqlite', max_entries=1)
+        >>> key1 = cache.stat_key(fpath1)
+        >>> key2 = cache.stat_key(fpath2)
+        >>> stats1 = parse_file_stats(fpath1)
+        >>> stats2 = parse_file_stats(fpath2)
+        >>> cache.update([(fpath1, key1, stats1)])
+        >>> assert cache.lookup({fpath1: key1}) == {fpath1: stats1}
+        >>> # A different key invalidates the entry
+        >>> assert cache.lookup({fpath1: key2}) == {}
+        >>> # Adding more entries than the bound evicts the old ones
+        >>> cache.update([(fpath2, key2, stats2)])
+        >>> assert len(cache) == 1
+        >>> assert cache.lookup({fpath1: key1, fpath2: key2}) == {fpath2: stats2}
+        >>> cache.close()
 
-    if not is_broken and parse_content:
-        try:
-            text = fpath.read_text()
-        except UnicodeDecodeError:
-            # Binary file
-            ...
+    Example:
+        >>> # Entries of an unversioned cache have the old stats and are dropped
+        >>> from xdev.directory_walker import *  # NOQA
+        >>> import sqlite3, json
+        >>> dpath = ub.Path.appdir('xdev/tests/stats_cache_version').delete().ensuredir()
+        >>> fpath = dpath / 'file.py'
+        >>> fpath.write_text('# comment\na = 1\n')
+        >>> cache = FileStatsCache(dpath / 'cache.sqlite')
+        >>> key = cache.stat_key(fpath)
+        >>> cache.update([(fpath, key, parse_file_stats(fpath))])
+        >>> cache.close()
+        >>> conn = sqlite3.connect(dpath / 'cache.sqlite')
+        >>> conn.execute('UPDATE file_stats SET stats = ?', [json.dumps({'code_lines': 1})])
+        >>> conn.execute('PRAGMA user_version = 0')
+        >>> conn.commit()
+        >>> conn.close()
+        >>> cache = FileStatsCache(dpath / 'cache.sqlite')
+        >>> assert cache.lookup({fpath: key}) == {}
+        >>> cache.close()
+    """
+    # Increment when the stats produced by parse_file_stats change so old
+    # entries are discarded. Caches written before versioning have a
+    # user_version of 0.
+    #
+    # Version history:
+    #     2: count_python_lines adds comment_lines and blank_lines and counts
+    #        doc_lines as the physical lines spanned by docstrings.
+    #     3: content is analyzed by the CONTENT_ANALYZERS registry and binary
+    #        files are detected from their leading bytes.
+    #     4: string statements that are not docstrings count as comment_lines
+    #        instead of code_lines.
+    version = 4
+
+    def __init__(self, fpath=None, max_entries=2_000_000):
+        """
+        Args:
+            fpath (str | PathLike | None):
+                location of the database. Defaults to a file in the xdev
+                application cache directory.
+
+            max_entries (int):
+                maximum number of files to remember.
+        """
+        if fpath is None:
+            dpath = ub.Path.appdir('xdev', 'dirstats').ensuredir()
+            fpath = dpath / 'file_stats_cache.sqlite'
+        self.fpath = ub.Path(fpath)
+        self.max_entries = max_entries
+        self._conn = None
+
+    @classmethod
+    def coerce(cls, data):
+        """
+        Args:
+            data (bool | str | PathLike | FileStatsCache):
+                True for the default location, or a custom location.
+
+        Returns:
+            FileStatsCache
+        """
+        if isinstance(data, cls):
+            return data
+        elif data is True:
+            return cls()
         else:
-            total_lines = text.count('\n')
-            stats['total_lines'] = total_lines
+            return cls(data)
 
-            if ext == '.py':
-                try:
-                    raw_code = strip_comments_and_newlines(text)
-                    code_lines = raw_code.count('\n')
-                except Exception:
-                    ...
-                else:
-                    stats['code_lines'] = code_lines
+    @staticmethod
+    def stat_key(fpath, stat_result=None):
+        """
+        Args:
+            fpath (str | PathLike): path to a file
 
-                try:
-                    # TODO: this belongs more in the pypackage summarizer
-                    # from xdoctest.core import package_calldefs
-                    from xdoctest.static_analysis import TopLevelVisitor
-                    self = TopLevelVisitor.parse(text)
-                    calldefs = self.calldefs
-                    total_doclines = 0
-                    for k, v in calldefs.items():
-                        if v.docstr is not None:
-                            total_doclines += v.docstr.count('\n')
-                except Exception:
-                    ...
-                else:
-                    stats['doc_lines'] = total_doclines
+            stat_result (os.stat_result | None):
+                the result of stat-ing the file if it is already known.
 
-    stats = {prefix + k: v for k, v in stats.items()}
-    return stats
+        Returns:
+            Tuple[int, int, int] | None:
+                the (mtime_ns, size, inode) of the file or None if it
+                cannot be stat-ed (e.g. broken links).
+        """
+        st = stat_result
+        if st is None:
+            try:
+                st = os.stat(fpath)
+            except OSError:
+                return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
 
+    @property
+    def conn(self):
+        if self._conn is None:
+            import sqlite3
+            self.fpath.parent.ensuredir()
+            self._conn = sqlite3.connect(os.fspath(self.fpath))
+            found = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if found != self.version:
+                self._conn.execute('DROP TABLE IF EXISTS file_stats')
+                self._conn.execute(f'PRAGMA user_version = {self.version:d}')
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_stats (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER,
+                    size INTEGER,
+                    inode INTEGER,
+                    stats TEXT,
+                    last_used INTEGER
+                )
+                """)
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS last_used_idx ON file_stats (last_used)')
+        return self._conn
 
-def strip_comments_and_newlines(source):
-    """
-    Removes hashtag comments from underlying source
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM file_stats').fetchone()[0]
+
+    def _next_tick(self):
+        row = self.conn.execute('SELECT MAX(last_used) FROM file_stats').fetchone()
+        return (row[0] or 0) + 1
+
+    def lookup(self, fpath_to_key):
+        """
+        Find the cached stats for the files that have not changed.
+
+        Args:
+            fpath_to_key (Dict[PathLike, Tuple[int, int, int]]):
+                maps each file to its current :func:`stat_key`.
+
+        Returns:
+            Dict[PathLike, Dict[str, int]]: the cached stats for valid entries
+        """
+        import json
+        conn = self.conn
+        str_to_fpath = {os.fspath(p): p for p in fpath_to_key.keys()}
+        hits = {}
+        for chunk in ub.chunks(list(str_to_fpath), chunksize=500):
+            query = 'SELECT path, mtime_ns, size, inode, stats FROM file_stats WHERE path IN ({})'.format(
+                ','.join(['?'] * len(chunk)))
+            for path, mtime_ns, size, inode, stats in conn.execute(query, chunk):
+                fpath = str_to_fpath[path]
+                if fpath_to_key[fpath] == (mtime_ns, size, inode):
+                    hits[fpath] = json.loads(stats)
+        if hits:
+            tick = self._next_tick()
+            conn.executemany(
+                'UPDATE file_stats SET last_used = ? WHERE path = ?',
+                [(tick, os.fspath(p)) for p in hits])
+            conn.commit()
+        return hits
+
+    def update(self, entries):
+        """
+        Add or replace cache entries and evict old ones if needed.
+
+        Args:
+            entries (Iterable[Tuple[PathLike, Tuple[int, int, int], Dict]]):
+                the path, :func:`stat_key`, and stats of each file.
+        """
+        import json
+        conn = self.conn
+        tick = self._next_tick()
+        rows = [
+            (os.fspath(fpath), key[0], key[1], key[2], json.dumps(stats), tick)
+            for fpath, key, stats in entries
+        ]
+        conn.executemany(
+            'INSERT OR REPLACE INTO file_stats VALUES (?, ?, ?, ?, ?, ?)', rows)
+        self._evict()
+        conn.commit()
+
+    def _evict(self):
+        num_extra = len(self) - self.max_entries
+        if num_extra > 0:
+            self.conn.execute(
+                """
+                DELETE FROM file_stats WHERE path IN (
+                    SELECT path FROM file_stats ORDER BY last_used LIMIT ?
+                )
+                """, (num_extra,))
+
+    def clear(self):
+        self.conn.execute('DELETE FROM file_stats')
+        self.conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class CompactTree:
+    """
+    An array-backed representation of a walked directory tree.
+
+    Nodes are integer indices stored in depth-first preorder, so parents
+    always precede their children and every subtree occupies the contiguous
+    range ``[idx, subtree_end[idx])``. Names and extensions are interned and
+    per-node data is stored in NumPy columns, which is much smaller than a
+    networkx node with a dictionary of attributes per path.
+
+    Per-file stats use the same "kind" names as :func:`parse_file_stats`
+    (e.g. size, files, total_lines), and a directory's stats are computed
+    from the file rows in its subtree range.
+
+    Example:
+        >>> from xdev.directory_walker import *  # NOQA
+        >>> tree = CompactTree('/root')
+        >>> root = tree.add_node(-1, 'root', is_dir=True)
+        >>> a = tree.add_node(root, 'a.py', size=10)
+        >>> sub = tree.add_node(root, 'sub', is_dir=True)
+        >>> b = tree.add_node(sub, 'b.py', size=20)
+        >>> c = tree.add_node(sub, 'c.txt', size=5)
+        >>> empty = tree.add_node(root, 'empty', is_dir=True)
+        >>> tree.finalize()
+        >>> print(tree.path(c))
+        /root/sub/c.txt
+        >>> print(ub.urepr(tree.node_stats(root), nl=0, sort=1))
+        {'py.files': 2, 'py.size': 30, 'txt.files': 1, 'txt.size': 5}
+        >>> print(ub.urepr(tree.node_stats(b), nl=0, sort=1))
+        {'py.files': 1, 'py.size': 20}
+        >>> tree.remove_empty_dirs()
+        >>> assert len(tree) == 5
+        >>> graph = tree.to_networkx()
+        >>> assert set(graph.nodes) == {tree.path(i) for i in range(len(tree))}
+    """
+    # bit flags
+    IS_DIR = 1
+    IS_FILE = 2
+    IS_LINK = 4
+    IS_EXEC = 8
+    IS_BROKEN = 16
+
+    def __init__(self, root):
+        self.root = ub.Path(root)
+        self.names = []
+        self.exts = []
+        self._name_to_idx = {}
+        self._ext_to_idx = {}
+        self._dir_attrs = {}
+        self._parent = []
+        self._depth = []
+        self._name_idx = []
+        self._flags = []
+        self._size = []
+        self._mtime_ns = []
+        self._inode = []
+        self.parent = None
+        self.depth = None
+        self.name_idx = None
+        self.ext_idx = None
+        self.flags = None
+        self.mtime_ns = None
+        self.inode = None
+        self.columns = {}
+        self.present = {}
+        self.subtree_end = None
+        self._dir_stats = None
+        self._finalized = False
+
+    def __len__(self):
+        if self._finalized:
+            return len(self.parent)
+        return len(self._parent)
+
+    def _intern(self, name):
+        idx = self._name_to_idx.get(name, None)
+        if idx is None:
+            idx = self._name_to_idx[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def add_node(self, parent, name, is_dir=False, isfile=None, islink=False,
+                 is_exec=False, size=0, broken=False, mtime_ns=0, inode=0):
+        """
+        Append a node. Nodes must be added in depth-first preorder.
+
+        Args:
+            parent (int): index of the parent node or -1 for the root
+            name (str): the name of the path
+            is_dir (bool): if the node is a directory
+            isfile (bool | None): if the node is a file. Defaults to not is_dir.
+            islink (bool): if the node is a symlink
+            is_exec (bool): if the node is executable
+            size (int): size of the file in bytes
+            broken (bool): if the node is a broken symlink
+            mtime_ns (int): modification time of the file in nanoseconds
+            inode (int): inode of the file
+
+        Returns:
+            int: the index of the new node
+        """
+        if isfile is None:
+            isfile = not is_dir and not broken
+        flags = ((self.IS_DIR * bool(is_dir)) | (self.IS_FILE * bool(isfile)) |
+                 (self.IS_LINK * bool(islink)) | (self.IS_EXEC * bool(is_exec)) |
+                 (self.IS_BROKEN * bool(broken)))
+        idx = len(self._parent)
+        self._parent.append(parent)
+        # The parent was added before its children, so its depth is known
+        self._depth.append(0 if parent < 0 else self._depth[parent] + 1)
+        self._name_idx.append(self._intern(name))
+        self._flags.append(flags)
+        self._size.append(size)
+        self._mtime_ns.append(mtime_ns)
+        self._inode.append(inode)
+        return idx
+
+    def set_dir_attrs(self, idx, **attrs):
+        """
+        Store extra attributes for a directory (e.g. number of files)
+        """
+        if idx not in self._dir_attrs:
+            self._dir_attrs[idx] = {}
+        self._dir_attrs[idx].update(attrs)
+
+    def finalize(self):
+        """
+        Convert the accumulated lists into arrays
+        """
+        import numpy as np
+        self.parent = np.array(self._parent, dtype=np.int64)
+        self.depth = np.array(self._depth, dtype=np.int32)
+        self.name_idx = np.array(self._name_idx, dtype=np.int32)
+        self.flags = np.array(self._flags, dtype=np.uint8)
+        size = np.array(self._size, dtype=np.int64)
+        self.mtime_ns = np.array(self._mtime_ns, dtype=np.int64)
+        self.inode = np.array(self._inode, dtype=np.uint64)
+        self._parent = self._depth = self._name_idx = self._flags = None
+        self._size = self._mtime_ns = self._inode = None
+        self._finalized = True
+
+        n = len(self.parent)
+
+        name_to_ext = {}
+        for name in self.names:
+            ext = _name_suffix(name)
+            if ext not in self._ext_to_idx:
+                self._ext_to_idx[ext] = len(self.exts)
+                self.exts.append(ext)
+            name_to_ext[name] = self._ext_to_idx[ext]
+        lut = np.array([name_to_ext[name] for name in self.names], dtype=np.int32)
+        self.ext_idx = lut[self.name_idx] if n else np.zeros(0, dtype=np.int32)
+
+        is_leaf_file = ~self.is_dir
+        broken = (self.flags & self.IS_BROKEN) > 0
+        self.columns = {
+            'size': size * is_leaf_file,
+            'files': is_leaf_file.astype(np.int64),
+            'broken_link': broken.astype(np.int64),
+        }
+        self.present = {
+            'size': is_leaf_file,
+            'files': is_leaf_file,
+            'broken_link': broken,
+        }
+        self._update_subtree_end()
+
+    def _update_subtree_end(self):
+        import numpy as np
+        ones = np.ones(len(self.parent), dtype=np.int64)
+        subtree_size = _rollup(self.parent, self.depth, ones)
+        self.subtree_end = np.arange(len(self.parent)) + subtree_size
+
+    @property
+    def is_dir(self):
+        return (self.flags & self.IS_DIR) > 0
+
+    def file_indices(self):
+        """
+        Returns:
+            List[int]: indices of the non-directory nodes
+        """
+        import numpy as np
+        return np.nonzero(~self.is_dir)[0].tolist()
+
+    def file_paths(self):
+        return [self.path(idx) for idx in self.file_indices()]
+
+    def dir_paths(self):
+        import numpy as np
+        return [self.path(idx) for idx in np.nonzero(self.is_dir)[0]]
+
+    def path(self, idx):
+        """
+        Args:
+            idx (int): node index
+
+        Returns:
+            ub.Path: the absolute path of the node
+        """
+        parts = []
+        while idx > 0:
+            parts.append(self.names[self.name_idx[idx]])
+            idx = self.parent[idx]
+        return self.root.joinpath(*parts[::-1])
+
+    def set_file_stats(self, idx, stats):
+        """
+        Store the stats returned by :func:`parse_file_stats` for a file.
+
+        Args:
+            idx (int): node index
+            stats (Dict[str, int]): stats with "ext.kind" keys
+        """
+        import numpy as np
+        for key, value in stats.items():
+            kind = key.split('.', 1)[1]
+            if kind not in self.columns:
+                self.columns[kind] = np.zeros(len(self.parent), dtype=np.int64)
+                self.present[kind] = np.zeros(len(self.parent), dtype=bool)
+            self.columns[kind][idx] = value
+            self.present[kind][idx] = True
+        self._dir_stats = None
+
+    def subtree_totals(self, kind):
+        """
+        Args:
+            kind (str): a stat column, e.g. size
+
+        Returns:
+            ndarray: the total value of the column for each subtree
+        """
+        import numpy as np
+        csum = np.concatenate([[0], np.cumsum(self.columns[kind])])
+        return csum[self.subtree_end] - csum[np.arange(len(self.parent))]
+
+    def accumulate_stats(self):
+        """
+        Compute the "ext.kind" stats dictionary of every directory in a single
+        vectorized pass with :func:`_accumulate_stats`.
+
+        Returns:
+            Dict[int, Dict[str, int]]:
+                maps the index of each directory that contains at least one
+                file to its stats.
+        """
+        import numpy as np
+        if self._dir_stats is not None:
+            return self._dir_stats
+        kinds = list(self.columns)
+        num_kinds = len(kinds)
+        keys = [ext.lstrip('.') + '.' + kind
+                for ext in self.exts for kind in kinds]
+        not_dir = ~self.is_dir
+        rows, cols, vals, ranks = [], [], [], []
+        for kind_idx, kind in enumerate(kinds):
+            idxs = np.nonzero(self.present[kind] & not_dir)[0]
+            idxs = idxs[self.parent[idxs] >= 0]
+            rows.append(self.parent[idxs])
+            cols.append(self.ext_idx[idxs].astype(np.int64) * num_kinds + kind_idx)
+            vals.append(self.columns[kind][idxs])
+            ranks.append(idxs)
+        if rows:
+            rows, cols, vals, ranks = map(np.concatenate, (rows, cols, vals, ranks))
+        self._dir_stats = _accumulate_stats(
+            self.parent, self.depth, rows, cols, vals, ranks, keys)
+        return self._dir_stats
+
+    def node_stats(self, idx):
+        """
+        Compute the "ext.kind" stats dictionary for a node in the same format
+        used by the networkx backend.
+
+        Args:
+            idx (int): node index
+
+        Returns:
+            Dict[str, int]
+        """
+        if self.is_dir[idx]:
+            return dict(self.accumulate_stats().get(idx, {}))
+        prefix = self.exts[self.ext_idx[idx]].lstrip('.') + '.'
+        entries = []
+        for kind in self.columns:
+            if self.present[kind][idx]:
+                value = int(self.columns[kind][idx])
+                if kind == 'broken_link':
+                    value = True
+                entries.append((_KIND_ORDER.get(kind, len(_KIND_ORDER)), prefix + kind, value))
+        entries.sort()
+        stats = {key: value for _, key, value in entries}
+        return stats
+
+    def remove_empty_dirs(self):
+        """
+        Remove directories that do not contain any files.
+        """
+        import numpy as np
+        num_files = self.subtree_totals('files')
+        keep = num_files > 0
+        keep[0] = True
+        new_idx = np.cumsum(keep) - 1
+        old_parent = self.parent[keep]
+        self.parent = np.where(old_parent >= 0, new_idx[np.maximum(old_parent, 0)], -1)
+        self.depth = self.depth[keep]
+        self.name_idx = self.name_idx[keep]
+        self.ext_idx = self.ext_idx[keep]
+        self.flags = self.flags[keep]
+        self.mtime_ns = self.mtime_ns[keep]
+        self.inode = self.inode[keep]
+        self.columns = {k: v[keep] for k, v in self.columns.items()}
+        self.present = {k: v[keep] for k, v in self.present.items()}
+        old_idxs = np.nonzero(keep)[0]
+        old_to_new = dict(zip(old_idxs.tolist(), range(len(old_idxs))))
+        self._dir_attrs = {
+            old_to_new[k]: v for k, v in self._dir_attrs.items()
+            if k in old_to_new}
+        self._dir_stats = None
+        self._update_subtree_end()
+
+    def to_networkx(self, max_depth=None):
+        """
+        Convert the tree, or its top levels, into the networkx representation
+        used by :class:`DirectoryWalker`.
+
+        Args:
+            max_depth (int | None):
+                only include nodes up to this depth (the root is depth 0).
+
+        Returns:
+            nx.DiGraph
+        """
+        import numpy as np
+        graph = nx.DiGraph()
+        if max_depth is None:
+            idxs = np.arange(len(self.parent))
+        else:
+            idxs = np.nonzero(self.depth <= max_depth)[0]
+        idx_to_path = {}
+        for idx in idxs.tolist():
+            flags = int(self.flags[idx])
+            isdir = bool(flags & self.IS_DIR)
+            islink = bool(flags & self.IS_LINK)
+            parent = int(self.parent[idx])
+            if parent < 0:
+                path = self.root
+                name = self.root.name
+            else:
+                name = self.names[self.name_idx[idx]]
+                path = idx_to_path[parent] / name
+            idx_to_path[idx] = path
+            node_data = {
+                'name': name,
+                'label': name,
+                'type': 'dir' if isdir else 'file',
+                'isdir': isdir,
+                'isfile': bool(flags & self.IS_FILE),
+                'islink': islink,
+            }
+            if not isdir:
+                node_data['X_ok'] = bool(flags & self.IS_EXEC)
+            if parent < 0:
+                node_data['is_root'] = True
+            node_data.update(self._dir_attrs.get(idx, {}))
+            node_data['stats'] = self.node_stats(idx)
+            graph.add_node(path, **node_data)
+            if parent >= 0:
+                graph.add_edge(idx_to_path[parent], path)
+        return graph
+
+
+def find_duplicate_files(fpaths, sizes=None, max_workers=8, hasher='blake2b',
+                         chunk_size=64 * 1024, min_size=1,
+                         show_progress=False):
+    """
+    Find groups of files with identical content using a staged pipeline.
+
+    1. Group files by size. A file with a unique size cannot have a
+       duplicate, so on most real trees nearly all files are ruled out
+       without being opened.
+
+    2. For files that share a size, hash the first and last ``chunk_size``
+       bytes. Files that are at most twice this size are hashed completely
+       in this step.
+
+    3. For larger files that still collide, hash the full content of each
+       with a memory-mapped read in a thread pool.
+
+    Hard links to the same inode are only considered once, because removing
+    one of them would not free any space. Files that cannot be read are
+    ignored.
+
+    Args:
+        fpaths (List[str | PathLike]): the files to check
+
+        sizes (List[int | None] | None):
+            the size of each file if known. Unknown sizes are computed with
+            :func:`os.stat`.
+
+        max_workers (int): number of threads used to hash files
+
+        hasher (str): a :mod:`hashlib` algorithm name or "blake3"
+
+        chunk_size (int): number of bytes hashed at each end of the file in
+            the second stage.
+
+        min_size (int): ignore files smaller than this. Empty files are
+            skipped by default.
+
+        show_progress (bool): if True show progress of the hashing stages
+
+    Returns:
+        List[Dict]:
+            One item for each group of duplicates with keys: size (of each
+            file), hash (of the content), paths (in input order), and
+            reclaimable (bytes freed by keeping a single copy).
+
+    Example:
+        >>> from xdev.directory_walker import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/find_dups').delete().ensuredir()
+        >>> big = b'x' * 300_000
+        >>> (dpath / 'big1').write_bytes(big)
+        >>> (dpath / 'big2').write_bytes(big)
+        >>> # Same size, head, and tail, but a different middle
+        >>> (dpath / 'big3').write_bytes(big[:150_000] + b'y' + big[150_001:])
+        >>> (dpath / 'small1').write_text('hello')
+        >>> (dpath / 'small2').write_text('hello')
+        >>> (dpath / 'small3').write_text('world')
+        >>> (dpath / 'unique').write_text('unique size')
+        >>> (dpath / 'empty1').touch()
+        >>> (dpath / 'empty2').touch()
+        >>> os.link(dpath / 'small1', dpath / 'small1_link')
+        >>> fpaths = sorted(dpath.ls())
+        >>> groups = find_duplicate_files(fpaths, chunk_size=1024)
+        >>> result = sorted((g['size'], sorted(p.name for p in g['paths']), g['reclaimable'])
+        >>>                 for g in groups)
+        >>> print(ub.urepr(result, nl=1))
+        [
+            (5, ['small1', 'small2'], 5),
+            (300000, ['big1', 'big2'], 300000),
+        ]
+        >>> # The serial path gives the same result
+        >>> assert find_duplicate_files(fpaths, chunk_size=1024, max_workers=0) == groups
+    """
+    fpaths = list(fpaths)
+    if sizes is None:
+        sizes = [None] * len(fpaths)
+
+    # Stage 1: group by size
+    size_to_paths = ub.ddict(list)
+    for fpath, size in zip(fpaths, sizes):
+        if size is None:
+            try:
+                size = os.stat(fpath).st_size
+            except OSError:
+                continue
+        if size >= min_size:
+            size_to_paths[size].append(fpath)
+
+    candidates = []
+    for size, paths in size_to_paths.items():
+        if len(paths) > 1:
+            # Hard links share storage, so only keep one path per inode
+            inode_to_path = {}
+            for fpath in paths:
+                try:
+                    stat_result = os.stat(fpath)
+                except OSError:
+                    continue
+                inode = (stat_result.st_dev, stat_result.st_ino)
+                inode_to_path.setdefault(inode, fpath)
+            if len(inode_to_path) > 1:
+                candidates.extend((fpath, size) for fpath in inode_to_path.values())
+
+    pman = ProgressManager(enabled=show_progress)
+    with pman, ub.Executor(mode='thread', max_workers=max_workers) as executor:
+        # Stage 2: hash the beginning and end of each candidate
+        func = partial(_hash_head_tail, hasher=hasher, chunk_size=chunk_size)
+        hashes = pman.progiter(
+            executor.map(func, candidates), total=len(candidates),
+            desc='Hash file ends')
+        partial_groups = ub.ddict(list)
+        for (fpath, size), hashstr in zip(candidates, hashes):
+            if hashstr is not None:
+                partial_groups[(size, hashstr)].append(fpath)
+
+        # Stage 3: fully hash larger files that still collide
+        final_groups = {}
+        to_hash = []
+        for (size, hashstr), paths in partial_groups.items():
+            if len(paths) > 1:
+                if size > 2 * chunk_size:
+                    to_hash.extend((fpath, size) for fpath in paths)
+                else:
+                    # The ends covered the entire file
+                    final_groups[(size, hashstr)] = paths
+        func = partial(_hash_file_mmap, hasher=hasher)
+        hashes = pman.progiter(
+            executor.map(func, [fpath for fpath, _ in to_hash]),
+            total=len(to_hash), desc='Hash full files')
+        full_groups = ub.ddict(list)
+        for (fpath, size), hashstr in zip(to_hash, hashes):
+            if hashstr is not None:
+                full_groups[(size, hashstr)].append(fpath)
+        final_groups.update(full_groups)
+
+    # Report groups in the order of their first path
+    order = {fpath: idx for idx, fpath in enumerate(fpaths)}
+    groups = []
+    for (size, hashstr), paths in final_groups.items():
+        if len(paths) > 1:
+            paths = sorted(paths, key=order.__getitem__)
+            groups.append({
+                'size': size,
+                'hash': hashstr,
+                'paths': paths,
+                'reclaimable': size * (len(paths) - 1),
+            })
+    groups.sort(key=lambda g: order[g['paths'][0]])
+    return groups
+
+
+def _new_hasher(hasher):
+    if hasher == 'blake3':
+        import blake3
+        return blake3.blake3()
+    import hashlib
+    return hashlib.new(hasher)
+
+
+def _hash_head_tail(item, hasher='blake2b', chunk_size=64 * 1024):
+    """
+    Hash the first and last chunk of a file. If the file is at most two
+    chunks long this is a hash of the entire content.
+
+    Args:
+        item (Tuple[PathLike, int]): the path and size of the file
+
+    Returns:
+        str | None: the hex digest or None if the file cannot be read
+    """
+    fpath, size = item
+    hash_obj = _new_hasher(hasher)
+    try:
+        with open(fpath, 'rb') as file:
+            hash_obj.update(file.read(chunk_size))
+            if size > chunk_size:
+                file.seek(max(chunk_size, size - chunk_size))
+                hash_obj.update(file.read(chunk_size))
+    except OSError:
+        return None
+    return hash_obj.hexdigest()
+
+
+def _hash_file_mmap(fpath, hasher='blake2b'):
+    """
+    Hash the entire content of a non-empty file with a memory-mapped read.
+    The hashlib algorithms release the GIL while hashing large buffers, so
+    this runs in parallel in a thread pool.
+
+    Returns:
+        str | None: the hex digest or None if the file cannot be read
+    """
+    import mmap
+    hash_obj = _new_hasher(hasher)
+    try:
+        with open(fpath, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                hash_obj.update(buf)
+    except (OSError, ValueError):
+        return None
+    return hash_obj.hexdigest()
+
+
+def parse_file_stats(fpath, parse_content=True, fs=None, stat_result=None,
+                     size=None):
+    r"""
+    Get information about a file, including things like number of code lines /
+    documentation lines, if that sort of information is available.
+
+    Files are considered binary if their first 8 KiB contain a NUL byte or
+    are not UTF-8, and their content is not analyzed. Other files are
+    analyzed by the function registered in :data:`CONTENT_ANALYZERS` for
+    their extension or leading bytes. If there is none, only lines are
+    counted, in chunks, so large files are never loaded at once.
+
+    Args:
+        fpath (ub.Path): the file to parse
+
+        parse_content (bool): if True, read the file and analyze its content
+
+        fs (fsspec.spec.AbstractFileSystem | None):
+            experimental: an fsspec filesystem
+
+        stat_result (os.stat_result | None):
+            the result of stat-ing the file if it is already known, which
+            avoids an extra syscall.
+
+        size (int | None):
+            the size of the file if it is already known (e.g. from an fsspec
+            listing), which avoids an extra request.
+
+    Example:
+        >>> from xdev.directory_walker import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/parse_file_stats').delete().ensuredir()
+        >>> (dpath / 'script').write_text('#!/usr/bin/env python\n# comment\nx = 1\n')
+        >>> (dpath / 'data.bin').write_bytes(b'\x00\x01\n\x02')
+        >>> (dpath / 'notes.txt').write_text('a\nb\n')
+        >>> print(parse_file_stats(dpath / 'script'))
+        {'.size': 38, '.files': 1, '.total_lines': 3, '.code_lines': 1, '.doc_lines': 0, '.comment_lines': 2, '.blank_lines': 0}
+        >>> print(parse_file_stats(dpath / 'data.bin'))
+        {'bin.size': 4, 'bin.files': 1}
+        >>> print(parse_file_stats(dpath / 'notes.txt'))
+        {'txt.size': 4, 'txt.files': 1, 'txt.total_lines': 2}
+    """
+    ext = fpath.suffix
+    prefix = ext.lstrip('.') + '.'
+    stats = {}
+    try:
+        if size is not None:
+            ...
+        elif stat_result is not None:
+            size = stat_result.st_size
+        elif fs is None:
+            stat_obj = fpath.stat()
+            size = stat_obj.st_size
+        else:
+            stat_obj = fs.stat(os.fspath(fpath))
+            size = stat_obj['size']
+    except FileNotFoundError:
+        is_broken = True
+        stats['broken_link'] = True
+        stats['size'] = 0
+    else:
+        is_broken = False
+        stats['size'] = size
+
+    stats['files'] = 1
+
+    if not is_broken and parse_content:
+        if fs is None:
+            file = open(fpath, 'rb')
+        else:
+            file = fs.open(os.fspath(fpath), 'rb')
+        with file:
+            head = file.read(_HEAD_SIZE)
+            if not _is_binary(head):
+                analyzer = CONTENT_ANALYZERS.lookup(ext, head)
+                if analyzer is None:
+                    num_lines = head.count(b'\n')
+                    for chunk in iter(lambda: file.read(_CHUNK_SIZE), b''):
+                        num_lines += chunk.count(b'\n')
+                    stats['total_lines'] = num_lines
+                else:
+                    file.seek(0)
+                    stats.update(analyzer(file))
+
+    stats = {prefix + k: v for k, v in stats.items()}
+    return stats
+
+
+_HEAD_SIZE = 8 * 1024
+_CHUNK_SIZE = 1 << 20
+
+
+def _is_binary(head):
+    r"""
+    Guess if a file is binary from its first bytes.
+
+    Args:
+        head (bytes): the start of the file
+
+    Returns:
+        bool: True if there is a NUL byte or the bytes are not UTF-8
+
+    Example:
+        >>> from xdev.directory_walker import _is_binary
+        >>> assert not _is_binary(b'')
+        >>> assert not _is_binary('naïve text'.encode('utf8'))
+        >>> # A multi-byte character cut off at the end is still text
+        >>> assert not _is_binary('naïve'.encode('utf8')[:3])
+        >>> assert _is_binary(b'text\x00with a nul')
+        >>> assert _is_binary(b'\x89PNG\r\n\x1a\n\xff')
+    """
+    import codecs
+    if b'\x00' in head:
+        return True
+    try:
+        codecs.getincrementaldecoder('utf8')().decode(head, final=False)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+class ContentAnalyzerRegistry:
+    """
+    Maps files to the functions used by :func:`parse_file_stats` to analyze
+    their content.
+
+    An analyzer is a function that accepts a binary file object positioned at
+    the start of the file and returns a dictionary of stats like
+    ``total_lines``, ``code_lines``, ``doc_lines``, ``comment_lines``, and
+    ``blank_lines``. Analyzers are looked up by file extension first and then
+    by matching a regex against the first bytes of the file.
+
+    Note:
+        When DirectoryWalker parses files in a process pool, analyzers must
+        be registered when a module the workers import is imported. Cached
+        stats are not invalidated when analyzers change, so use
+        ``refresh_cache=True`` after registering a new one.
+
+    Example:
+        >>> from xdev.directory_walker import *  # NOQA
+        >>> registry = ContentAnalyzerRegistry()
+        >>> @registry.register(exts=['.log'], magic=rb'LOG:')
+        >>> def analyze_log(file):
+        >>>     lines = file.read().splitlines()
+        >>>     return {'total_lines': len(lines)}
+        >>> assert registry.lookup('.log', b'') is analyze_log
+        >>> assert registry.lookup('', b'LOG: started') is analyze_log
+        >>> assert registry.lookup('.txt', b'started') is None
+    """
+
+    def __init__(self):
+        self.ext_to_analyzer = {}
+        self.magic_analyzers = []
+
+    def register(self, exts=None, magic=None):
+        """
+        Decorator that registers an analyzer.
+
+        Args:
+            exts (List[str] | None): extensions (with the leading dot)
+                handled by the analyzer.
+
+            magic (bytes | None): a regex matched against the start of files
+                with an unregistered extension.
+
+        Returns:
+            Callable: the decorator
+        """
+        import re
+
+        def _decor(func):
+            for ext in exts or []:
+                self.ext_to_analyzer[ext] = func
+            if magic is not None:
+                self.magic_analyzers.append((re.compile(magic), func))
+            return func
+        return _decor
+
+    def lookup(self, ext, head):
+        """
+        Args:
+            ext (str): the extension of the file
+
+            head (bytes): the first bytes of the file
+
+        Returns:
+            Callable | None: the analyzer or None if there is not one
+        """
+        analyzer = self.ext_to_analyzer.get(ext, None)
+        if analyzer is None:
+            for pattern, func in self.magic_analyzers:
+                if pattern.match(head):
+                    return func
+        return analyzer
+
+
+CONTENT_ANALYZERS = ContentAnalyzerRegistry()
+
+
+@CONTENT_ANALYZERS.register(exts=['.py', '.pyx', '.pyi'], magic=rb'#![^\n]*python')
+def _analyze_python(file):
+    data = file.read()
+    stats = {'total_lines': data.count(b'\n')}
+    try:
+        text = data.decode('utf8')
+    except UnicodeDecodeError:
+        ...
+    else:
+        stats.update(count_python_lines(text))
+    return stats
+
+
+@CONTENT_ANALYZERS.register(exts=[
+    '.c', '.h', '.cc', '.cpp', '.cxx', '.hh', '.hpp', '.hxx', '.cu',
+    '.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx', '.java', '.rs', '.go'])
+def _analyze_c_like(file):
+    return count_c_like_lines(file)
+
+
+@CONTENT_ANALYZERS.register(exts=['.md', '.markdown'])
+def _analyze_markdown(file):
+    return count_markdown_lines(file)
+
+
+@CONTENT_ANALYZERS.register(exts=['.ipynb'])
+def _analyze_notebook(file):
+    import json
+    data = file.read()
+    stats = {'total_lines': data.count(b'\n')}
+    try:
+        cells = json.loads(data)['cells']
+    except (ValueError, KeyError, TypeError):
+        return stats
+    counts = ub.ddict(int)
+    for cell in cells:
+        source = cell.get('source', '')
+        if not isinstance(source, str):
+            source = ''.join(source)
+        if cell.get('cell_type') == 'code':
+            cell_counts = count_python_lines(source)
+        elif cell.get('cell_type') == 'markdown':
+            cell_counts = count_markdown_lines(source.splitlines())
+            cell_counts.pop('total_lines')
+        else:
+            continue
+        for key, value in cell_counts.items():
+            counts[key] += value
+    stats.update(counts)
+    return stats
+
+
+def count_c_like_lines(lines):
+    r"""
+    Classify lines of a language with C-style ``//`` and ``/* */`` comments
+    as code, comment, or blank.
+
+    This does not parse string literals, so comment markers inside strings
+    are treated as comments. A line with both code and a comment counts as
+    code.
+
+    Args:
+        lines (Iterable[bytes | str]): the lines of the file, e.g. a binary
+            file object, which is read one line at a time.
+
+    Returns:
+        Dict[str, int]: the total_lines, code_lines, comment_lines, and
+            blank_lines
+
+    Example:
+        >>> from xdev.directory_walker import count_c_like_lines
+        >>> text = ub.codeblock(
+        >>>     '''
+        >>>     /*
+        >>>      * Block comment
+        >>>      */
+        >>>     #include <stdio.h>
+        >>>
+        >>>     int main() {  // trailing comment
+        >>>         // line comment
+        >>>         int x = 1; /* inline */ int y = 2;
+        >>>         return 0; /* starts a
+        >>>         block */
+        >>>     }
+        >>>     ''') + '\n'
+        >>> print(count_c_like_lines(text.splitlines(True)))
+        {'total_lines': 11, 'code_lines': 5, 'comment_lines': 5, 'blank_lines': 1}
+    """
+    num_total = num_code = num_comment = num_blank = 0
+    in_block = False
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf8', errors='replace')
+        num_total += 1
+        rest = line.strip()
+        if not rest and not in_block:
+            num_blank += 1
+            continue
+        has_code = False
+        while rest:
+            if in_block:
+                idx = rest.find('*/')
+                if idx < 0:
+                    break
+                in_block = False
+                rest = rest[idx + 2:].lstrip()
+            else:
+                line_idx = rest.find('//')
+                block_idx = rest.find('/*')
+                if line_idx < 0 and block_idx < 0:
+                    has_code = True
+                    break
+                if block_idx < 0 or 0 <= line_idx < block_idx:
+                    has_code = has_code or line_idx > 0
+                    break
+                has_code = has_code or block_idx > 0
+                in_block = True
+                rest = rest[block_idx + 2:]
+        if has_code:
+            num_code += 1
+        else:
+            num_comment += 1
+    counts = {
+        'total_lines': num_total,
+        'code_lines': num_code,
+        'comment_lines': num_comment,
+        'blank_lines': num_blank,
+    }
+    return counts
+
+
+def count_markdown_lines(lines):
+    r"""
+    Classify lines of Markdown as prose (doc), fenced code, or blank.
+
+    Args:
+        lines (Iterable[bytes | str]): the lines of the file, e.g. a binary
+            file object, which is read one line at a time.
+
+    Returns:
+        Dict[str, int]: the total_lines, code_lines, doc_lines, and
+            blank_lines
+
+    Example:
+        >>> from xdev.directory_walker import count_markdown_lines
+        >>> fence = chr(96) * 3
+        >>> text = ub.codeblock(
+        >>>     '''
+        >>>     # Title
+        >>>
+        >>>     Some prose.
+        >>>     {fence}python
+        >>>     x = 1
+        >>>
+        >>>     {fence}
+        >>>     ''').format(fence=fence) + '\n'
+        >>> print(count_markdown_lines(text.splitlines(True)))
+        {'total_lines': 7, 'code_lines': 4, 'doc_lines': 2, 'blank_lines': 1}
+    """
+    num_total = num_code = num_doc = num_blank = 0
+    fence = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf8', errors='replace')
+        num_total += 1
+        stripped = line.strip()
+        if fence is not None:
+            num_code += 1
+            if stripped.startswith(fence):
+                fence = None
+        elif stripped.startswith(('```', '~~~')):
+            num_code += 1
+            fence = stripped[:3]
+        elif not stripped:
+            num_blank += 1
+        else:
+            num_doc += 1
+    counts = {
+        'total_lines': num_total,
+        'code_lines': num_code,
+        'doc_lines': num_doc,
+        'blank_lines': num_blank,
+    }
+    return counts
+
+
+# The order that parse_file_stats produces stat kinds in
+_KIND_ORDER = {
+    k: i for i, k in enumerate([
+        'broken_link', 'size', 'files', 'total_lines', 'code_lines',
+        'doc_lines', 'comment_lines', 'blank_lines'])
+}
+
+
+def _name_suffix(name):
+    """
+    Equivalent to ``pathlib.PurePath(name).suffix`` without creating a path.
+
+    Example:
+        >>> from xdev.directory_walker import _name_suffix
+        >>> for name in ['a.py', 'a.tar.gz', '.bashrc', 'noext', 'a.']:
+        >>>     assert _name_suffix(name) == ub.Path(name).suffix, name
+    """
+    idx = name.rfind('.')
+    if 0 < idx < len(name) - 1:
+        return name[idx:]
+    return ''
+
+
+def _rollup(parent, depth, values, ufunc=None):
+    """
+    Reduce values over each subtree, i.e. each node gets its own value
+    combined with the values of all of its descendants.
+
+    This works level by level from the deepest nodes to the root, and each
+    level is a single vectorized unbuffered ``ufunc.at`` into the parents.
+
+    Args:
+        parent (ndarray): index of the parent of each node (-1 for roots)
+        depth (ndarray): depth of each node (0 for roots)
+        values (ndarray): an N or N x K array of values
+        ufunc (numpy.ufunc | None): the reduction. Defaults to numpy.add.
+
+    Returns:
+        ndarray: the accumulated values
+
+    Example:
+        >>> from xdev.directory_walker import _rollup
+        >>> import numpy as np
+        >>> parent = np.array([-1, 0, 0, 2, 2])
+        >>> depth = np.array([0, 1, 1, 2, 2])
+        >>> values = np.array([0, 1, 0, 2, 3])
+        >>> _rollup(parent, depth, values).tolist()
+        [6, 1, 5, 2, 3]
+        >>> _rollup(parent, depth, np.array([9, 4, 8, 7, 1]), np.minimum).tolist()
+        [1, 4, 1, 7, 1]
+    """
+    import numpy as np
+    if ufunc is None:
+        ufunc = np.add
+    totals = np.array(values, copy=True)
+    if len(totals) == 0:
+        return totals
+    order = np.argsort(depth, kind='stable')
+    sorted_depth = depth[order]
+    max_depth = int(sorted_depth[-1])
+    bounds = np.searchsorted(sorted_depth, np.arange(max_depth + 2))
+    for d in range(max_depth, 0, -1):
+        idxs = order[bounds[d]:bounds[d + 1]]
+        ufunc.at(totals, parent[idxs], totals[idxs])
+    return totals
+
+
+def _accumulate_stats(parent, depth, rows, cols, vals, ranks, keys):
+    """
+    Vectorized bottom-up accumulation of file stats into directories.
+
+    The input is a sparse list of (node, key, value) entries, where each
+    entry is a stat that a file contributes to its parent directory. Entries
+    are combined with a depth-ordered segmented sum: starting from the
+    deepest level, the entries of all nodes on a level are reduced by their
+    (node, key) pair and the results are carried into the parents. Each
+    level is a handful of numpy operations, and the total work is
+    proportional to the size of the output rather than to the number of
+    directories times the number of distinct keys.
+
+    Args:
+        parent (ndarray): index of the parent of each node (-1 for roots)
+        depth (ndarray): depth of each node (0 for roots)
+        rows (ndarray): the node each entry is added to
+        cols (ndarray): the index of the stat key of each entry
+        vals (ndarray): the value of each entry
+        ranks (ndarray):
+            the preorder index of the file each entry comes from, used to
+            order the keys of the output dictionaries.
+        keys (List[str]): the "ext.kind" stat key of each column
+
+    Returns:
+        Dict[int, Dict[str, int]]:
+            The accumulated stats for every node that has at least one entry
+            in its subtree. The keys of each dictionary are ordered by their
+            first appearance in the preorder, which matches summing the child
+            dictionaries in order.
+
+    Example:
+        >>> from xdev.directory_walker import _accumulate_stats
+        >>> import numpy as np
+        >>> import random
+        >>> rng = random.Random(0)
+        >>> # Build a random tree in preorder and a reference accumulation
+        >>> parent, depth, is_dir, file_stats = [-1], [0], [True], [None]
+        >>> stack = [0]
+        >>> for idx in range(1, 300):
+        >>>     stack = stack[:rng.randint(1, len(stack))]
+        >>>     parent.append(stack[-1])
+        >>>     depth.append(depth[stack[-1]] + 1)
+        >>>     if rng.random() < 0.3:
+        >>>         is_dir.append(True)
+        >>>         file_stats.append(None)
+        >>>         stack.append(idx)
+        >>>     else:
+        >>>         ext = rng.choice(['py', 'txt', ''])
+        >>>         stats = {ext + '.size': rng.randint(0, 100), ext + '.files': 1}
+        >>>         if rng.random() < 0.5:
+        >>>             stats[ext + '.total_lines'] = rng.randint(0, 10)
+        >>>         is_dir.append(False)
+        >>>         file_stats.append(stats)
+        >>>         stack.append(stack[-1])
+        >>> ref = {i: {} for i, d in enumerate(is_dir) if d}
+        >>> for idx in reversed(range(len(parent))):
+        >>>     child_stats = ref[idx] if is_dir[idx] else file_stats[idx]
+        >>>     if parent[idx] >= 0:
+        >>>         accum = ref[parent[idx]]
+        >>>         for k, v in child_stats.items():
+        >>>             accum[k] = accum.get(k, 0) + v
+        >>> # Flatten the file stats into entries
+        >>> keys = sorted({k for s in file_stats if s for k in s})
+        >>> entries = [(parent[i], keys.index(k), v, i)
+        >>>            for i, s in enumerate(file_stats) if s
+        >>>            for k, v in s.items()]
+        >>> rows, cols, vals, ranks = map(np.array, zip(*entries))
+        >>> got = _accumulate_stats(np.array(parent), np.array(depth),
+        >>>                         rows, cols, vals, ranks, keys)
+        >>> assert got == {k: v for k, v in ref.items() if v}
+    """
+    import numpy as np
+    num_cols = max(len(keys), 1)
+    codes = np.asarray(rows, dtype=np.int64) * num_cols + np.asarray(cols, dtype=np.int64)
+    vals = np.asarray(vals, dtype=np.int64)
+    ranks = np.asarray(ranks, dtype=np.int64)
+    if len(codes) == 0:
+        return {}
+
+    # Group the initial entries by the depth of the node they belong to
+    entry_depth = depth[codes // num_cols]
+    sortx = np.argsort(entry_depth, kind='stable')
+    entry_depth = entry_depth[sortx]
+    codes, vals, ranks = codes[sortx], vals[sortx], ranks[sortx]
+    max_depth = int(entry_depth[-1])
+    bounds = np.searchsorted(entry_depth, np.arange(max_depth + 2))
+
+    out_codes, out_vals, out_ranks = [], [], []
+    carry_codes = carry_vals = carry_ranks = codes[0:0]
+    for d in range(max_depth, -1, -1):
+        lvl = slice(bounds[d], bounds[d + 1])
+        lvl_codes = np.concatenate([codes[lvl], carry_codes])
+        lvl_vals = np.concatenate([vals[lvl], carry_vals])
+        lvl_ranks = np.concatenate([ranks[lvl], carry_ranks])
+        if len(lvl_codes) == 0:
+            continue
+        # Segmented reduction over identical (node, key) codes
+        sortx = np.argsort(lvl_codes, kind='stable')
+        lvl_codes = lvl_codes[sortx]
+        starts = np.flatnonzero(np.r_[True, lvl_codes[1:] != lvl_codes[:-1]])
+        lvl_codes = lvl_codes[starts]
+        lvl_vals = np.add.reduceat(lvl_vals[sortx], starts)
+        lvl_ranks = np.minimum.reduceat(lvl_ranks[sortx], starts)
+        out_codes.append(lvl_codes)
+        out_vals.append(lvl_vals)
+        out_ranks.append(lvl_ranks)
+        # Carry the reduced entries into the parents
+        lvl_parent = parent[lvl_codes // num_cols]
+        has_parent = lvl_parent >= 0
+        carry_codes = (lvl_parent * num_cols + lvl_codes % num_cols)[has_parent]
+        carry_vals = lvl_vals[has_parent]
+        carry_ranks = lvl_ranks[has_parent]
+
+    codes = np.concatenate(out_codes)
+    vals = np.concatenate(out_vals)
+    ranks = np.concatenate(out_ranks)
+    rows, cols = np.divmod(codes, num_cols)
+
+    # Order the entries of every node by first appearance and then by the
+    # order parse_file_stats writes keys in.
+    key_orders = np.array([
+        _KIND_ORDER.get(key.split('.', 1)[-1], len(_KIND_ORDER))
+        for key in keys], dtype=np.int64)
+    sortx = np.lexsort((cols, key_orders[cols], ranks, rows))
+    rows = rows[sortx]
+    dkeys = [keys[c] for c in cols[sortx].tolist()]
+    dvals = vals[sortx].tolist()
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]).tolist()
+    stops = starts[1:] + [len(rows)]
+    accum = {}
+    for row, start, stop in zip(rows[starts].tolist(), starts, stops):
+        accum[row] = dict(zip(dkeys[start:stop], dvals[start:stop]))
+    return accum
+
+
+def _scandir_walk(top, breadth_first=False, on_unreadable=None):
+    """
+    A top-down :func:`os.walk` built on :func:`os.scandir` that also reports
+    the file type and stat information captured from each
+    :class:`os.DirEntry`, so callers do not need to stat paths again.
+
+    Like :func:`os.walk` with ``followlinks=False``, symlinks to directories
+    are reported in ``dnames`` but are not descended into. Unreadable
+    directories are skipped. Modifying ``dnames`` in place prunes the walk.
+
+    Args:
+        top (ub.Path | List[ub.Path]):
+            the root directory, or several roots, which are walked one after
+            the other, or level by level together if ``breadth_first``.
+
+        breadth_first (bool):
+            if True, yield all directories on one level before the next.
+
+        on_unreadable (Callable[[ub.Path], None] | None):
+            called with each directory that cannot be listed
+
+    Yields:
+        Tuple[ub.Path, List[str], List[str], Dict[str, Dict]]:
+            The root, directory names, file names, and a mapping from each
+            name to its ``isdir``, ``isfile``, ``islink`` and ``stat_result``
+            (which is None for directories and broken links).
+
+    Example:
+        >>> from xdev.directory_walker import _scandir_walk
+        >>> dpath = ub.Path.appdir('xdev/tests/scandir_walk').delete().ensuredir()
+        >>> (dpath / 'dir1/dir2').ensuredir()
+        >>> (dpath / 'dir1/file1.txt').write_text('hello')
+        >>> (dpath / 'file2.txt').touch()
+        >>> results = list(_scandir_walk(dpath))
+        >>> expected = [(r, sorted(d), sorted(f)) for r, d, f in dpath.walk()]
+        >>> got = [(r, sorted(d), sorted(f)) for r, d, f, _ in results]
+        >>> assert got == expected
+        >>> info = results[1][3]['file1.txt']
+        >>> assert info['isfile'] and not info['isdir']
+        >>> assert info['stat_result'].st_size == 5
+        >>> roots = [r for r, *_ in _scandir_walk(dpath, breadth_first=True)]
+        >>> assert roots == [dpath, dpath / 'dir1', dpath / 'dir1/dir2']
+        >>> tops = [dpath / 'dir1', dpath / 'missing', dpath]
+        >>> unreadable = []
+        >>> roots = [r for r, *_ in _scandir_walk(tops, True, unreadable.append)]
+        >>> assert roots == [dpath / 'dir1', dpath, dpath / 'dir1/dir2', dpath / 'dir1', dpath / 'dir1/dir2']
+        >>> assert unreadable == [dpath / 'missing']
+    """
+    from collections import deque
+    tops = [top] if isinstance(top, (str, os.PathLike)) else list(top)
+    stack = deque(tops if breadth_first else tops[::-1])
+    pop = stack.popleft if breadth_first else stack.pop
+    while stack:
+        root = pop()
+        try:
+            dnames, fnames, entry_info = _scandir_list(root)
+        except OSError:
+            if on_unreadable is not None:
+                on_unreadable(root)
+            continue
+
+        yield root, dnames, fnames, entry_info
+
+        # Push in reverse so subdirectories are visited in listed order
+        children = [root / name for name in dnames
+                    if not entry_info.get(name, {}).get('islink', False)]
+        stack.extend(children if breadth_first else children[::-1])
+
+
+def _threaded_scandir_walk(tops, max_workers=8, on_unreadable=None):
+    """
+    A concurrent version of :func:`_scandir_walk` over one or more roots.
+
+    Every directory is listed by a separate job in a thread pool, and the
+    subdirectories of a listing are submitted as soon as the listing is
+    consumed, so workers are never tied to one subtree and large
+    subdirectories are split across all of them. Directories are yielded in
+    the order their listings complete. Modifying ``dnames`` in place prunes
+    the walk.
+
+    Args:
+        tops (List[ub.Path]): the root directories
+        max_workers (int): number of threads used to list directories
+        on_unreadable (Callable[[ub.Path], None] | None):
+            called with each directory that cannot be listed
+
+    Yields:
+        Tuple[ub.Path, List[str], List[str], Dict[str, Dict]]:
+            the same items as :func:`_scandir_walk`
+
+    Example:
+        >>> from xdev.directory_walker import _threaded_scandir_walk, _scandir_walk
+        >>> dpath = ub.Path.appdir('xdev/tests/threaded_walk').delete().ensuredir()
+        >>> for i in range(3):
+        >>>     (dpath / f'root{i}/a/b').ensuredir()
+        >>>     (dpath / f'root{i}/a/file.txt').touch()
+        >>> tops = [dpath / 'root0', dpath / 'root2']
+        >>> got = sorted((r, sorted(d), sorted(f)) for r, d, f, _ in _threaded_scandir_walk(tops, max_workers=4))
+        >>> expected = sorted((r, sorted(d), sorted(f)) for top in tops for r, d, f, _ in _scandir_walk(top))
+        >>> assert got == expected
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+    with ub.Executor(mode='thread', max_workers=max_workers) as executor:
+        pending = {executor.submit(_scandir_list, top): top for top in tops}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    root = pending.pop(future)
+                    try:
+                        dnames, fnames, entry_info = future.result()
+                    except OSError:
+                        if on_unreadable is not None:
+                            on_unreadable(root)
+                        continue
+
+                    yield root, dnames, fnames, entry_info
+
+                    for name in dnames:
+                        if not entry_info.get(name, {}).get('islink', False):
+                            child = root / name
+                            pending[executor.submit(_scandir_list, child)] = child
+        finally:
+            # Do not list the remaining directories if the walk is stopped
+            for future in pending:
+                future.cancel()
+
+
+def _scandir_list(root, stat=True):
+    """
+    List a single directory with :func:`os.scandir`.
+
+    Args:
+        root (ub.Path | str): the directory to list
+
+        stat (bool):
+            if False, files are not stat-ed and their entry info has the
+            :class:`os.DirEntry` in "entry" instead of a "stat_result", so
+            the caller only needs to stat the files it keeps.
+
+    Returns:
+        Tuple[List[str], List[str], Dict[str, Dict]]:
+            directory names, file names, and the entry info of each name as
+            described in :func:`_scandir_walk`.
+
+    Raises:
+        OSError: if the directory cannot be read
+    """
+    dnames = []
+    fnames = []
+    entry_info = {}
+    with os.scandir(root) as scandir_it:
+        for entry in scandir_it:
+            name = entry.name
+            try:
+                isdir = entry.is_dir()
+            except OSError:
+                isdir = False
+            try:
+                islink = entry.is_symlink()
+            except OSError:
+                islink = False
+            if isdir:
+                isfile = False
+                stat_result = None
+                dnames.append(name)
+            else:
+                try:
+                    isfile = entry.is_file()
+                except OSError:
+                    isfile = False
+                if stat:
+                    try:
+                        stat_result = entry.stat()
+                    except OSError:
+                        stat_result = None
+                fnames.append(name)
+            info = {
+                'isdir': isdir,
+                'isfile': isfile,
+                'islink': islink,
+            }
+            if isdir or stat:
+                info['stat_result'] = stat_result
+            else:
+                info['entry'] = entry
+            entry_info[name] = info
+    return dnames, fnames, entry_info
+
+
+def _fsspec_walk(fs, top, max_workers=8, on_unreadable=None):
+    r"""
+    A top-down walk over an fsspec filesystem that yields the same items as
+    :func:`_scandir_walk`.
+
+    Each directory is listed with a single ``fs.ls(path, detail=True)``
+    request, which also returns the size and type of every entry, so the
+    walk makes one request per directory instead of one per file. All
+    directories on the same level are listed concurrently in a thread pool.
+    Modifying ``dnames`` in place prunes the walk.
+
+    Args:
+        fs (fsspec.spec.AbstractFileSystem): the filesystem
+        top (str | List[str]): the root directory or several roots, which
+            are walked level by level together
+        max_workers (int): number of threads used to list directories
+        on_unreadable (Callable[[ub.Path], None] | None):
+            called with each directory that cannot be listed
+
+    Yields:
+        Tuple[ub.Path, List[str], List[str], Dict[str, Dict]]:
+            The root, directory names, file names, and a mapping from each
+            name to its ``isdir``, ``isfile``, ``islink`` and ``size``.
+
+    Example:
+        >>> from xdev.directory_walker import *  # NOQA
+        >>> from xdev.directory_walker import _fsspec_walk
+        >>> import fsspec
+        >>> fs = fsspec.filesystem('memory')
+        >>> root = '/xdev_fsspec_walk'
+        >>> fs.pipe({root + '/a/b/file1.py': b'x = 1\n',
+        >>>          root + '/a/file2.txt': b'hi',
+        >>>          root + '/file3.txt': b'hello'})
+        >>> results = list(_fsspec_walk(fs, root))
+        >>> got = [(r.name, sorted(d), sorted(f)) for r, d, f, _ in results]
+        >>> print(got)
+        [('xdev_fsspec_walk', ['a'], ['file3.txt']), ('a', ['b'], ['file2.txt']), ('b', [], ['file1.py'])]
+        >>> assert results[0][3]['file3.txt']['size'] == 5
+        >>> # The walker only makes one request per directory
+        >>> calls = []
+        >>> orig_ls = fs.ls
+        >>> fs.ls = lambda path, **kw: calls.append(path) or orig_ls(path, **kw)
+        >>> fs.info = fs.stat = None
+        >>> try:
+        >>>     self = DirectoryWalker(root, fs=fs, parse_content=True,
+        >>>                            show_progress=False, colors=False).build()
+        >>> finally:
+        >>>     del fs.ls, fs.info, fs.stat
+        >>> fs.rm(root, recursive=True)
+        >>> assert len(calls) == 3
+        >>> root_stats = self.graph.nodes[self.dpath]['stats']
+        >>> print(ub.urepr(root_stats, nl=0))
+        {'txt.size': 7, 'txt.files': 2, 'txt.total_lines': 0, 'py.size': 6, 'py.files': 1, 'py.total_lines': 1, 'py.code_lines': 1, 'py.doc_lines': 0, 'py.comment_lines': 0, 'py.blank_lines': 0}
+    """
+    level = [top] if isinstance(top, str) else list(top)
+    with ub.Executor(mode='thread', max_workers=max_workers) as executor:
+        while level:
+            listings = executor.map(partial(_fsspec_list, fs), level)
+            next_level = []
+            for root, listing in zip(level, listings):
+                if listing is None:
+                    if on_unreadable is not None:
+                        on_unreadable(ub.Path(root))
+                    continue
+                dnames, fnames, entry_info = listing
+                root = ub.Path(root)
+                yield root, dnames, fnames, entry_info
+                for name in dnames:
+                    if not entry_info[name]['islink']:
+                        next_level.append(os.fspath(root / name))
+            level = next_level
+
+
+def _fsspec_list(fs, root):
+    """
+    List a single directory of an fsspec filesystem in the format of
+    :func:`_scandir_list`, or return None if it cannot be listed.
+    """
+    try:
+        infos = fs.ls(root, detail=True)
+    except (OSError, ValueError):
+        return None
+    dnames = []
+    fnames = []
+    entry_info = {}
+    for info in infos:
+        name = info['name'].rstrip('/').rsplit('/', 1)[-1]
+        if not name:
+            continue
+        isdir = info.get('type', None) == 'directory'
+        if isdir:
+            dnames.append(name)
+        else:
+            fnames.append(name)
+        entry = {
+            'isdir': isdir,
+            'isfile': info.get('type', None) == 'file',
+            'islink': bool(info.get('islink', False)),
+            'size': None if isdir else info.get('size', None),
+        }
+        mode = info.get('mode', None)
+        if mode is not None and not isdir:
+            entry['X_ok'] = bool(mode & 0o111)
+        entry_info[name] = entry
+    return dnames, fnames, entry_info
+
+
+def _estimate_subtree_stats(dpath, fs=None, rng=None, filter_listing=None,
+                            num_probes=3, sample_files=16, max_depth=64):
+    """
+    Estimate the total size and number of files of each extension in a
+    directory without walking it.
+
+    This uses Knuth's random probing estimator: each probe lists a directory,
+    extrapolates the sizes of its files from a random sample of them, then
+    descends into a single random subdirectory. Everything found at a level
+    is weighted by the product of the number of subdirectories on the path to
+    it. This makes one listing per level, and the average over the probes is
+    an unbiased estimate of the totals (up to ``max_depth``).
+
+    Args:
+        dpath (ub.Path): the directory to estimate
+
+        fs (fsspec.spec.AbstractFileSystem | None): an fsspec filesystem
+
+        rng (random.Random | None): random state
+
+        filter_listing (Callable[[List[str], List[str]], Any] | None):
+            modifies directory and file names in place to exclude them.
+
+        num_probes (int): number of random paths to average over
+
+        sample_files (int): maximum files to stat in each directory
+
+        max_depth (int): maximum depth to probe
+
+    Returns:
+        Dict[str, int]: stats in the format of :func:`parse_file_stats`
+            with the "size" and "files" of each extension
+
+    Example:
+        >>> from xdev.directory_walker import *  # NOQA
+        >>> from xdev.directory_walker import _estimate_subtree_stats
+        >>> dpath = ub.Path.appdir('xdev/tests/estimate_subtree').delete().ensuredir()
+        >>> # In a balanced tree the estimate is exact
+        >>> for i in range(3):
+        >>>     for j in range(4):
+        >>>         (dpath / f'd{i}/e{j}').ensuredir()
+        >>>         (dpath / f'd{i}/e{j}/data.bin').write_bytes(b'x' * 100)
+        >>>     (dpath / f'd{i}/notes.txt').write_text('hello')
+        >>> print(_estimate_subtree_stats(dpath))
+        {'txt.size': 15, 'txt.files': 3, 'bin.size': 1200, 'bin.files': 12}
+    """
+    import random
+    if rng is None:
+        rng = random.Random(0)
+    totals = ub.ddict(float)
+    for _ in range(num_probes):
+        weight = 1.0
+        root = ub.Path(dpath)
+        for _ in range(max_depth):
+            if fs is None:
+                listing = _sample_scandir_listing(root, rng, sample_files,
+                                                  filter_listing)
+            else:
+                listing = _sample_fsspec_listing(fs, root, filter_listing)
+            if listing is None:
+                break
+            dnames, ext_stats = listing
+            for ext, (num_files, size) in ext_stats.items():
+                totals[ext + '.size'] += weight * size / num_probes
+                totals[ext + '.files'] += weight * num_files / num_probes
+            if not dnames:
+                break
+            weight *= len(dnames)
+            root = root / rng.choice(dnames)
+    estimate = {k: int(round(v)) for k, v in totals.items()}
+    return estimate
+
+
+def _sample_scandir_listing(root, rng, sample_files, filter_listing=None):
+    """
+    List a directory for :func:`_estimate_subtree_stats`, only stat-ing a
+    random sample of its files.
+
+    Returns:
+        Tuple[List[str], Dict[str, Tuple[int, float]]] | None:
+            the names of (non-link) subdirectories, and the number of files
+            and estimated total size for each extension.
+    """
+    dnames = []
+    name_to_entry = {}
+    try:
+        with os.scandir(root) as scandir_it:
+            for entry in scandir_it:
+                try:
+                    isdir = entry.is_dir()
+                except OSError:
+                    isdir = False
+                if isdir:
+                    # Like the walker, do not descend into directory links
+                    if not entry.is_symlink():
+                        dnames.append(entry.name)
+                else:
+                    name_to_entry[entry.name] = entry
+    except OSError:
+        return None
+    fnames = list(name_to_entry)
+    if filter_listing is not None:
+        filter_listing(dnames, fnames)
+
+    sampled = rng.sample(fnames, min(sample_files, len(fnames)))
+    sample_sizes = ub.ddict(list)
+    for name in sampled:
+        try:
+            size = name_to_entry[name].stat().st_size
+        except OSError:
+            size = 0
+        sample_sizes[_name_suffix(name).lstrip('.')].append(size)
+    all_sizes = list(ub.flatten(sample_sizes.values()))
+    default_mean = sum(all_sizes) / len(all_sizes) if all_sizes else 0
+
+    ext_counts = ub.dict_hist(_name_suffix(name).lstrip('.') for name in fnames)
+    ext_stats = {}
+    for ext, num_files in ext_counts.items():
+        sizes = sample_sizes.get(ext, None)
+        mean = sum(sizes) / len(sizes) if sizes else default_mean
+        ext_stats[ext] = (num_files, num_files * mean)
+    return dnames, ext_stats
+
+
+def _sample_fsspec_listing(fs, root, filter_listing=None):
+    """
+    The fsspec equivalent of :func:`_sample_scandir_listing`. The listing
+    already includes the size of every file, so nothing is sampled.
+    """
+    listing = _fsspec_list(fs, os.fspath(root))
+    if listing is None:
+        return None
+    dnames, fnames, entry_info = listing
+    dnames = [d for d in dnames if not entry_info[d]['islink']]
+    if filter_listing is not None:
+        filter_listing(dnames, fnames)
+    ext_stats = {}
+    for name in fnames:
+        ext = _name_suffix(name).lstrip('.')
+        num_files, size = ext_stats.get(ext, (0, 0))
+        ext_stats[ext] = (num_files + 1, size + (entry_info[name]['size'] or 0))
+    return dnames, ext_stats
+
+
+def _coerce_seconds(value):
+    """
+    Convert a duration like ``10``, ``"10s"``, ``"500ms"``, ``"2m"``, or
+    ``"1h"`` into seconds.
+
+    Example:
+        >>> from xdev.directory_walker import _coerce_seconds
+        >>> print([_coerce_seconds(v) for v in [10, '10s', '500ms', '2m', '1.5h', '3']])
+        [10.0, 10.0, 0.5, 120.0, 5400.0, 3.0]
+    """
+    import re
+    if isinstance(value, str):
+        match = re.fullmatch(r'\s*([0-9.eE+]+)\s*(ms|s|m|h)?\s*', value)
+        if match is None:
+            raise ValueError(f'Cannot interpret {value!r} as a duration')
+        num, unit = match.groups()
+        scale = {None: 1, 's': 1, 'ms': 1e-3, 'm': 60, 'h': 3600}[unit]
+        return float(num) * scale
+    return float(value)
+
+
+# Columns of the rows generated by DirectoryWalker.iter_rows
+_ROW_COLUMNS = ['path', 'parent', 'type', 'size', 'lines', 'ext']
+
+
+def _write_rows_jsonl(rows, fpath):
+    import json
+    num = 0
+    with open(fpath, 'w') as file:
+        for row in rows:
+            file.write(json.dumps(row) + '\n')
+            num += 1
+    return num
+
+
+def _write_rows_sqlite(rows, fpath, batch_size=10_000):
+    import sqlite3
+    num = 0
+    conn = sqlite3.connect(fpath)
+    try:
+        conn.execute(
+            'CREATE TABLE nodes (path TEXT PRIMARY KEY, parent TEXT, '
+            'type TEXT, size INTEGER, lines INTEGER, ext TEXT)')
+        query = 'INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)'
+        for batch in ub.chunks(rows, chunksize=batch_size):
+            conn.executemany(query, [
+                tuple(row[c] for c in _ROW_COLUMNS) for row in batch])
+            num += len(batch)
+        conn.execute('CREATE INDEX nodes_parent ON nodes (parent)')
+        conn.commit()
+    finally:
+        conn.close()
+    return num
+
+
+def _write_rows_parquet(rows, fpath, batch_size=10_000):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([
+        ('path', pa.string()),
+        ('parent', pa.string()),
+        ('type', pa.string()),
+        ('size', pa.int64()),
+        ('lines', pa.int64()),
+        ('ext', pa.string()),
+    ])
+    num = 0
+    with pq.ParquetWriter(fpath, schema) as writer:
+        for batch in ub.chunks(rows, chunksize=batch_size):
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            num += len(batch)
+    return num
+
+
+def _read_snapshot_rows(fpath):
+    """
+    Read the rows written by :func:`DirectoryWalker.export`.
+
+    Args:
+        fpath (str | PathLike): a .jsonl, .parquet, or .sqlite file
+
+    Yields:
+        Dict: a row for each node
+    """
+    fpath = ub.Path(fpath)
+    format = fpath.suffix.lstrip('.').lower()
+    if format == 'jsonl':
+        import json
+        with open(fpath, 'r') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    elif format == 'sqlite':
+        import sqlite3
+        conn = sqlite3.connect(fpath)
+        try:
+            query = 'SELECT {} FROM nodes'.format(', '.join(_ROW_COLUMNS))
+            for values in conn.execute(query):
+                yield dict(zip(_ROW_COLUMNS, values))
+        finally:
+            conn.close()
+    elif format == 'parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(fpath)
+        for batch in parquet_file.iter_batches(columns=_ROW_COLUMNS):
+            yield from batch.to_pylist()
+    else:
+        raise KeyError('Unknown snapshot format {!r}'.format(format))
+
+
+def _apply_chunk(func, items):
+    """
+    Worker helper for :func:`DirectoryWalker._parallel_process_files`.
+    """
+    return [func(item, **kw) for item, kw in items]
+
+
+def count_python_lines(text):
+    r"""
+    Classify every line of Python source as code, comment, blank, or
+    docstring in a single pass.
+
+    The source is parsed once with :mod:`ast` to find the lines spanned by
+    docstrings (of the module, classes, and functions) and by other
+    multi-line strings. Every other line is classified by its first
+    non-whitespace character. A line with both code and a comment counts as
+    code, and the lines inside a multi-line string that is not a docstring
+    count as code. A string statement that is not a docstring (e.g. a quoted
+    out block of code) counts as a comment. If the source cannot be parsed,
+    docstrings are not detected.
+
+    Args:
+        text (str): Python source code
+
+    Returns:
+        Dict[str, int]:
+            the number of code_lines, doc_lines, comment_lines, and
+            blank_lines, which sum to the number of lines.
+
+    Example:
+        >>> from xdev.directory_walker import count_python_lines
+        >>> fmtkw = dict(ddd=chr(34) * 3)
+        >>> text = ub.codeblock(
+        >>>     '''
+        >>>     {ddd}
+        >>>     Module docstring
+        >>>     {ddd}
+        >>>     # comment
+        >>>
+        >>>     def foo(a):  # trailing comment
+        >>>         {ddd}
+        >>>         Function docstring
+        >>>         {ddd}
+        >>>         text = {ddd}
+        >>>         # not a comment
+        >>>
+        >>>         {ddd}
+        >>>         return a
+        >>>     ''').format(**fmtkw)
+        >>> counts = count_python_lines(text)
+        >>> print(counts)
+        {'code_lines': 6, 'doc_lines': 6, 'comment_lines': 1, 'blank_lines': 1}
+        >>> assert sum(counts.values()) == len(text.splitlines())
+        >>> # String statements that are not docstrings are comments
+        >>> text = ub.codeblock(
+        >>>     '''
+        >>>     x = 1
+        >>>     {ddd}
+        >>>     y = 2
+        >>>     {ddd}
+        >>>     def bar(): {ddd}docstring{ddd}
+        >>>     ''').format(**fmtkw)
+        >>> print(count_python_lines(text))
+        {'code_lines': 2, 'doc_lines': 0, 'comment_lines': 3, 'blank_lines': 0}
+        >>> # Invalid code still counts comments and blank lines
+        >>> print(count_python_lines('x = (\n\n# comment\n'))
+        {'code_lines': 1, 'doc_lines': 0, 'comment_lines': 1, 'blank_lines': 1}
+    """
+    import ast
+    lines = text.splitlines()
+    num_lines = len(lines)
+    # 0 = unknown, 1 = code (string interior), 2 = docstring,
+    # 3 = comment (string statement)
+    forced = bytearray(num_lines + 2)
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        tree = None
+
+    if tree is not None:
+        doc_types = (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+        str_types = (ast.Constant, ast.JoinedStr)
+        # Parents are visited before their children, so docstrings and
+        # string statements are marked before the strings inside them.
+        for node in ast.walk(tree):
+            if isinstance(node, str_types):
+                # Lines after the first in a multi-line string are code
+                if node.end_lineno > node.lineno and forced[node.end_lineno] < 2:
+                    if isinstance(node, ast.JoinedStr) or isinstance(node.value, (str, bytes)):
+                        forced[node.lineno + 1:node.end_lineno + 1] = b'\x01' * (node.end_lineno - node.lineno)
+            elif isinstance(node, doc_types) and node.body:
+                first = node.body[0]
+                if (isinstance(first, ast.Expr) and
+                        isinstance(first.value, ast.Constant) and
+                        isinstance(first.value.value, str)):
+                    start = first.lineno
+                    if not isinstance(node, ast.Module) and start == node.lineno:
+                        # The docstring shares a line with the definition
+                        start += 1
+                    stop = first.end_lineno + 1
+                    if stop > start:
+                        forced[start:stop] = b'\x02' * (stop - start)
+            elif (isinstance(node, ast.Expr) and
+                    isinstance(node.value, ast.Constant) and
+                    isinstance(node.value.value, str) and
+                    forced[node.end_lineno] != 2):
+                start = node.lineno
+                line = lines[start - 1]
+                if len(line) - len(line.lstrip()) != node.col_offset:
+                    # The string shares a line with other code
+                    start += 1
+                stop = node.end_lineno + 1
+                if stop > start:
+                    forced[start:stop] = b'\x03' * (stop - start)
+
+    num_code = num_doc = num_comment = num_blank = 0
+    for lineno, line in enumerate(lines, start=1):
+        kind = forced[lineno]
+        if kind == 2:
+            num_doc += 1
+        elif kind == 1:
+            num_code += 1
+        elif kind == 3:
+            num_comment += 1
+        else:
+            stripped = line.lstrip()
+            if not stripped:
+                num_blank += 1
+            elif stripped[0] == '#':
+                num_comment += 1
+            else:
+                num_code += 1
+    counts = {
+        'code_lines': num_code,
+        'doc_lines': num_doc,
+        'comment_lines': num_comment,
+        'blank_lines': num_blank,
+    }
+    return counts
+
+
+def strip_comments_and_newlines(source):
+    """
+    Removes hashtag comments from underlying source
 
     Args:
         source (str | List[str]):
@@ -863,6 +4165,45 @@ def byte_str(num, unit='auto', precision=2):
     return res
 
 
+def _signed_byte_str(num):
+    """
+    Example:
+        >>> from xdev.directory_walker import _signed_byte_str
+        >>> print(_signed_byte_str(10), _signed_byte_str(-2 ** 21))
+        +10 B -2.00 MB
+    """
+    sign = '+' if num >= 0 else '-'
+    num = abs(num)
+    if num < 2 ** 10:
+        return '{}{} B'.format(sign, num)
+    return sign + byte_str(num)
+
+
+def _inplace_filter_names(names, include=None, exclude=None):
+    """
+    Keep the names that match the include pattern and do not match the
+    exclude pattern.
+
+    Args:
+        names (List[str]): modified inplace
+        include (MultiPattern | None): if specified names must match this
+        exclude (MultiPattern | None): if specified names must not match this
+
+    Example:
+        >>> from xdev.directory_walker import _inplace_filter_names
+        >>> names = ['a.py', 'a.pyc', 'b.txt', '.git', 'c.py']
+        >>> _inplace_filter_names(names, MultiPattern.coerce('*.py*'),
+        >>>                       MultiPattern.coerce(['*.pyc', 'c.*']))
+        >>> print(names)
+        ['a.py']
+    """
+    if include is not None:
+        names[:] = it.compress(names, include.match_many(names))
+    if exclude is not None:
+        mask = exclude.match_many(names)
+        names[:] = it.compress(names, map(operator.not_, mask))
+
+
 def _null_coerce(cls, arg, **kwargs):
     if arg is None:
         return arg
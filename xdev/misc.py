@@ -354,7 +354,7 @@ def difftext(text1, text2, context_lines=0, ignore_whitespace=False,
 def tree_repr(cwd=None, max_files=100, dirblocklist=None, show_nfiles='auto',
               return_text=False, return_tree=False, pathstyle='name',
               max_depth=None, with_type=False, abs_root_label=True,
-              ignore_dotprefix=True, colors=not ub.NO_COLOR):
+              ignore_dotprefix=True, colors=not ub.NO_COLOR, stream=False):
     """
     Filesystem tree representation
 
@@ -370,6 +370,33 @@ def tree_repr(cwd=None, max_files=100, dirblocklist=None, show_nfiles='auto',
         maxdepth (int | None): maximum depth to descend
         abs_root_label (bool): if True force the root to always be absolute
         colors (bool): if True use rich
+        stream (bool):
+            if True, print each line as soon as the walk discovers it instead
+            of building the entire tree first. The tree is not returned in
+            this mode.
+
+    Example:
+        >>> import xdev
+        >>> import ubelt as ub
+        >>> dpath = ub.Path.appdir('xdev/tests/test_tree_repr_stream').delete().ensuredir()
+        >>> (dpath / 'dir1/subdir').ensuredir()
+        >>> (dpath / 'dir1/subdir/file1').touch()
+        >>> (dpath / 'dir2').ensuredir()
+        >>> kw = dict(colors=False, return_text=True, abs_root_label=False)
+        >>> text1 = xdev.tree_repr(dpath, **kw)['text']
+        >>> text2 = xdev.tree_repr(dpath, stream=True, **kw)['text']
+        >>> assert text1 == text2
+        >>> print(text2)
+        ╙── test_tree_repr_stream
+            ├─╼ dir1
+            │   └─╼ subdir
+            │       └─╼ file1
+            └─╼ dir2
+        >>> print(xdev.tree_repr(dpath, stream=True, max_depth=2, **kw)['text'])
+        ╙── test_tree_repr_stream
+            ├─╼ dir1
+            │   └─╼  ...
+            └─╼ dir2
 
     SeeAlso:
         xdev.tree - generator
@@ -430,6 +457,7 @@ def tree_repr(cwd=None, max_files=100, dirblocklist=None, show_nfiles='auto',
         cwd,
         exclude_dnames=dirblocklist,
         max_files=max_files,
+        max_walk_depth=max_depth,
         abs_root_label=abs_root_label,
         pathstyle=pathstyle,
         show_nfiles=show_nfiles,
@@ -437,26 +465,39 @@ def tree_repr(cwd=None, max_files=100, dirblocklist=None, show_nfiles='auto',
         show_types=with_type,
         colors=colors,
     )
+
+    if colors:
+        from rich import print as rprint
+    else:
+        rprint = print
+
+    info = {}
+
+    if stream:
+        lines = walker.iter_network_text(max_depth=max_depth)
+        if return_text:
+            info['text'] = '\n'.join(lines) + '\n'
+        else:
+            for line in lines:
+                rprint(line)
+        if return_tree:
+            info['walker'] = walker
+        return info
+
     walker._walk()
-    walker._update_labels()
     tree = walker.graph
 
     from xdev.util_networkx import write_network_text
     import io
     file = io.StringIO()
-    write_network_text(tree, file)
+    write_network_text(tree, file, max_depth=max_depth,
+                       with_labels=walker._make_lazy_labeler())
     text = file.getvalue()
 
-    info = {}
-
     if return_text:
         info['text'] = text
     else:
-        if colors:
-            from rich import print as rprint
-            rprint(text)
-        else:
-            print(text)
+        rprint(text)
 
     if return_tree:
         info['tree'] = tree
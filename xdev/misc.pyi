@@ -44,7 +44,8 @@ def tree_repr(cwd: None | str | PathLike = None,
               with_type: bool = ...,
               abs_root_label: bool = True,
               ignore_dotprefix: bool = ...,
-              colors: bool = ...):
+              colors: bool = ...,
+              stream: bool = False):
     ...
 
 
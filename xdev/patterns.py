@@ -15,6 +15,8 @@ TODO:
 import os
 import re
 import fnmatch
+import operator
+import itertools as it
 import ubelt as ub
 import pathlib
 
@@ -82,6 +84,54 @@ def _maybe_expandable_glob(pat):
     return ('*' in pat or '?' in pat or ('[' in pat and ']' in pat))
 
 
+# When paths are case normalized (e.g. on Windows), fnmatch must be used to
+# match globs
+_NORMCASE_IS_IDENTITY = os.path.normcase('A/b') == 'A/b'
+
+
+def _classify_glob(pat):
+    """
+    Determine the simplest way to check if text matches a glob pattern.
+
+    Args:
+        pat (str): the glob pattern
+
+    Returns:
+        Tuple[str | None, str | None]:
+            The kind of the glob and the text to check with it. The kind is
+            'exact' if there are no special characters, 'suffix' for a
+            single leading '*', 'prefix' for a single trailing '*', and
+            'general' otherwise, in which case the text is the equivalent
+            regex. The kind is None if fnmatch must be used.
+
+    Example:
+        >>> from xdev.patterns import _classify_glob
+        >>> for pat in ['__pycache__', '*.pyc', '.*', '*', '*.py[ci]', '*foo*', 'a?c']:
+        >>>     kind, key = _classify_glob(pat)
+        >>>     print(f'{pat!r:15} {kind!r:10} {key!r}')
+        '__pycache__'   'exact'    '__pycache__'
+        '*.pyc'         'suffix'   '.pyc'
+        '.*'            'prefix'   '.'
+        '*'             'suffix'   ''
+        '*.py[ci]'      'general'  ...
+        '*foo*'         'general'  ...
+        'a?c'           'general'  ...
+    """
+    if not isinstance(pat, str) or not _NORMCASE_IS_IDENTITY:
+        return None, None
+    if '?' in pat or '[' in pat:
+        return 'general', fnmatch.translate(pat)
+    num_stars = pat.count('*')
+    if num_stars == 0:
+        return 'exact', pat
+    elif num_stars == 1 and pat.startswith('*'):
+        return 'suffix', pat[1:]
+    elif num_stars == 1 and pat.endswith('*'):
+        return 'prefix', pat[:-1]
+    else:
+        return 'general', fnmatch.translate(pat)
+
+
 class Pattern(PatternBase, ub.NiceRepr):
     """
     Provides a common API to several common pattern matching syntaxes.
@@ -120,6 +170,10 @@ class Pattern(PatternBase, ub.NiceRepr):
         >>> assert not globpat.match('barfoo')
         >>> globpat = Pattern.coerce('[foo|bar]', 'glob')
         >>> globpat.match('foo')
+        >>> # Simple globs are checked without fnmatch
+        >>> assert Pattern.coerce('*.pyc', 'glob').match('foo.pyc')
+        >>> assert Pattern.coerce('.*', 'glob').match('.git')
+        >>> assert not Pattern.coerce('__pycache__', 'glob').match('__pycache__.py')
 
     Example:
         >>> # xdoctest: +REQUIRES(module:parse)
@@ -142,6 +196,12 @@ class Pattern(PatternBase, ub.NiceRepr):
                 pattern = parse.Parser(pattern)
         self.pattern = pattern
         self.backend = backend
+        self._glob_kind = None
+        self._glob_key = None
+        if backend == 'glob':
+            self._glob_kind, self._glob_key = _classify_glob(pattern)
+            if self._glob_kind == 'general':
+                self._glob_key = re.compile(self._glob_key).match
 
     def __nice__(self) -> str:
         return '{}, {}'.format(self.pattern, self.backend)
@@ -242,8 +302,12 @@ class Pattern(PatternBase, ub.NiceRepr):
             >>> pat2 = Pattern.coerce(pat, 'regex')
             >>> print('pat = {}'.format(ub.urepr(pat, nl=1)))
             >>> print('pat2 = {}'.format(ub.urepr(pat2, nl=1)))
+            >>> # Compiled regexes are wrapped, even though re.Pattern has the same name
+            >>> pat3 = Pattern.coerce(re.compile('foo'))
+            >>> assert pat3.backend == 'regex'
         """
-        if isinstance(data, cls) or type(data).__name__ == cls.__name__:
+        if isinstance(data, cls) or (type(data).__name__ == cls.__name__ and
+                                     not isinstance(data, RE_Pattern)):
             self = data
         else:
             # string
@@ -258,12 +322,65 @@ class Pattern(PatternBase, ub.NiceRepr):
         elif self.backend == 'parse':
             return self.pattern.parse(text)
         elif self.backend == 'glob':
-            return fnmatch.fnmatch(text, self.pattern)
+            kind = self._glob_kind
+            if kind is None:
+                return fnmatch.fnmatch(text, self.pattern)
+            text = os.fspath(text)
+            if kind == 'suffix':
+                return text.endswith(self._glob_key)
+            elif kind == 'exact':
+                return text == self._glob_key
+            elif kind == 'prefix':
+                return text.startswith(self._glob_key)
+            else:
+                return self._glob_key(text) is not None
         elif self.backend == 'strict':
             return self.pattern == text
         else:
             raise KeyError(self.backend)
 
+    def match_many(self, texts):
+        """
+        Check which of many texts match the pattern.
+
+        Equivalent to checking the truth of :func:`Pattern.match` for each
+        text, but regex, strict, and glob patterns check all of the texts in
+        a single :func:`map` call.
+
+        Args:
+            texts (Iterable[str | PathLike]): the texts to check
+
+        Returns:
+            List[bool]: a mask that is True for each text that matches
+
+        Example:
+            >>> names = ['a.py', 'a.pyc', 'b.pyc', 'pyc']
+            >>> print(Pattern.coerce('*.pyc', 'glob').match_many(names))
+            [False, True, True, False]
+            >>> print(Pattern.coerce('[ab].py', 'glob').match_many(names))
+            [True, False, False, False]
+            >>> print(Pattern.coerce('pyc', 'strict').match_many(names))
+            [False, False, False, True]
+            >>> print(Pattern.coerce('b', 'regex').match_many(names))
+            [False, False, True, False]
+        """
+        texts = list(map(os.fspath, texts))
+        backend = self.backend
+        kind = self._glob_kind if backend == 'glob' else None
+        if backend == 'strict' or kind == 'exact':
+            key = self.pattern if backend == 'strict' else self._glob_key
+            return list(map(operator.eq, texts, it.repeat(key)))
+        elif kind == 'suffix':
+            return list(map(str.endswith, texts, it.repeat(self._glob_key)))
+        elif kind == 'prefix':
+            return list(map(str.startswith, texts, it.repeat(self._glob_key)))
+        elif kind == 'general':
+            return list(map(bool, map(self._glob_key, texts)))
+        elif backend == 'regex':
+            return list(map(bool, map(self.pattern.match, texts)))
+        else:
+            return [bool(self.match(t)) for t in texts]
+
     def search(self, text):
         if self.backend == 'regex':
             return self.pattern.search(text)
@@ -293,7 +410,7 @@ class Pattern(PatternBase, ub.NiceRepr):
         elif self.backend == 'glob':
             raise NotImplementedError
         elif self.backend == 'strict':
-            return text.replace(self.pattern, repl, count=count)
+            return text.replace(self.pattern, repl, count)
         else:
             raise KeyError(self.backend)
 
@@ -319,6 +436,60 @@ class Pattern(PatternBase, ub.NiceRepr):
             raise NotImplementedError
 
 
+# Inline flags that apply to the entire regex, which cannot be used inside of
+# an alternation
+_GLOBAL_FLAGS_REGEX = re.compile(r'\(\?[aiLmsux]+\)')
+
+# Backreferences and conditionals refer to groups by number, which would
+# change when the regex is part of an alternation
+_GROUP_NUMBER_REGEX = re.compile(r'\\[1-9]|\(\?\(\d')
+
+
+def _collect_any_leaves(multi, leaves):
+    """
+    Sort the patterns of a MultiPattern with the any predicate (and any nested
+    MultiPatterns with the any predicate) by how they can be matched.
+
+    Args:
+        multi (MultiPattern): the pattern to sort
+
+        leaves (Dict[str, Any]):
+            updated inplace. The "exact" set and the "suffix" and "prefix"
+            lists are updated with the text of strict and simple glob
+            patterns, the "regex" dictionary maps regex flags to the sources
+            of the general glob and regex patterns, and the "other" list is
+            updated with all other patterns.
+    """
+    for pat in multi.patterns:
+        if isinstance(pat, MultiPattern):
+            if pat.predicate is any:
+                _collect_any_leaves(pat, leaves)
+            else:
+                leaves['other'].append(pat)
+            continue
+        backend = getattr(pat, 'backend', None)
+        inner = getattr(pat, 'pattern', None)
+        if backend == 'strict' and isinstance(inner, str):
+            leaves['exact'].add(inner)
+        elif backend == 'glob':
+            kind, key = _classify_glob(inner)
+            if kind == 'exact':
+                leaves['exact'].add(key)
+            elif kind in {'suffix', 'prefix'}:
+                leaves[kind].append(key)
+            elif kind == 'general':
+                leaves['regex'].setdefault(re.UNICODE, []).append(key)
+            else:
+                leaves['other'].append(pat)
+        elif (backend == 'regex' and isinstance(inner, RE_Pattern) and
+              isinstance(inner.pattern, str) and
+              not _GLOBAL_FLAGS_REGEX.search(inner.pattern) and
+              not (inner.groups and _GROUP_NUMBER_REGEX.search(inner.pattern))):
+            leaves['regex'].setdefault(inner.flags, []).append(inner.pattern)
+        else:
+            leaves['other'].append(pat)
+
+
 class MultiPattern(PatternBase, ub.NiceRepr):
     """
     Example:
@@ -343,15 +514,158 @@ class MultiPattern(PatternBase, ub.NiceRepr):
     def __init__(self, patterns, predicate):
         self.predicate = predicate
         self.patterns = patterns
+        self._matcher = None
+        self._batch_matcher = None
 
     def __nice__(self):
         return f'{self.predicate.__name__}({[str(p) for p in self.patterns]})'
 
+    def __getstate__(self):
+        # The compiled matchers are closures, which cannot be pickled
+        state = self.__dict__.copy()
+        state['_matcher'] = None
+        state['_batch_matcher'] = None
+        return state
+
     def match(self, text):
+        """
+        Check if the text matches the patterns.
+
+        The first call compiles the patterns into a single matcher, which is
+        cached on the object, so :attr:`patterns` should not be modified after
+        the first match.
+
+        Args:
+            text (str): the text to check
+
+        Returns:
+            bool
+
+        Example:
+            >>> pat = MultiPattern.coerce([
+            >>>     '*.pyc', '__pycache__', Pattern.coerce('te?mp', 'regex'),
+            >>>     Pattern.coerce('[ab]*.txt', 'glob')])
+            >>> assert pat.match('foo.pyc')
+            >>> assert pat.match('__pycache__')
+            >>> assert pat.match('tmp_file')
+            >>> assert pat.match('a.txt')
+            >>> assert not pat.match('c.txt')
+            >>> assert not pat.match('foo.py')
+            >>> assert not pat.match('__pycache__.py')
+            >>> # The compiled matcher agrees with matching each pattern
+            >>> for text in ['foo.pyc', 'a.txt', 'c.txt', 'x/tmp', 'temp']:
+            >>>     assert pat.match(text) == any(p.match(text) for p in pat.patterns)
+        """
+        matcher = self._matcher
+        if matcher is None:
+            matcher, self._batch_matcher = self._compile_matcher()
+            self._matcher = matcher
+        if not isinstance(text, str):
+            text = os.fspath(text)
+        return matcher(text)
+
+    def match_many(self, texts):
+        """
+        Check which of many texts match the patterns.
+
+        This is equivalent to calling :func:`MultiPattern.match` on each text,
+        but avoids a function call per text, and each combined regex only
+        checks the texts that no simpler pattern matched.
+
+        Args:
+            texts (Iterable[str | PathLike]): the texts to check
+
+        Returns:
+            List[bool]: a mask that is True for each text that matches. Use
+                :func:`itertools.compress` to filter the texts with it.
+
+        Example:
+            >>> import itertools as it
+            >>> pat = MultiPattern.coerce(['*.pyc', '.*', 'build', '*.py[ox]'])
+            >>> names = ['a.py', 'a.pyc', '.git', 'build', 'a.pyx', 'builds']
+            >>> mask = pat.match_many(names)
+            >>> print(mask)
+            [False, True, True, True, True, False]
+            >>> print(list(it.compress(names, mask)))
+            ['a.pyc', '.git', 'build', 'a.pyx']
+            >>> assert mask == [pat.match(n) for n in names]
+        """
+        batch_matcher = self._batch_matcher
+        if batch_matcher is None:
+            self._matcher, batch_matcher = self._compile_matcher()
+            self._batch_matcher = batch_matcher
+        return batch_matcher(list(map(os.fspath, texts)))
+
+    def _match_each(self, text):
         # TODO: when predictate is any, return the first truthy match object
         # When it is all, not sure how to make that work nicely.
         return self.predicate(p.match(text) for p in self.patterns)
 
+    def _compile_matcher(self):
+        """
+        Build a function equivalent to :func:`MultiPattern._match_each`.
+
+        When the predicate is any, strict and glob patterns without special
+        characters are checked with a set lookup, globs like ``*.ext`` and
+        ``prefix*`` with a single :func:`str.endswith` and
+        :func:`str.startswith` call, and the other glob and regex patterns are
+        combined into a single alternation. Patterns that cannot be combined
+        (e.g. parse patterns or regexes with backreferences) are checked one
+        at a time.
+
+        Returns:
+            Tuple[Callable[[str], bool], Callable[[List[str]], List[bool]]]:
+                functions that check one text and a list of texts
+
+        Example:
+            >>> pat = MultiPattern.coerce(['*.pyc', '*.pyi', '.*', 'build', '*.py[ox]'])
+            >>> matcher, batch_matcher = pat._compile_matcher()
+            >>> texts = ['a.pyc', '.git', 'build', 'a.pyx', 'a.py']
+            >>> print([matcher(t) for t in texts])
+            [True, True, True, True, False]
+            >>> assert batch_matcher(texts) == [matcher(t) for t in texts]
+        """
+        if self.predicate is not any:
+            def batch_matcher(texts):
+                return [bool(self._match_each(t)) for t in texts]
+            return self._match_each, batch_matcher
+        leaves = {'exact': set(), 'suffix': [], 'prefix': [], 'regex': {},
+                  'other': []}
+        _collect_any_leaves(self, leaves)
+
+        exact = frozenset(leaves['exact'])
+        suffixes = tuple(leaves['suffix'])
+        prefixes = tuple(leaves['prefix'])
+        checks = []
+        for flags, sources in leaves['regex'].items():
+            if flags & re.VERBOSE:
+                # a trailing comment must not hide the closing parenthesis
+                sources = [s + '\n' for s in sources]
+            combined = '|'.join('(?:{})'.format(s) for s in sources)
+            try:
+                checks.append(re.compile(combined, flags).match)
+            except re.error:
+                checks.extend(re.compile(s, flags).match for s in sources)
+        checks.extend(p.match for p in leaves['other'])
+
+        def matcher(text):
+            if (text in exact or text.endswith(suffixes) or
+                    text.startswith(prefixes)):
+                return True
+            for check in checks:
+                if check(text):
+                    return True
+            return False
+
+        def batch_matcher(texts):
+            mask = [t in exact or t.endswith(suffixes) or t.startswith(prefixes)
+                    for t in texts]
+            for check in checks:
+                # only check the texts that did not match yet
+                mask = [m or bool(check(t)) for m, t in zip(mask, texts)]
+            return mask
+        return matcher, batch_matcher
+
     def paths(self, cwd=None, recursive=False):
         groups = (p.paths(cwd=cwd, recursive=recursive) for p in self.patterns)
         if self.predicate in {any}:  # all}:
@@ -1,5 +1,7 @@
 import ubelt as ub
 from _typeshed import Incomplete
+from os import PathLike
+from typing import Iterable, List
 from collections.abc import Generator
 
 RE_Pattern: Incomplete
@@ -60,6 +62,9 @@ class Pattern(PatternBase, ub.NiceRepr):
     def match(self, text):
         ...
 
+    def match_many(self, texts: Iterable[str | PathLike]) -> List[bool]:
+        ...
+
     def search(self, text):
         ...
 
@@ -82,7 +87,13 @@ class MultiPattern(PatternBase, ub.NiceRepr):
     def __nice__(self):
         ...
 
-    def match(self, text):
+    def __getstate__(self):
+        ...
+
+    def match(self, text: str) -> bool:
+        ...
+
+    def match_many(self, texts: Iterable[str | PathLike]) -> List[bool]:
         ...
 
     def paths(self,
@@ -5,11 +5,21 @@ Porting from ~/local/rob/rob/rob_nav.py / ubelt
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 import os
+import re
+import operator
+import itertools as it
 import ubelt as ub
+from functools import lru_cache
 from os.path import relpath, split, join, abspath
 from xdev.patterns import Pattern, RE_Pattern  # NOQA
 from xdev.patterns import MultiPattern
 
+try:
+    from re import _parser as sre_parse
+except ImportError:  # nocover
+    # Python < 3.11
+    import sre_parse
+
 # try:
 #     from packaging.version import parse as parse_version
 # except Exception:
@@ -49,24 +59,42 @@ class GrepResult(ub.NiceRepr):
         fmt_str = '{} : {:' + ndigits + 'd} |{}'
         ret = 'Found {} line(s) in {!r}: '.format(len(self), self.fpath)
         app('----------------------')
-        color = 'red'
+        color = 'red' if color else None
         app(ret)
         for (lx, line) in zip(self.found_lxs, self.found_lines):
-            line = line.replace('\n', '')
-            if color and self.pattern:
-                found = self.pattern.search(line)
-                s, t = found.span()
-                line = line[:s] + ub.color_text(line[s:t], color) + line[t:]
-            app(fmt_str.format(fname, lx, line))
+            if isinstance(line, bytes):
+                # Lines found by bytes patterns are only decoded for display
+                line = line.replace(b'\n', b'')
+                parts = [line]
+                if color and self.pattern:
+                    s, t = self.pattern.search(line).span()
+                    parts = [line[:s], line[s:t], line[t:]]
+                parts = [p.decode('utf8', errors='replace') for p in parts]
+            else:
+                line = line.replace('\n', '')
+                parts = [line]
+                if color and self.pattern:
+                    s, t = self.pattern.search(line).span()
+                    parts = [line[:s], line[s:t], line[t:]]
+            if len(parts) == 3:
+                parts[1] = ub.color_text(parts[1], color)
+            app(fmt_str.format(fname, lx, ''.join(parts)))
 
         return '\n'.join(summary)
 
 
 def sed(regexpr, repl, dpath=None, include=None, exclude=None,
-        dirblocklist=None, recursive=True, dry=False, verbose=1):
+        dirblocklist=None, recursive=True, dry=False, verbose=1,
+        respect_gitignore=False, max_workers=0, mode='thread',
+        all_or_nothing=False, prefetch=0):
     r"""
     Execute a sed on multiple files.
 
+    The replacements of each file are computed in a thread or process pool,
+    and then all files are written (see :func:`apply_sed_results`). The
+    results are returned, so the replacements of a dry run can be reviewed
+    and written later without searching the files again.
+
     Args:
         regexpr (str | Pattern): pattern to find
         repl (str): the text to replace the found pattern with
@@ -76,41 +104,255 @@ def sed(regexpr, repl, dpath=None, include=None, exclude=None,
         dirblocklist (str | List[str] | MultiPattern | None): passed to :func:`find`.
         recursive (bool): passed to :func:`find`.
         dry (bool): if True does not apply edits
-        verbose (int): verbosity level
+        verbose (int): verbosity level. If 1 or more, print the diff of
+            every changed file.
+        respect_gitignore (bool): passed to :func:`find`.
+        max_workers (int): number of workers. If 0, run serially.
+        mode (str): can be 'serial', 'thread', or 'process'
+        all_or_nothing (bool): passed to :func:`apply_sed_results`.
+        prefetch (int): passed to :func:`find`.
+
+    Returns:
+        List[SedResult]: the results of the files that change
 
     Example:
         >>> from xdev.search_replace import *  # NOQA
         >>> from xdev.search_replace import _create_test_filesystem
         >>> dpath = _create_test_filesystem()['root']
         >>> sed('a', 'x', dpath=dpath, dry=True)
+
+    Example:
+        >>> # Review a dry run, then write the same replacements
+        >>> from xdev.search_replace import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/sed_reuse').delete().ensuredir()
+        >>> for i in range(8):
+        >>>     (dpath / f'file{i}.txt').write_text(f'foo {i}\nbar\n' * (i % 2))
+        >>> results = sed('foo', 'baz', dpath=dpath, dry=True, verbose=0, max_workers=2)
+        >>> print(sorted(ub.Path(r.fpath).name for r in results))
+        ['file1.txt', 'file3.txt', 'file5.txt', 'file7.txt']
+        >>> assert (dpath / 'file1.txt').read_text() == 'foo 1\nbar\n'
+        >>> apply_sed_results(results, verbose=0)
+        >>> assert (dpath / 'file1.txt').read_text() == 'baz 1\nbar\n'
     """
     num_changed = 0
     num_files_checked = 0
     num_skipped = 0
-    fpaths_changed = []
+    sed_results = []
 
+    pattern = Pattern.coerce(regexpr, hint='regex')
     fpath_generator = find(dpath=dpath, type='f', include=include,
-                           exclude=exclude, dirblocklist=dirblocklist, recursive=recursive)
-    for fpath in fpath_generator:
-        try:
-            changed_lines = sedfile(fpath, regexpr, repl, dry=dry)
-        except UnicodeDecodeError:
+                           exclude=exclude, dirblocklist=dirblocklist, recursive=recursive,
+                           respect_gitignore=respect_gitignore,
+                           prefetch=prefetch)
+    results = _imap_chunked(_sed_prepare_or_skip, fpath_generator,
+                            args=(pattern, repl), max_workers=max_workers,
+                            mode=mode)
+    for result in results:
+        if result is None:
             num_skipped += 1
-        else:
-            num_files_checked += 1
-            if len(changed_lines) > 0:
-                fpaths_changed.append(fpath)
-                num_changed += len(changed_lines)
+            continue
+        num_files_checked += 1
+        if len(result) > 0:
+            if verbose:
+                result._print_summary(dry=dry)
+                print(result.format_diff())
+            sed_results.append(result)
+            num_changed += len(result)
+
+    if not dry:
+        apply_sed_results(sed_results, all_or_nothing=all_or_nothing,
+                          verbose=verbose)
 
     if verbose:
+        fpaths_changed = [r.fpath for r in sed_results]
         print('num_files_checked = {}'.format(num_files_checked))
         print('num probable binary files skipped = {}'.format(num_skipped))
         print('fpaths_changed = {}'.format(ub.repr2(sorted(fpaths_changed))))
         print('total lines changed = {!r}'.format(num_changed))
+    return sed_results
+
+
+def apply_sed_results(sed_results, all_or_nothing=False, verbose=1):
+    r"""
+    Write the replacements computed by :func:`sed` or :func:`sedfile`.
+
+    Each file is written to a temporary file in the same directory, which is
+    then renamed over the original, so a file is never left partially
+    written. A file that was modified after its replacements were computed
+    is not overwritten and raises an error.
+
+    Args:
+        sed_results (List[SedResult]): the results to write
+
+        all_or_nothing (bool):
+            if True, all files are staged as temporary files before any
+            of them is replaced, and if writing any file fails, the files
+            that were already replaced are restored. Otherwise files are
+            written one at a time, and the files before a failure remain
+            written.
+
+        verbose (int): verbosity level
+
+    Example:
+        >>> from xdev.search_replace import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/sed_rollback').delete().ensuredir()
+        >>> fpath1 = dpath / 'file1.txt'
+        >>> fpath2 = dpath / 'file2.txt'
+        >>> fpath1.write_text('foo\n')
+        >>> fpath2.write_text('foo\n')
+        >>> results = sed('foo', 'bar', dpath=dpath, dry=True, verbose=0)
+        >>> # Modify one of the files after the dry run
+        >>> fpath2.write_text('foo changed\n')
+        >>> import pytest
+        >>> with pytest.raises(RuntimeError):
+        >>>     apply_sed_results(results, all_or_nothing=True, verbose=0)
+        >>> # Nothing was written
+        >>> assert fpath1.read_text() == 'foo\n'
+        >>> assert fpath2.read_text() == 'foo changed\n'
+        >>> assert sorted(p.name for p in dpath.iterdir()) == ['file1.txt', 'file2.txt']
+    """
+    if not all_or_nothing:
+        for result in sed_results:
+            if verbose:
+                print(' ! WRITING CHANGES to {!r}'.format(result.fpath))
+            result.write()
+        return
+
+    staged = []
+    replaced = []
+    try:
+        for result in sed_results:
+            staged.append((result, result._stage()))
+        for result, (target, tmp_fpath) in staged:
+            backup_fpath = _make_backup(target)
+            replaced.append((target, backup_fpath))
+            if verbose:
+                print(' ! WRITING CHANGES to {!r}'.format(result.fpath))
+            os.replace(tmp_fpath, target)
+    except BaseException:
+        for target, backup_fpath in reversed(replaced):
+            os.replace(backup_fpath, target)
+        for _, (_, tmp_fpath) in staged:
+            ub.Path(tmp_fpath).delete()
+        raise
+    else:
+        for _, backup_fpath in replaced:
+            ub.Path(backup_fpath).delete()
+
+
+class SedResult(ub.NiceRepr):
+    """
+    The replacements :func:`sedfile` computed for a file, which can be shown
+    and written later without searching the file again.
+
+    Attributes:
+        fpath (str | PathLike): the file
+        old_text (str | None): the text that was searched
+        new_text (str | None): the text with the replacements
+        changed_lines (List[Tuple[str, str]]): the new and old version of each
+            line that changed
+        stat_key (Tuple[int, int]): the mtime (in nanoseconds) and size of the
+            file when it was read
+    """
+
+    def __init__(self, fpath, old_text, new_text, changed_lines, stat_key):
+        self.fpath = fpath
+        self.old_text = old_text
+        self.new_text = new_text
+        self.changed_lines = changed_lines
+        self.stat_key = stat_key
+
+    def __nice__(self):
+        return '{} lines in {}'.format(len(self), self.fpath)
+
+    def __len__(self):
+        return len(self.changed_lines)
+
+    def _print_summary(self, dry):
+        mode_text = ['(real-run)', '(dry-run)'][dry]
+        try:
+            rel_fpath = relpath(self.fpath, os.getcwd())
+        except ValueError:
+            # windows issues
+            rel_fpath = abspath(self.fpath)
+        print(' * {} changed {} lines in {!r} '.format(
+            mode_text, len(self), rel_fpath))
+        print(' * --------------------')
+
+    def format_diff(self, colored=True):
+        """
+        Returns:
+            str: the difference between the old and new text
+        """
+        import xdev
+        return xdev.difftext(self.old_text, self.new_text, colored=colored)
+
+    def write(self):
+        """
+        Atomically replace the file with the new text.
+
+        Raises:
+            RuntimeError: if the file changed since it was read
+        """
+        target, tmp_fpath = self._stage()
+        try:
+            os.replace(tmp_fpath, target)
+        except BaseException:
+            ub.Path(tmp_fpath).delete()
+            raise
+
+    def _stage(self):
+        """
+        Write the new text to a temporary file next to the file.
+
+        Returns:
+            Tuple[str, str]: the file to replace (symlinks are resolved) and
+                the temporary file
+        """
+        import shutil
+        import tempfile
+        target = os.path.realpath(self.fpath)
+        if _stat_key(target) != self.stat_key:
+            raise RuntimeError(
+                'Not writing fpath={!r} because it was modified after the '
+                'replacements were computed'.format(self.fpath))
+        dpath, fname = split(target)
+        fd, tmp_fpath = tempfile.mkstemp(prefix='.' + fname + '.',
+                                         suffix='.tmp', dir=dpath)
+        try:
+            with open(fd, 'w') as file:
+                file.write(self.new_text)
+            shutil.copymode(target, tmp_fpath)
+        except BaseException:
+            ub.Path(tmp_fpath).delete()
+            raise
+        return target, tmp_fpath
+
+
+def _stat_key(fpath):
+    st = os.stat(fpath)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _make_backup(fpath):
+    """
+    Keep the current content of a file at a new path next to it, which is a
+    hard link when the filesystem supports it.
+    """
+    import shutil
+    import uuid
+    dpath, fname = split(fpath)
+    backup_fpath = join(dpath, '.{}.{}.bak'.format(fname, uuid.uuid4().hex[:8]))
+    try:
+        os.link(fpath, backup_fpath)
+    except OSError:
+        shutil.copy2(fpath, backup_fpath)
+    return backup_fpath
 
 
 def grep(regexpr, dpath=None, include=None, exclude=None, recursive=True,
-         dirblocklist=None, verbose=1):
+         dirblocklist=None, verbose=1, respect_gitignore=False,
+         max_workers=0, mode='thread', index=None, prefetch=0):
     r"""
     Execute a grep on multiple files.
 
@@ -122,6 +364,12 @@ def grep(regexpr, dpath=None, include=None, exclude=None, recursive=True,
         recursive (bool): passed to :func:`find`.
         dirblocklist (str | List[str] | MultiPattern | None): passed to :func:`find`.
         verbose (int): verbosity level
+        respect_gitignore (bool): passed to :func:`find`.
+        max_workers (int): passed to :func:`iter_grep`.
+        mode (str): passed to :func:`iter_grep`.
+        index (bool | str | PathLike | TrigramIndex | None): passed to
+            :func:`iter_grep`.
+        prefetch (int): passed to :func:`find`.
 
     Returns:
         List[GrepResult]:
@@ -134,14 +382,17 @@ def grep(regexpr, dpath=None, include=None, exclude=None, recursive=True,
     """
     grep_results = []
 
-    fpath_generator = find(dpath=dpath, type='f', include=include,
-                           exclude=exclude, recursive=recursive,
-                           dirblocklist=dirblocklist)
+    results = iter_grep(regexpr, dpath=dpath, include=include,
+                        exclude=exclude, recursive=recursive,
+                        dirblocklist=dirblocklist,
+                        respect_gitignore=respect_gitignore,
+                        max_workers=max_workers, mode=mode, index=index,
+                        verbose=verbose, prefetch=prefetch)
 
-    for fpath in fpath_generator:
-        grepres = grepfile(fpath, regexpr, verbose=verbose)
-        if grepres:
-            grep_results.append(grepres)
+    for grepres in results:
+        if verbose:
+            print(grepres.format_text())
+        grep_results.append(grepres)
 
     if verbose:
         print('====================')
@@ -152,9 +403,132 @@ def grep(regexpr, dpath=None, include=None, exclude=None, recursive=True,
     return grep_results
 
 
-def find(pattern=None, dpath=None, include=None, exclude=None,
-         dirblocklist=None, type=None, recursive=True, followlinks=False):
+def iter_grep(regexpr, dpath=None, include=None, exclude=None, recursive=True,
+              dirblocklist=None, respect_gitignore=False, max_workers=0,
+              mode='thread', chunksize=16, index=None, verbose=0,
+              prefetch=0):
+    r"""
+    Search multiple files and yield the results as they become available.
+
+    The paths from :func:`find` are searched in chunks by a thread or process
+    pool. Only a bounded number of chunks are in flight at a time, and
+    results are yielded in the order :func:`find` returns the paths, so the
+    output is deterministic and the first results are available before the
+    walk finishes.
+
+    Args:
+        regexpr (str | Pattern): pattern to find
+        dpath (str | None): passed to :func:`find`.
+        include (str | List[str] | MultiPattern | None): passed to :func:`find`.
+        exclude (str | List[str] | MultiPattern | None): passed to :func:`find`.
+        recursive (bool): passed to :func:`find`.
+        dirblocklist (str | List[str] | MultiPattern | None): passed to :func:`find`.
+        respect_gitignore (bool): passed to :func:`find`.
+        max_workers (int): number of workers. If 0, search serially.
+        mode (str): can be 'serial', 'thread', or 'process'
+        chunksize (int): number of files searched by each job
+
+        index (bool | str | PathLike | TrigramIndex | None):
+            if specified, only search the files that a persistent
+            :class:`xdev.util_trigram.TrigramIndex` selects. True uses the
+            default index in the xdev cache directory. The index is updated
+            with the files that changed before searching, which requires
+            finding all paths first.
+
+        verbose (int): verbosity level
+
+        prefetch (int): passed to :func:`find`.
+
+    Yields:
+        GrepResult: the result of each file with at least one match
+
+    Example:
+        >>> from xdev.search_replace import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/iter_grep').delete().ensuredir()
+        >>> for i in range(30):
+        >>>     (dpath / f'file{i:02d}.txt').write_text(f'line {i}\n' * (i % 3))
+        >>> serial = list(iter_grep('line 1', dpath=dpath))
+        >>> threaded = list(iter_grep('line 1', dpath=dpath, max_workers=4, chunksize=2))
+        >>> assert [r.fpath for r in serial] == [r.fpath for r in threaded]
+        >>> print(sorted(ub.Path(r.fpath).name for r in threaded))
+        ['file01.txt', 'file10.txt', 'file11.txt', 'file13.txt', 'file14.txt', 'file16.txt', 'file17.txt', 'file19.txt']
+        >>> indexed = list(iter_grep('line 1', dpath=dpath, index=dpath / 'index.sqlite'))
+        >>> assert [r.fpath for r in serial] == [r.fpath for r in indexed]
+    """
+    pattern = Pattern.coerce(regexpr, hint='regex')
+    fpath_generator = find(dpath=dpath, type='f', include=include,
+                           exclude=exclude, recursive=recursive,
+                           dirblocklist=dirblocklist,
+                           respect_gitignore=respect_gitignore,
+                           prefetch=prefetch)
+    if index is not None and index is not False:
+        from xdev.util_trigram import TrigramIndex
+        index = TrigramIndex.coerce(index)
+        fpath_generator = index.candidates(pattern, fpath_generator,
+                                           verbose=verbose)
+    results = _imap_chunked(grepfile, fpath_generator, args=(pattern, 0),
+                            max_workers=max_workers, mode=mode,
+                            chunksize=chunksize)
+    for grepres in results:
+        if grepres:
+            yield grepres
+
+
+def _imap_chunked(func, items, args=(), max_workers=0, mode='thread',
+                  chunksize=16):
+    """
+    Lazily yield ``func(item, *args)`` for each item, in order.
+
+    The items are processed in chunks by a thread or process pool. Only a
+    bounded number of chunks are in flight at a time, so the items are not
+    consumed far ahead of the results and results are not buffered without
+    limit.
+
+    Args:
+        func (Callable): the function to apply, which must be picklable in
+            process mode
+        items (Iterable): the items to apply it to
+        args (Tuple): extra arguments to the function
+        max_workers (int): number of workers. If 0, run serially.
+        mode (str): can be 'serial', 'thread', or 'process'
+        chunksize (int): number of items in each job
+
+    Yields:
+        Any: the result of each item
+    """
+    if max_workers == 0 or mode == 'serial':
+        for item in items:
+            yield func(item, *args)
+        return
+
+    import collections
+    max_pending = max_workers * 4
+    pending = collections.deque()
+    with ub.Executor(mode=mode, max_workers=max_workers) as executor:
+        try:
+            for chunk in ub.chunks(items, chunksize=chunksize):
+                pending.append(executor.submit(_apply_chunk, func, chunk, args))
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # Do not process the remaining items if the consumer stops early
+            for future in pending:
+                future.cancel()
+
+
+def _apply_chunk(func, chunk, args):
     """
+    Process a chunk of items in a worker for :func:`_imap_chunked`.
+    """
+    return [func(item, *args) for item in chunk]
+
+
+def find(pattern=None, dpath=None, include=None, exclude=None,
+         dirblocklist=None, type=None, recursive=True, followlinks=False,
+         respect_gitignore=False, prefetch=0):
+    r"""
     Find all paths in a root subject to a search criterion
 
     Args:
@@ -198,6 +572,17 @@ def find(pattern=None, dpath=None, include=None, exclude=None,
         followlinks (bool, default=False):
             if True will follow directory symlinks
 
+        respect_gitignore (bool, default=False):
+            if True, skip paths ignored by ``.gitignore`` files (and the
+            ``.git`` directory) like git does. Ignored directories are not
+            traversed. This does not apply when dpath is a file.
+
+        prefetch (int, default=0):
+            if positive, list this many directories ahead of the consumer in
+            a thread pool, which hides the latency of slow (e.g. network)
+            filesystems while the consumer handles earlier paths. The order
+            of the results does not change. See also :func:`afind`.
+
     References:
         _[1] https://linuxconfig.org/identifying-file-types-in-linux
 
@@ -219,8 +604,157 @@ def find(pattern=None, dpath=None, include=None, exclude=None,
         >>> assert len(paths) == 5
         >>> paths = list(find(pattern='*', dpath=dpath, type='f'))
         >>> assert len(paths) == 4
+
+    Example:
+        >>> from xdev.search_replace import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/find_gitignore').delete().ensuredir()
+        >>> (dpath / '.git').ensuredir()
+        >>> (dpath / '.gitignore').write_text('build/\n*.log\n')
+        >>> (dpath / 'build').ensuredir()
+        >>> (dpath / 'build/out.txt').touch()
+        >>> (dpath / 'src').ensuredir()
+        >>> (dpath / 'src/main.py').touch()
+        >>> (dpath / 'src/debug.log').touch()
+        >>> paths = sorted(ub.Path(p).relative_to(dpath).as_posix()
+        >>>                for p in find(dpath=dpath, respect_gitignore=True))
+        >>> print(paths)
+        ['.gitignore', 'src', 'src/main.py']
+        >>> # Prefetching directory listings gives the same paths
+        >>> (dpath / 'src/sub').ensuredir()
+        >>> (dpath / 'src/sub/.gitignore').write_text('*.py\n')
+        >>> (dpath / 'src/sub/mod.py').touch()
+        >>> (dpath / 'src/sub/mod.txt').touch()
+        >>> for respect_gitignore in [False, True]:
+        >>>     serial = list(find(dpath=dpath, respect_gitignore=respect_gitignore))
+        >>>     prefetched = list(find(dpath=dpath, respect_gitignore=respect_gitignore, prefetch=2))
+        >>>     assert serial == prefetched
+        >>> assert not any(p.endswith('mod.py') for p in prefetched)
+    """
+
+    visit = _find_visitor(pattern=pattern, include=include, exclude=exclude,
+                          dirblocklist=dirblocklist, type=type)
+
+    if dpath is None:
+        dpath = '.'  # os.getcwd()
+
+    if os.path.isfile(dpath):
+        # Spoof walk output when dpath is given as a file path
+        root = os.path.dirname(dpath)
+        yield from visit(root, [], [os.path.basename(dpath)])
+        return
+
+    if respect_gitignore:
+        from xdev.util_gitignore import GitignoreMatcher
+        gitignore = GitignoreMatcher.for_directory(dpath)
+    else:
+        gitignore = None
+
+    if prefetch > 0:
+        walkgen = _walk_prefetch(dpath, followlinks=followlinks,
+                                 prefetch=prefetch, gitignore=gitignore)
+    else:
+        walkgen = _walk_serial(dpath, followlinks=followlinks,
+                               gitignore=gitignore)
+
+    for root, dnames, fnames in walkgen:
+        yield from visit(root, dnames, fnames)
+        if not recursive:
+            break
+
+
+async def afind(pattern=None, dpath=None, include=None, exclude=None,
+                dirblocklist=None, type=None, recursive=True,
+                followlinks=False, respect_gitignore=False, prefetch=8):
+    r"""
+    An async generator version of :func:`find`.
+
+    Directories are listed in a thread pool, and the listings of the next
+    ``prefetch`` directories are started before the consumer asks for them,
+    so the event loop is never blocked on the filesystem. Paths are yielded
+    in the same order as :func:`find`.
+
+    Args:
+        pattern (str | Pattern | None): see :func:`find`.
+        dpath (str | Pattern | None): see :func:`find`.
+        include (str | List[str] | MultiPattern | None): see :func:`find`.
+        exclude (str | List[str] | MultiPattern | None): see :func:`find`.
+        dirblocklist (str | List[str] | MultiPattern | None): see :func:`find`.
+        type (str | List[str] | None): see :func:`find`.
+        recursive (bool): see :func:`find`.
+        followlinks (bool): see :func:`find`.
+        respect_gitignore (bool): see :func:`find`.
+        prefetch (int): number of directories listed ahead of the consumer
+
+    Yields:
+        str: the matching paths
+
+    Example:
+        >>> import asyncio
+        >>> from xdev.search_replace import *  # NOQA
+        >>> from xdev.search_replace import _create_test_filesystem
+        >>> dpath = _create_test_filesystem()['root']
+        >>> async def collect():
+        >>>     return [p async for p in afind(dpath=dpath, type='f')]
+        >>> paths = asyncio.run(collect())
+        >>> assert paths == list(find(dpath=dpath, type='f'))
+        >>> assert len(paths) == 4
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    visit = _find_visitor(pattern=pattern, include=include, exclude=exclude,
+                          dirblocklist=dirblocklist, type=type)
+
+    if dpath is None:
+        dpath = '.'  # os.getcwd()
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max(prefetch, 1))
+    try:
+        is_file = await loop.run_in_executor(executor, os.path.isfile, dpath)
+        if is_file:
+            root = os.path.dirname(dpath)
+            for path in visit(root, [], [os.path.basename(dpath)]):
+                yield path
+            return
+
+        if respect_gitignore:
+            from xdev.util_gitignore import GitignoreMatcher
+            gitignore = await loop.run_in_executor(
+                executor, GitignoreMatcher.for_directory, dpath)
+        else:
+            gitignore = None
+
+        queue = _ListingQueue(executor, followlinks=followlinks,
+                              lookahead=prefetch)
+        queue.start(os.fspath(dpath), (None, gitignore))
+        try:
+            while queue:
+                step = await asyncio.wrap_future(queue.pop())
+                if step is not None:
+                    root, dnames, fnames, _, _ = step
+                    for path in visit(root, dnames, fnames):
+                        yield path
+                    if not recursive:
+                        break
+                queue.push(step)
+        finally:
+            queue.cancel()
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _find_visitor(pattern=None, include=None, exclude=None,
+                  dirblocklist=None, type=None):
     """
+    Build the function that filters the listing of one directory for
+    :func:`find` and :func:`afind`.
 
+    Returns:
+        Callable[[str, List[str], List[str]], List[str]]:
+            takes the (root, dnames, fnames) of a directory, removes blocked
+            directories from dnames in place, and returns the paths to
+            yield.
+    """
     if pattern is None:
         pattern = '*'
 
@@ -235,54 +769,276 @@ def find(pattern=None, dpath=None, include=None, exclude=None,
         if 'f' in type:
             with_files = True
 
-    if dpath is None:
-        dpath = '.'  # os.getcwd()
-
     # Define helper for checking inclusion / exclusion
     include = None if include is None else MultiPattern.coerce(include, hint='glob')
     exclude = None if exclude is None else MultiPattern.coerce(exclude, hint='glob')
     dirblocklist = None if dirblocklist is None else MultiPattern.coerce(dirblocklist, hint='glob')
     main_pattern = Pattern.coerce(pattern, hint='glob')
 
-    def is_included(name):
-        if not main_pattern.match(name):
-            return False
+    def filter_included(names):
+        names = list(it.compress(names, main_pattern.match_many(names)))
+        if exclude is not None:
+            mask = exclude.match_many(names)
+            names = list(it.compress(names, map(operator.not_, mask)))
+        if include is not None:
+            names = list(it.compress(names, include.match_many(names)))
+        return names
 
-        if exclude is not None and exclude.match(name):
-            return False
+    def visit(root, dnames, fnames):
+        if dirblocklist is not None:
+            mask = dirblocklist.match_many(dnames)
+            dnames[:] = it.compress(dnames, map(operator.not_, mask))
 
-        if include is None or include.match(name):
-            return True
+        found = []
+        if with_files:
+            found.extend(join(root, fname) for fname in filter_included(fnames))
 
-        return False
+        if with_dirs:
+            found.extend(join(root, dname) for dname in filter_included(dnames))
+        return found
 
-    if os.path.isfile(dpath):
-        # Spoof walk output when dpath is given as a file path
-        root = os.path.dirname(dpath)
-        dnames = []
-        fnames = [os.path.basename(dpath)]
-        walkgen = [(root, dnames, fnames)]
-    else:
-        walkgen = os.walk(dpath, followlinks=followlinks)
+    return visit
 
-    for root, dnames, fnames in walkgen:
 
-        if dirblocklist is not None:
-            dnames[:] = [
-                dname for dname in dnames if not dirblocklist.match(dname)]
+def _walk_serial(top, followlinks=False, gitignore=None):
+    """
+    Like :func:`os.walk`, but removes the paths ignored by ``.gitignore``
+    files if a matcher for the top directory is given.
+    """
+    if gitignore is None:
+        yield from os.walk(top, followlinks=followlinks)
+        return
+    # The matcher for each directory that is waiting to be walked
+    gitignore_of = {os.fspath(top): gitignore}
+    for root, dnames, fnames in os.walk(top, followlinks=followlinks):
+        matcher = gitignore_of.pop(root)
+        matcher.filter(dnames, fnames)
+        yield root, dnames, fnames
+        for dname in dnames:
+            gitignore_of[join(root, dname)] = matcher.descend(dname)
+
+
+def _walk_prefetch(top, followlinks=False, prefetch=8, gitignore=None):
+    """
+    Like :func:`_walk_serial`, but the next ``prefetch`` directories are
+    listed in a thread pool while the consumer handles the current one.
 
-        if with_files:
-            for fname in fnames:
-                if is_included(fname):
-                    yield join(root, fname)
+    Directories are yielded in the same order as :func:`os.walk`, and like
+    :func:`os.walk` the consumer can remove names from the yielded dnames to
+    skip them.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    queue = _ListingQueue(executor, followlinks=followlinks, lookahead=prefetch)
+    queue.start(os.fspath(top), (None, gitignore))
+    try:
+        while queue:
+            step = queue.pop().result()
+            if step is not None:
+                root, dnames, fnames, _, _ = step
+                yield root, dnames, fnames
+            queue.push(step)
+    finally:
+        queue.cancel()
+        executor.shutdown(wait=False)
+
+
+def _walk_step(root, parent_gitignore=None, gitignore=None):
+    """
+    List a directory in a worker and remove the names ignored by
+    ``.gitignore`` files.
 
-        if with_dirs:
-            for dname in dnames:
-                if is_included(dname):
-                    yield join(root, dname)
+    Args:
+        root (str): the directory
+        parent_gitignore (GitignoreMatcher | None): the matcher of the parent
+            directory, which is used to build the matcher of this one.
+        gitignore (GitignoreMatcher | None): the matcher of this directory,
+            if it is already known.
 
-        if not recursive:
-            break
+    Returns:
+        None | Tuple[str, List[str], List[str], Set[str], GitignoreMatcher | None]:
+            the listing from :func:`_list_directory` and the matcher of the
+            directory.
+    """
+    listing = _list_directory(root)
+    if listing is None:
+        return None
+    root, dnames, fnames, links = listing
+    if parent_gitignore is not None:
+        gitignore = parent_gitignore.descend(
+            os.path.basename(root), has_gitignore='.gitignore' in fnames)
+    if gitignore is not None:
+        gitignore.filter(dnames, fnames)
+    return root, dnames, fnames, links, gitignore
+
+
+def _list_directory(root):
+    """
+    List a directory like one step of :func:`os.walk`.
+
+    Returns:
+        None | Tuple[str, List[str], List[str], Set[str]]:
+            the root, the names of subdirectories and files, and the names of
+            subdirectories that are symlinks. None if the directory cannot be
+            listed.
+    """
+    dnames = []
+    fnames = []
+    links = set()
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return None
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            dnames.append(entry.name)
+            try:
+                if entry.is_symlink():
+                    links.add(entry.name)
+            except OSError:
+                pass
+        else:
+            fnames.append(entry.name)
+    return root, dnames, fnames, links
+
+
+class _ListingQueue:
+    """
+    The directories waiting to be walked, in depth first order, where the
+    listings of the next few directories are started ahead of time.
+
+    Besides the next ``lookahead`` directories on the stack, the workers
+    speculatively list the first few subdirectories of each listed directory
+    (up to ``16 * lookahead`` listings), so the walk does not stall on a deep
+    tree. Speculative listings of directories that the consumer prunes
+    are discarded.
+
+    Args:
+        executor (concurrent.futures.Executor): runs the listings
+        followlinks (bool): if True, descend into symlinks to directories
+        lookahead (int): number of directories to list ahead of time
+    """
+
+    def __init__(self, executor, followlinks=False, lookahead=8):
+        import threading
+        self.executor = executor
+        self.followlinks = followlinks
+        self.lookahead = lookahead
+        self.max_speculative = lookahead * 16
+        self.speculative_width = 4
+        # Each item is [path, extra, future], with the next to walk at the end
+        self._stack = []
+        self._lock = threading.Lock()
+        # Listings started before the consumer pushed their directory
+        self._speculative = {}
+        # Directories whose subdirectories may still be listed speculatively
+        self._active = set()
+        self._closed = False
+
+    def __bool__(self):
+        return bool(self._stack)
+
+    def start(self, path, extra):
+        """
+        Add the top directory.
+
+        Args:
+            path (str): the directory
+            extra (Tuple): extra arguments to :func:`_walk_step`
+        """
+        self._stack.append([path, extra, None])
+        self._fill()
+
+    def pop(self):
+        """
+        Returns:
+            concurrent.futures.Future: the result of :func:`_walk_step` for the
+                next directory
+        """
+        path, extra, future = self._stack.pop()
+        if future is None:
+            future = self._adopt(path, extra)
+        return future
+
+    def push(self, step):
+        """
+        Add the subdirectories of the directory that was just walked, after
+        the consumer removed the ones it does not want.
+
+        Args:
+            step (Tuple | None): the result of :func:`_walk_step`
+        """
+        if step is not None:
+            children = self._children(step)
+            self._stack.extend([path, extra, None] for path, extra in reversed(children))
+            self._discard_pruned(step[0], {path for path, _ in children})
+        self._fill()
+
+    def cancel(self):
+        with self._lock:
+            self._closed = True
+            futures = list(self._speculative.values())
+            self._speculative.clear()
+        futures += [future for _, _, future in self._stack if future is not None]
+        self._stack.clear()
+        for future in futures:
+            future.cancel()
+
+    def _fill(self):
+        if self.lookahead > 0:
+            for item in self._stack[-self.lookahead:]:
+                if item[2] is None:
+                    item[2] = self._adopt(item[0], item[1])
+
+    def _adopt(self, path, extra):
+        with self._lock:
+            future = self._speculative.pop(path, None)
+            self._active.add(path)
+        if future is None:
+            future = self.executor.submit(self._run, path, extra)
+        return future
+
+    def _children(self, step):
+        root, dnames, _, links, gitignore = step
+        return [(join(root, dname), (gitignore, None)) for dname in dnames
+                if self.followlinks or dname not in links]
+
+    def _run(self, path, extra):
+        step = _walk_step(path, *extra)
+        if step is None or self.lookahead == 0:
+            return step
+        children = self._children(step)[:self.speculative_width]
+        with self._lock:
+            if self._closed or path not in self._active:
+                return step
+            for child_path, child_extra in children:
+                if len(self._speculative) >= self.max_speculative:
+                    break
+                if child_path not in self._speculative:
+                    self._active.add(child_path)
+                    self._speculative[child_path] = self.executor.submit(
+                        self._run, child_path, child_extra)
+        return step
+
+    def _discard_pruned(self, root, kept):
+        prefix = join(root, '')
+        with self._lock:
+            self._active.discard(root)
+            for path in list(self._speculative):
+                if path.startswith(prefix):
+                    child = prefix + path[len(prefix):].split(os.sep, 1)[0]
+                    if child not in kept:
+                        self._active.discard(path)
+                        self._speculative.pop(path).cancel()
+            for path in list(self._active):
+                if path.startswith(prefix):
+                    child = prefix + path[len(prefix):].split(os.sep, 1)[0]
+                    if child not in kept:
+                        self._active.discard(path)
 
 
 def sedfile(fpath, regexpr, repl, dry=False, verbose=1):
@@ -299,9 +1055,6 @@ def sedfile(fpath, regexpr, repl, dry=False, verbose=1):
     Returns:
         List[Tuple[str, str]]: changed lines
 
-    TODO:
-        - [ ] Store "SedResult" class, with lazy execution
-
     Example:
         >>> from xdev.search_replace import *  # NOQA
         >>> from xdev.search_replace import _create_test_filesystem
@@ -312,70 +1065,69 @@ def sedfile(fpath, regexpr, repl, dry=False, verbose=1):
         >>> changed_lines3 = sedfile(fpath, 'a', 'x', dry=False, verbose=0)
         >>> assert changed_lines3 != changed_lines2
     """
-    import xdev
-    mode_text = ['(real-run)', '(dry-run)'][dry]
-
     pattern = Pattern.coerce(regexpr, hint='regex')
-    # print(f'regexpr={regexpr}')
-    # print(f'pattern={pattern!r}')
+    result = _compute_sed(fpath, pattern, repl)
+    if len(result) > 0:
+        if verbose:
+            result._print_summary(dry=dry)
+            print(result.format_diff())
+        if not dry:
+            if verbose:
+                print(' ! WRITING CHANGES')
+            result.write()
+    return result.changed_lines
+
 
-    path, name = split(fpath)
-    new_file_lines = []
+def _compute_sed(fpath, pattern, repl):
+    """
+    Compute the replacements of :func:`sedfile` without writing them.
+
+    Returns:
+        SedResult: the text is only kept if some line changes
+    """
     try:
         with open(fpath, 'r') as file:
-            file_lines = file.readlines()
-            # Search each line for the desired regexpr
-            new_file_lines = [pattern.sub(repl, line) for line in file_lines]
+            stat_key = _stat_key(file.fileno())
+            old_text = file.read()
     except UnicodeDecodeError as ex:
         # Add the file name into the exception
         new_last_arg = ex.args[-1] + ' in fpath={!r}'.format(fpath)
         new_args = ex.args[:-1] + (new_last_arg,)
         raise UnicodeDecodeError(*new_args) from ex
-    except Exception:
-        raise
-        # This does not preserve exception type
-        # raise Exception('Failed to sedfile fpath = {!r}'.format(fpath)) from ex
-
-    changed_lines = [(newline, line)
-                     for newline, line in zip(new_file_lines, file_lines)
-                     if  newline != line]
-    nChanged = len(changed_lines)
-    if nChanged > 0:
-        try:
-            rel_fpath = relpath(fpath, os.getcwd())
-        except ValueError:
-            # windows issues
-            rel_fpath = abspath(fpath)
+    new_text, changed_lines = _sub_lines(old_text, pattern, repl)
+    if not changed_lines:
+        return SedResult(fpath, None, None, [], stat_key)
+    return SedResult(fpath, old_text, new_text, changed_lines, stat_key)
 
-        if verbose:
-            print(' * {} changed {} lines in {!r} '.format(
-                mode_text, nChanged, rel_fpath))
-            print(' * --------------------')
-        new_file = ''.join(new_file_lines)
-        old_file = ub.ensure_unicode(
-            ''.join(list(map(ub.ensure_unicode, file_lines))))
-        if verbose:
-            print(xdev.difftext(old_file, new_file, colored=True))
-        if not dry:
-            if verbose:
-                print(' ! WRITING CHANGES')
-            with open(fpath, 'w') as file:
-                file.write(new_file)
-        return changed_lines
-    return []
+
+def _sed_prepare_or_skip(fpath, pattern, repl):
+    """
+    Compute the replacements of a file in a worker for :func:`sed`, or
+    return None if it cannot be decoded.
+    """
+    try:
+        return _compute_sed(fpath, pattern, repl)
+    except UnicodeDecodeError:
+        return None
 
 
 def grepfile(fpath, regexpr, verbose=1):
     r"""
     Exceute grep on a single file
 
+    The file is memory mapped and searched as bytes, so memory use does not
+    depend on its size, and only the candidate lines are decoded. Files with
+    a NUL byte in their first 8 KiB are assumed to be binary and are skipped,
+    unless the pattern is a bytes regex. Lines found by a bytes regex are
+    kept as bytes and only decoded when they are formatted.
+
     Args:
         fpath (str | PathLike): file to search
         regexpr (str | Pattern): pattern to find
         verbose (int): verbosity level
 
     Returns:
-        None | GrepResult
+        None | GrepResult: None if the file is binary or cannot be decoded
 
     Example:
         >>> from xdev.search_replace import *  # NOQA
@@ -383,28 +1135,57 @@ def grepfile(fpath, regexpr, verbose=1):
         >>> fpath = _create_test_filesystem()['contents'][1]
         >>> grep_result = grepfile(fpath, r'\bb\b')
         >>> print('grep_result = {}'.format(grep_result))
+
+    Example:
+        >>> # Binary files can only be searched with bytes patterns
+        >>> from xdev.search_replace import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/grepfile').ensuredir()
+        >>> fpath = dpath / 'data.bin'
+        >>> fpath.write_bytes(b'\x7fELF\x00\x01\nversion=1.2\npayload \xff\n')
+        >>> assert grepfile(fpath, 'version', verbose=0) is None
+        >>> grep_result = grepfile(fpath, re.compile(rb'version=[\d.]+'), verbose=0)
+        >>> print(grep_result.found_lxs, grep_result.found_lines)
+        [1] [b'version=1.2\n']
+        >>> print(grep_result.format_text(color=False))
+        ----------------------
+        Found 1 line(s) in ...
+        data.bin : 1 |version=1.2
     """
-    grep_result = None
+    import mmap
     pattern = Pattern.coerce(regexpr, hint='regex')
-    with open(fpath, 'r') as file:
+    with open(fpath, 'rb') as file:
+        head = file.read(_HEAD_SIZE)
+        if b'\x00' in head and not _is_bytes_pattern(pattern):
+            if verbose:
+                print("SKIPPING BINARY fpath={}".format(fpath))
+            return None
+        grep_result = GrepResult(fpath, pattern)
+        if not head:
+            return grep_result
+        try:
+            buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Some files (e.g. in /proc) cannot be mapped
+            buf = head + file.read()
         try:
-            lines = file.readlines()
+            # Search the whole file for the desired pattern
+            found = _search_lines(buf, pattern, keepends=True)
+            if found:
+                grep_result.max_line = _count_lines(buf)
         except UnicodeDecodeError:
-            print("UNABLE TO READ fpath={}".format(fpath))
-        else:
-            grep_result = GrepResult(fpath, pattern)
-            grep_result.max_line = len(lines)
-
-            # Search each line for the desired pattern
-            for lx, line in enumerate(lines):
-                match_object = pattern.search(line)
-                if match_object:
-                    grep_result.append(lx, line)
-
-            # Print the results (if any)
             if verbose:
-                if len(grep_result):
-                    print(grep_result.format_text())
+                print("UNABLE TO READ fpath={}".format(fpath))
+            return None
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+        for lx, line in found:
+            grep_result.append(lx, line)
+
+    # Print the results (if any)
+    if verbose:
+        if len(grep_result):
+            print(grep_result.format_text())
 
     return grep_result
 
@@ -423,28 +1204,619 @@ def greptext(text, regexpr, fpath=None, verbose=1):
     """
     from xdev.patterns import Pattern
     # from xdev.search_replace import GrepResult
-    grep_result = None
     pattern = Pattern.coerce(regexpr, hint='regex')
     fpath = '<text>'
-    try:
+    grep_result = GrepResult(fpath, pattern)
+    if _OTHER_LINE_BREAKS_REGEX.search(text) is None:
+        # Search the whole text for the desired pattern
+        found = _search_lines(text, pattern, keepends=False)
+        num_lines = _count_lines(text)
+    else:
+        # Search each line for the desired pattern
         lines = text.splitlines()
-    except UnicodeDecodeError:
-        print("UNABLE TO READ fpath={}".format(fpath))
+        num_lines = len(lines)
+        found = [(lx, line) for lx, line in enumerate(lines)
+                 if pattern.search(line)]
+    grep_result.max_line = num_lines
+    for lx, line in found:
+        grep_result.append(lx, line)
+
+    # Print the results (if any)
+    if verbose:
+        if len(grep_result):
+            print(grep_result.format_text())
+    return grep_result
+
+
+# The number of bytes used to detect binary files
+_HEAD_SIZE = 8 * 1024
+# The number of bytes decoded or counted at a time
+_CHUNK_SIZE = 1 << 20
+# A carriage return that is not part of a CRLF, which text mode reads as a
+# line ending
+_LONE_CR_REGEX = re.compile(rb'\r(?!\n)')
+
+
+def _search_lines(text, pattern, keepends=True):
+    r"""
+    Find the lines of a text that match a pattern.
+
+    The text is first checked for the literal that every match must contain
+    (see :func:`_required_literal`), which rejects most texts without any
+    per-line work. Otherwise the whole text is searched at once, and only the
+    lines that contain the literal or the match offsets are extracted and
+    checked with the pattern, so the other lines are never split out.
+    Patterns without a literal that cannot be searched in a buffer (see
+    :func:`_buffer_regex`) are checked line by line.
+
+    Bytes (e.g. a memory mapped file) are searched without decoding them. If
+    the pattern is not a bytes regex, only the candidate lines are decoded as
+    UTF-8, or chunks of whole lines when the pattern can not search bytes.
+
+    Args:
+        text (str | bytes | mmap.mmap): the text, with "\n" line endings
+        pattern (Pattern): the pattern to search for
+        keepends (bool): if True, returned lines end with "\n" like readlines
+
+    Returns:
+        List[Tuple[int, str | bytes]]:
+            the index and text of each matching line. Lines are only bytes
+            if the pattern is a bytes regex.
+
+    Raises:
+        UnicodeDecodeError: if a candidate line of bytes is not UTF-8
+
+    Example:
+        >>> from xdev.search_replace import _search_lines
+        >>> text = 'foo\nbar\nbaz foo\n\nfoo bar'
+        >>> data = text.encode('utf8')
+        >>> for regexpr in ['foo', '^foo', 'o$', 'a.', r'(?<=z )foo', 'x', r'(?<!\w)\w']:
+        >>>     pattern = Pattern.coerce(regexpr, hint='regex')
+        >>>     lines = text.splitlines(True)
+        >>>     expected = [(lx, line) for lx, line in enumerate(lines) if pattern.search(line)]
+        >>>     assert _search_lines(text, pattern) == expected
+        >>>     assert _search_lines(data, pattern) == expected
+        >>>     bytes_pattern = Pattern.coerce(re.compile(regexpr.encode('utf8')))
+        >>>     assert _search_lines(data, bytes_pattern) == [(lx, line.encode('utf8')) for lx, line in expected]
+        >>> print(_search_lines(text, Pattern.coerce('bar', 'strict'), keepends=False))
+        [(1, 'bar'), (4, 'foo bar')]
+
+    Example:
+        >>> # Files with CRLF or CR line endings match like lines read in text mode
+        >>> from xdev.search_replace import *  # NOQA
+        >>> from xdev.search_replace import _search_lines
+        >>> dpath = ub.Path.appdir('xdev/tests/search_lines_crlf').ensuredir()
+        >>> fpath = dpath / 'crlf.txt'
+        >>> for data in [b'foo = 1\r\nbar = 2\r\nbaz = 3 # 1\r\n',
+        >>>              b'b\raaa = 1\nbar = 2\r\rbaz = 3 # 1\r']:
+        >>>     fpath.write_bytes(data)
+        >>>     with open(fpath) as file:
+        >>>         lines = file.readlines()
+        >>>     for regexpr in [r'(1|2)$', '= 1\n', 'bar', r'\d\n', '^b']:
+        >>>         pattern = Pattern.coerce(regexpr, hint='regex')
+        >>>         expected = [(lx, line) for lx, line in enumerate(lines) if pattern.search(line)]
+        >>>         assert expected
+        >>>         assert _search_lines(fpath.read_bytes(), pattern) == expected
+        >>>         assert grepfile(fpath, pattern, verbose=0).found_lines == [line for _, line in expected]
+    """
+    is_text = isinstance(text, str)
+    newline = '\n' if is_text else b'\n'
+    literal, regex, byte_literal, byte_regex = _search_plan(pattern)
+    decode = None
+    if not is_text:
+        literal, regex = byte_literal, byte_regex
+        if not _is_bytes_pattern(pattern):
+            decode = _decode_lines
+            if text.find(b'\r') >= 0:
+                # Lines are only normalized to end with "\n" when they are
+                # decoded, so a regex could fail to match at the end of a
+                # line, and a literal with a newline would not be found.
+                regex = None
+                if literal is not None and (b'\n' in literal or b'\r' in literal):
+                    literal = None
+                if _LONE_CR_REGEX.search(text) is not None:
+                    # Text mode also ends a line at a lone "\r", so lines
+                    # can only be split and counted after decoding them.
+                    literal = None
+
+    if literal is None and regex is None:
+        return _search_each_line(text, pattern, keepends, decode)
+
+    found = []
+    lx = 0
+    line_start = 0
+    pos = 0
+    end = len(text)
+    while pos < end:
+        # Find the next candidate line. A literal is faster to find than a
+        # regex that does not start with it.
+        if literal is not None:
+            hit = text.find(literal, pos)
+        else:
+            match = regex.search(text, pos)
+            hit = -1 if match is None else match.start()
+        if hit < 0:
+            # Most texts are rejected here without any per-line work
+            break
+        # pos is always at the start of a line
+        start = max(pos, text.rfind(newline, pos, hit) + 1)
+        stop = text.find(newline, hit)
+        stop = end if stop < 0 else stop + 1
+        lx += _count_newlines(text, line_start, start)
+        line_start = start
+        line = text[start:stop]
+        if decode is not None:
+            line = decode(line)
+        if not keepends:
+            line = line.rstrip(newline if decode is None else '\n')
+        # The candidate does not have to be a match of the pattern on the
+        # line itself, so confirm it.
+        if pattern.search(line):
+            found.append((lx, line))
+        pos = stop
+    return found
+
+
+def _search_each_line(text, pattern, keepends=True, decode=None):
+    """
+    The fallback of :func:`_search_lines` for patterns without a literal or
+    buffer regex. Bytes are split into chunks of whole lines so memory use
+    does not depend on their size. Decoded chunks are counted after decoding,
+    because decoding can translate a lone "\r" into a line ending.
+    """
+    if isinstance(text, str):
+        lines = text.split('\n')[:_count_lines(text)]
+        if keepends:
+            lines = [line + '\n' for line in lines]
+            if lines and not text.endswith('\n'):
+                lines[-1] = lines[-1][:-1]
+        found = [(lx, line) for lx, line in enumerate(lines)
+                 if pattern.search(line)]
+        return found
+
+    found = []
+    lx = 0
+    for chunk in _iter_line_chunks(text):
+        if decode is not None:
+            text_chunk = decode(chunk)
+            chunk_found = _search_lines(text_chunk, pattern, keepends)
+            lx_step = text_chunk.count('\n')
+        else:
+            lines = chunk.split(b'\n')[:_count_lines(chunk)]
+            if keepends:
+                lines = [line + b'\n' for line in lines]
+                if lines and not chunk.endswith(b'\n'):
+                    lines[-1] = lines[-1][:-1]
+            chunk_found = [(idx, line) for idx, line in enumerate(lines)
+                           if pattern.search(line)]
+            lx_step = chunk.count(b'\n')
+        found.extend((lx + idx, line) for idx, line in chunk_found)
+        lx += lx_step
+    return found
+
+
+def _iter_line_chunks(buf, chunksize=_CHUNK_SIZE):
+    """
+    Split bytes into chunks of about chunksize that end after a newline.
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        stop = min(pos + chunksize, end)
+        if stop < end:
+            nl = buf.rfind(b'\n', pos, stop)
+            if nl < 0:
+                nl = buf.find(b'\n', stop)
+            stop = end if nl < 0 else nl + 1
+        yield buf[pos:stop]
+        pos = stop
+
+
+def _count_newlines(buf, start=0, stop=None):
+    """
+    Count the newlines in a str, bytes, or mmap without copying more than a
+    chunk of it at a time.
+    """
+    if isinstance(buf, str):
+        return buf.count('\n', start, stop)
+    if stop is None:
+        stop = len(buf)
+    count = 0
+    for pos in range(start, stop, _CHUNK_SIZE):
+        count += buf[pos:min(pos + _CHUNK_SIZE, stop)].count(b'\n')
+    return count
+
+
+def _count_lines(buf):
+    """
+    The number of lines like readlines would return.
+    """
+    num_lines = _count_newlines(buf)
+    newline = '\n' if isinstance(buf, str) else b'\n'
+    if len(buf) and buf[-1:] != newline:
+        num_lines += 1
+    return num_lines
+
+
+def _decode_lines(data):
+    """
+    Decode the bytes of a text file like reading it in text mode.
+    """
+    return data.decode('utf8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _is_bytes_pattern(pattern):
+    return (pattern.backend == 'regex' and
+            isinstance(pattern.pattern.pattern, bytes))
+
+
+def _search_plan(pattern):
+    """
+    Get the required literal and buffer regex of a pattern, and their
+    versions that search encoded text. These are cached because the same
+    pattern is used to search many files. The cache is bounded so a long
+    running process that searches for many patterns does not keep all of
+    them.
+
+    Returns:
+        Tuple[str | bytes | None, re.Pattern | None, bytes | None, re.Pattern | None]
+    """
+    return _search_plan_cached(pattern.backend, pattern.pattern)
+
+
+@lru_cache(maxsize=256)
+def _search_plan_cached(backend, pat):
+    pattern = Pattern(pat, backend)
+    literal = _required_literal(pattern)
+    regex = _buffer_regex(pattern)
+    if _is_bytes_pattern(pattern):
+        byte_literal, byte_regex = literal, regex
     else:
-        grep_result = GrepResult(fpath, pattern)
-        grep_result.max_line = len(lines)
+        byte_literal = None if literal is None else literal.encode('utf8')
+        byte_regex = _encoded_regex(regex)
+    return literal, regex, byte_literal, byte_regex
 
-        # Search each line for the desired pattern
-        for lx, line in enumerate(lines):
-            match_object = pattern.search(line)
-            if match_object:
-                grep_result.append(lx, line)
 
-        # Print the results (if any)
-        if verbose:
-            if len(grep_result):
-                print(grep_result.format_text())
-    return grep_result
+def _encoded_regex(regex):
+    r"""
+    Get a bytes regex that matches the UTF-8 encoding of the text a str
+    regex matches, or None if they could differ.
+
+    This is only the case for ASCII regexes without classes or escapes that
+    match non-ASCII characters (e.g. "\w", ".", or "[^a]") and without
+    IGNORECASE, which folds some non-ASCII characters to ASCII letters.
+
+    Args:
+        regex (re.Pattern | None): a str regex
+
+    Returns:
+        re.Pattern | None
+
+    Example:
+        >>> from xdev.search_replace import _encoded_regex
+        >>> print(_encoded_regex(re.compile('^import (os|sys)$', re.M)))
+        re.compile(b'^import (os|sys)$', re.MULTILINE)
+        >>> assert _encoded_regex(re.compile(r'import \w+')) is None
+        >>> assert _encoded_regex(re.compile('naïve')) is None
+    """
+    if regex is None:
+        return None
+    source = regex.pattern
+    if not source.isascii() or regex.flags & re.IGNORECASE:
+        return None
+    if _NON_ASCII_ATOMS_REGEX.search(source):
+        return None
+    return re.compile(source.encode('ascii'), regex.flags & ~re.UNICODE)
+
+
+def _required_literal(pattern):
+    r"""
+    Find the longest run of literal characters that every match of a pattern
+    must contain.
+
+    Only the top level of the regex (and groups without flags) are considered,
+    so a literal inside an alternation or a repeat is not found.
+
+    Args:
+        pattern (Pattern): the pattern
+
+    Returns:
+        str | bytes | None: None if there is no required literal
+
+    Example:
+        >>> from xdev.search_replace import _required_literal
+        >>> print(_required_literal(Pattern.coerce(r'def \w+_cache', 'regex')))
+        _cache
+        >>> print(_required_literal(Pattern.coerce(r'(?:foo|bar)baz(qux)', 'regex')))
+        bazqux
+        >>> print(_required_literal(Pattern.coerce(re.compile(rb'\x00ELF'))))
+        b'\x00ELF'
+        >>> print(_required_literal(Pattern.coerce('(?i)foo', 'regex')))
+        None
+        >>> print(_required_literal(Pattern.coerce('a*b', 'strict')))
+        a*b
+    """
+    if pattern.backend == 'strict':
+        return pattern.pattern or None
+    if pattern.backend != 'regex':
+        return None
+    regex = pattern.pattern
+    if regex.flags & re.IGNORECASE:
+        return None
+    parsed = _parse_regex(regex)
+    if parsed is None:
+        return None
+
+    def _flatten(items):
+        for op, av in items:
+            if op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+                yield from _flatten(av[3])
+            else:
+                yield op, av
+
+    best = ''
+    run = []
+    for op, av in _flatten(parsed):
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+        else:
+            if len(run) > len(best):
+                best = ''.join(run)
+            run = []
+    if len(run) > len(best):
+        best = ''.join(run)
+    if not best:
+        return None
+    if isinstance(regex.pattern, bytes):
+        best = best.encode('latin1')
+    return best
+
+
+def _buffer_regex(pattern):
+    r"""
+    Get a regex that finds every line a pattern matches when it searches a
+    whole buffer.
+
+    The regex uses MULTILINE so "^" and "$" match at line boundaries. Returns
+    None if the result could differ from searching each line: for non-regex
+    backends other than "strict", for regexes with lookbehinds or string
+    anchors, and for regexes that can match a newline or an empty string and
+    use "$", "\B", or a lookahead, which could see the next line.
+
+    Args:
+        pattern (Pattern): the pattern
+
+    Returns:
+        re.Pattern | None
+
+    Example:
+        >>> from xdev.search_replace import _buffer_regex
+        >>> assert _buffer_regex(Pattern.coerce('foo$', 'regex')) is not None
+        >>> assert _buffer_regex(Pattern.coerce(r'\s$', 'regex')) is None
+        >>> assert _buffer_regex(Pattern.coerce(r'(?<!a)b', 'regex')) is None
+        >>> assert _buffer_regex(Pattern.coerce(r'\W(?!a)', 'regex')) is None
+        >>> assert _buffer_regex(Pattern.coerce(r'\w(?!a)', 'regex')) is not None
+        >>> assert _buffer_regex(Pattern.coerce('a.b', 'strict')).pattern == r'a\.b'
+    """
+    if pattern.backend == 'strict':
+        return re.compile(re.escape(pattern.pattern))
+    if pattern.backend != 'regex':
+        return None
+    regex = pattern.pattern
+    source = regex.pattern
+    if isinstance(source, bytes):
+        text_source = source.decode('latin1')
+    else:
+        text_source = source
+    if _LINE_UNSAFE_REGEX.search(text_source):
+        return None
+    if _END_SENSITIVE_REGEX.search(text_source):
+        # These can fail after a newline when more text follows it, which
+        # they cannot see in a single line, so the regex must not reach past
+        # the end of a line by matching a newline or an empty string there.
+        parsed = _parse_regex(regex)
+        if (parsed is None or parsed.getwidth()[0] == 0 or
+                _crosses_lines(parsed, parsed.state.flags)):
+            return None
+    return re.compile(source, regex.flags | re.MULTILINE)
+
+
+def _sub_lines(text, pattern, repl):
+    r"""
+    Replace a pattern on each line of a text, like :func:`Pattern.sub` on
+    every line from ``readlines``.
+
+    The lines with a match are found with :func:`_search_lines`, so a text
+    without the required literal of the pattern is rejected without any
+    per-line work. If a pattern cannot match across a line boundary (see
+    :func:`_sub_regex`), the replacement is done on the whole text at once,
+    otherwise the text is split into lines.
+
+    Args:
+        text (str): the text, with "\n" line endings
+        pattern (Pattern): the pattern to replace
+        repl (str): the replacement
+
+    Returns:
+        Tuple[str, List[Tuple[str, str]]]:
+            the new text, and the new and old version of each changed line
+
+    Example:
+        >>> from xdev.search_replace import _sub_lines
+        >>> text = 'foo\nbar\nbaz foo\n\nfoo bar'
+        >>> for regexpr in ['foo', '^foo', 'o$', 'a.', r'\s$', 'x*', r'(?<=z )foo', r'o\n']:
+        >>>     pattern = Pattern.coerce(regexpr, hint='regex')
+        >>>     lines = text.splitlines(True)
+        >>>     new_lines = [pattern.sub('_', line) for line in lines]
+        >>>     expected = [(new, old) for new, old in zip(new_lines, lines) if new != old]
+        >>>     assert _sub_lines(text, pattern, '_') == (''.join(new_lines), expected)
+        >>> print(_sub_lines(text, Pattern.coerce('bar', 'strict'), 'qux'))
+        ('foo\nqux\nbaz foo\n\nfoo qux', [('qux\n', 'bar\n'), ('foo qux', 'foo bar')])
+    """
+    found = _search_lines(text, pattern, keepends=True)
+    changed_lines = []
+    for _, line in found:
+        new_line = pattern.sub(repl, line)
+        if new_line != line:
+            changed_lines.append((new_line, line))
+    if not changed_lines:
+        return text, []
+    if pattern.backend == 'strict' and pattern.pattern and '\n' not in pattern.pattern:
+        new_text = text.replace(pattern.pattern, repl)
+    else:
+        regex = _sub_regex(pattern)
+        if regex is not None:
+            new_text = regex.sub(repl, text)
+        else:
+            new_text = _sub_each_line(text, pattern, repl, found)
+    return new_text, changed_lines
+
+
+def _sub_each_line(text, pattern, repl, found):
+    """
+    Replace the pattern on the found lines of a text, keeping their line
+    endings so the pattern sees the same lines as from ``readlines``.
+    """
+    lines = text.split('\n')
+    parts = [line + '\n' for line in lines[:-1]]
+    parts.append(lines[-1])
+    for lx, _ in found:
+        parts[lx] = pattern.sub(repl, parts[lx])
+    return ''.join(parts)
+
+
+def _parse_regex(regex):
+    """
+    Parse a compiled regex with the parser of :mod:`re`, or return None if it
+    cannot be parsed.
+    """
+    try:
+        return sre_parse.parse(regex.pattern, regex.flags)
+    except Exception:
+        return None
+
+
+def _sub_regex(pattern):
+    r"""
+    Get a regex whose substitutions on a whole buffer are the same as on each
+    line of it.
+
+    This holds if no match of the regex can contain a newline or depend on
+    the text after it, and matches cannot be empty (otherwise an empty match
+    at the end of one line and the start of the next would only be replaced
+    once). Returns None if that cannot be shown from the parsed regex.
+
+    Args:
+        pattern (Pattern): the pattern
+
+    Returns:
+        re.Pattern | None
+
+    Example:
+        >>> from xdev.search_replace import _sub_regex
+        >>> assert _sub_regex(Pattern.coerce(r'^def (\w+)$', 'regex')) is not None
+        >>> assert _sub_regex(Pattern.coerce(r'(?<!a)[b-z]+\.', 'regex')) is not None
+        >>> for regexpr in [r'\s', r'[^a]', r'[\t-\r]', r'(?s).', 'a|\n', 'x*', r'a\Z']:
+        >>>     assert _sub_regex(Pattern.coerce(regexpr, 'regex')) is None
+    """
+    if pattern.backend != 'regex':
+        return None
+    regex = pattern.pattern
+    if not isinstance(regex.pattern, str):
+        return None
+    parsed = _parse_regex(regex)
+    if parsed is None:
+        return None
+    if parsed.getwidth()[0] == 0:
+        return None
+    if _crosses_lines(parsed, parsed.state.flags):
+        return None
+    return re.compile(regex.pattern, regex.flags | re.MULTILINE)
+
+
+def _crosses_lines(items, flags):
+    """
+    Check if parsed regex items could match a newline, or use anchors that
+    depend on the whole string.
+    """
+    newline = ord('\n')
+    repeat_ops = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT,
+                  getattr(sre_parse, 'POSSESSIVE_REPEAT', None)}
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            if av == newline:
+                return True
+        elif op is sre_parse.NOT_LITERAL:
+            if av != newline:
+                return True
+        elif op is sre_parse.ANY:
+            if flags & re.DOTALL:
+                return True
+        elif op is sre_parse.IN:
+            if _set_has_newline(av):
+                return True
+        elif op is sre_parse.AT:
+            if av in {sre_parse.AT_BEGINNING_STRING, sre_parse.AT_END_STRING}:
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            if _crosses_lines(sub, (flags | add_flags) & ~del_flags):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(_crosses_lines(sub, flags) for sub in av[1]):
+                return True
+        elif op in repeat_ops:
+            if _crosses_lines(av[2], flags):
+                return True
+        elif op in {sre_parse.ASSERT, sre_parse.ASSERT_NOT}:
+            if _crosses_lines(av[1], flags):
+                return True
+        elif op is sre_parse.GROUPREF_EXISTS:
+            if any(_crosses_lines(sub, flags)
+                   for sub in av[1:] if sub is not None):
+                return True
+        elif op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+            if _crosses_lines(av, flags):
+                return True
+        elif op is not sre_parse.GROUPREF:
+            # Unknown syntax
+            return True
+    return False
+
+
+def _set_has_newline(items):
+    """
+    Check if a parsed character set could contain a newline.
+    """
+    newline = ord('\n')
+    newline_categories = {
+        sre_parse.CATEGORY_SPACE, sre_parse.CATEGORY_NOT_WORD,
+        sre_parse.CATEGORY_NOT_DIGIT, sre_parse.CATEGORY_LINEBREAK,
+    }
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            if av == newline:
+                return True
+        elif op is sre_parse.RANGE:
+            if av[0] <= newline <= av[1]:
+                return True
+        elif op is sre_parse.CATEGORY:
+            if av in newline_categories:
+                return True
+        else:
+            # Negated sets and other syntax
+            return True
+    return False
+
+
+# Regex syntax that behaves differently in a buffer than in a single line
+_LINE_UNSAFE_REGEX = re.compile(r'\\[AZz]|\(\?<[=!]')
+# Regex syntax that can match at the end of a string but not before more text
+_END_SENSITIVE_REGEX = re.compile(r'\$|\(\?[=!]|\\B')
+# Regex syntax that can match non-ASCII characters
+_NON_ASCII_ATOMS_REGEX = re.compile(r'\\[wWdDsSbBuUNx0-7]|\.|\[\^')
+# Line boundaries other than "\n" that str.splitlines splits on
+_OTHER_LINE_BREAKS_REGEX = re.compile('[\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
 
 
 def _create_test_filesystem():
@@ -3,9 +3,10 @@ from os import PathLike
 from typing import Tuple
 import ubelt as ub
 from _typeshed import Incomplete
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 from typing import Any
 from xdev.patterns import MultiPattern, Pattern, RE_Pattern as RE_Pattern
+from xdev.util_trigram import TrigramIndex
 
 
 class GrepResult(ub.NiceRepr):
@@ -42,17 +43,73 @@ def sed(regexpr: str | Pattern,
         dirblocklist: str | List[str] | MultiPattern | None = None,
         recursive: bool = True,
         dry: bool = False,
-        verbose: int = 1) -> None:
+        verbose: int = 1,
+        respect_gitignore: bool = False,
+        max_workers: int = 0,
+        mode: str = 'thread',
+        all_or_nothing: bool = False,
+        prefetch: int = 0) -> List[SedResult]:
     ...
 
 
+def apply_sed_results(sed_results: List[SedResult],
+                      all_or_nothing: bool = False,
+                      verbose: int = 1) -> None:
+    ...
+
+
+class SedResult(ub.NiceRepr):
+    fpath: str | PathLike
+    old_text: str | None
+    new_text: str | None
+    changed_lines: List[Tuple[str, str]]
+    stat_key: Tuple[int, int]
+
+    def __init__(self, fpath, old_text, new_text, changed_lines,
+                 stat_key) -> None:
+        ...
+
+    def __nice__(self):
+        ...
+
+    def __len__(self):
+        ...
+
+    def format_diff(self, colored: bool = True) -> str:
+        ...
+
+    def write(self) -> None:
+        ...
+
+
 def grep(regexpr: str | Pattern,
          dpath: str | None = None,
          include: str | List[str] | MultiPattern | None = None,
          exclude: str | List[str] | MultiPattern | None = None,
          recursive: bool = True,
          dirblocklist: str | List[str] | MultiPattern | None = None,
-         verbose: int = 1) -> List[GrepResult]:
+         verbose: int = 1,
+         respect_gitignore: bool = False,
+         max_workers: int = 0,
+         mode: str = 'thread',
+         index: bool | str | PathLike | TrigramIndex | None = None,
+         prefetch: int = 0) -> List[GrepResult]:
+    ...
+
+
+def iter_grep(regexpr: str | Pattern,
+              dpath: str | None = None,
+              include: str | List[str] | MultiPattern | None = None,
+              exclude: str | List[str] | MultiPattern | None = None,
+              recursive: bool = True,
+              dirblocklist: str | List[str] | MultiPattern | None = None,
+              respect_gitignore: bool = False,
+              max_workers: int = 0,
+              mode: str = 'thread',
+              chunksize: int = 16,
+              index: bool | str | PathLike | TrigramIndex | None = None,
+              verbose: int = 0,
+              prefetch: int = 0) -> Generator[GrepResult, None, None]:
     ...
 
 
@@ -63,7 +120,22 @@ def find(pattern: str | Pattern | None = None,
          dirblocklist: str | List[str] | MultiPattern | None = None,
          type: str | List[str] | None = None,
          recursive: bool = ...,
-         followlinks: bool = False) -> Generator[Any, None, Any]:
+         followlinks: bool = False,
+         respect_gitignore: bool = False,
+         prefetch: int = 0) -> Generator[Any, None, Any]:
+    ...
+
+
+def afind(pattern: str | Pattern | None = None,
+          dpath: str | Pattern | None = None,
+          include: str | List[str] | MultiPattern | None = None,
+          exclude: str | List[str] | MultiPattern | None = None,
+          dirblocklist: str | List[str] | MultiPattern | None = None,
+          type: str | List[str] | None = None,
+          recursive: bool = True,
+          followlinks: bool = False,
+          respect_gitignore: bool = False,
+          prefetch: int = 8) -> AsyncGenerator[str, None]:
     ...
 
 
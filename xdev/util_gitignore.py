@@ -0,0 +1,307 @@
+r"""
+Matching of paths against ``.gitignore`` files for directory walkers.
+
+The rules of each ``.gitignore`` are compiled into a few regular expressions
+(one per run of rules with the same sign), and a :class:`GitignoreMatcher`
+holds the compiled rules that apply to a single directory. Walkers ask the
+matcher of a directory which of its entries are ignored, and only derive a
+new matcher for a subdirectory that is actually descended into, so ignored
+subtrees are never listed.
+
+Example:
+    >>> from xdev.util_gitignore import *  # NOQA
+    >>> dpath = ub.Path.appdir('xdev/tests/gitignore').delete().ensuredir()
+    >>> (dpath / '.git').ensuredir()
+    >>> (dpath / '.gitignore').write_text('build/\n*.pyc\n!keep.pyc\n/top.txt\n')
+    >>> (dpath / 'pkg/sub').ensuredir()
+    >>> (dpath / 'pkg/.gitignore').write_text('*.log\nsub/data\n')
+    >>> matcher = GitignoreMatcher.for_directory(dpath)
+    >>> assert matcher.is_ignored('.git', is_dir=True)
+    >>> assert matcher.is_ignored('build', is_dir=True)
+    >>> assert not matcher.is_ignored('build', is_dir=False)
+    >>> assert matcher.is_ignored('a.pyc')
+    >>> assert not matcher.is_ignored('keep.pyc')
+    >>> assert matcher.is_ignored('top.txt')
+    >>> pkg = matcher.descend('pkg')
+    >>> assert pkg.is_ignored('x.log') and pkg.is_ignored('b.pyc')
+    >>> assert not pkg.is_ignored('top.txt')
+    >>> sub = pkg.descend('sub')
+    >>> assert sub.is_ignored('data', is_dir=True)
+    >>> assert not matcher.is_ignored('x.log')
+"""
+import os
+import re
+import ubelt as ub
+
+
+class GitignoreMatcher:
+    """
+    The compiled ``.gitignore`` rules that apply to the entries of one
+    directory.
+
+    Paths are matched relative to the top of the repository (the nearest
+    ancestor with a ``.git`` entry, or the directory the matcher was created
+    for), and the last matching rule wins, like in git. The ``.git``
+    directory itself is always ignored.
+
+    Attributes:
+        dpath (str): the directory this matcher is for
+        top (str): the directory that rules are relative to
+        groups (List[Tuple[bool, re.Pattern]]):
+            runs of rules with the same sign as (negate, regex), in the order
+            they were given.
+    """
+
+    def __init__(self, dpath, top, groups=()):
+        self.dpath = os.fspath(dpath)
+        self.top = os.fspath(top)
+        rel = os.path.relpath(self.dpath, self.top)
+        self._prefix = '' if rel == '.' else rel.replace(os.path.sep, '/') + '/'
+        self.groups = list(groups)
+
+    @classmethod
+    def for_directory(cls, dpath):
+        """
+        Build the matcher for a directory, including the rules of
+        ``.git/info/exclude`` and of every ``.gitignore`` from the top of its
+        repository down to it.
+
+        Args:
+            dpath (str | PathLike): the directory
+
+        Returns:
+            GitignoreMatcher
+        """
+        dpath = os.path.abspath(dpath)
+        top = _find_repo_top(dpath)
+        if top is None:
+            top = dpath
+        groups = []
+        groups += _load_rule_groups(os.path.join(top, '.git', 'info', 'exclude'), '')
+        rel = os.path.relpath(dpath, top)
+        parts = [] if rel == '.' else rel.split(os.path.sep)
+        for idx in range(len(parts) + 1):
+            base = os.path.join(top, *parts[:idx])
+            prefix = ''.join(p + '/' for p in parts[:idx])
+            groups += _load_rule_groups(os.path.join(base, '.gitignore'), prefix)
+        return cls(dpath, top, groups)
+
+    def descend(self, name, has_gitignore=None):
+        """
+        Build the matcher for a subdirectory.
+
+        Args:
+            name (str): the name of the subdirectory
+
+            has_gitignore (bool | None):
+                if the subdirectory contains a ``.gitignore``. If the caller
+                already listed it, this avoids checking the filesystem.
+                If None, it is checked.
+
+        Returns:
+            GitignoreMatcher
+        """
+        child = self.__class__.__new__(self.__class__)
+        child.dpath = os.path.join(self.dpath, name)
+        child.top = self.top
+        child._prefix = self._prefix + name + '/'
+        if has_gitignore is None:
+            has_gitignore = os.path.isfile(os.path.join(child.dpath, '.gitignore'))
+        if has_gitignore:
+            child.groups = self.groups + _load_rule_groups(
+                os.path.join(child.dpath, '.gitignore'), child._prefix)
+        else:
+            # Share the compiled rules with the parent
+            child.groups = self.groups
+        return child
+
+    def is_ignored(self, name, is_dir=False):
+        """
+        Args:
+            name (str): the name of an entry in this directory
+            is_dir (bool): if the entry is a directory
+
+        Returns:
+            bool
+        """
+        if is_dir and name == '.git':
+            return True
+        subject = self._prefix + name + ('/' if is_dir else '')
+        for negate, regex in reversed(self.groups):
+            if regex.match(subject):
+                return not negate
+        return False
+
+    def filter(self, dnames, fnames):
+        """
+        Remove ignored directory and file names in place.
+
+        Args:
+            dnames (List[str]): names of subdirectories
+            fnames (List[str]): names of files
+        """
+        dnames[:] = [d for d in dnames if not self.is_ignored(d, is_dir=True)]
+        if self.groups:
+            fnames[:] = [f for f in fnames if not self.is_ignored(f)]
+
+
+def _find_repo_top(dpath):
+    """
+    Find the nearest ancestor (including dpath) that contains ``.git``.
+    """
+    for path in [dpath, *ub.Path(dpath).parents]:
+        if os.path.exists(os.path.join(path, '.git')):
+            return os.fspath(path)
+    return None
+
+
+@ub.memoize
+def _load_rule_groups_cached(fpath, prefix, mtime_ns):
+    try:
+        with open(fpath, 'r', errors='replace') as file:
+            text = file.read()
+    except OSError:
+        return []
+    return compile_gitignore(text, prefix)
+
+
+def _load_rule_groups(fpath, prefix):
+    """
+    Compile the rules of a gitignore file if it exists. Results are cached
+    until the file changes.
+    """
+    try:
+        mtime_ns = os.stat(fpath).st_mtime_ns
+    except OSError:
+        return []
+    return _load_rule_groups_cached(fpath, prefix, mtime_ns)
+
+
+def compile_gitignore(text, prefix=''):
+    r"""
+    Compile the text of a gitignore file.
+
+    Args:
+        text (str): the content of the file
+
+        prefix (str): the location of the file relative to the paths it will
+            be matched against, with a trailing slash (e.g. "pkg/sub/").
+
+    Returns:
+        List[Tuple[bool, re.Pattern]]:
+            runs of rules with the same sign as (negate, regex). A path (with a
+            trailing slash for directories) is ignored if the last group that
+            matches it is not negated.
+
+    Example:
+        >>> from xdev.util_gitignore import compile_gitignore
+        >>> groups = compile_gitignore('# comment\n*.pyc\n!keep.pyc\ndocs/**/*.html\n')
+        >>> [(negate, bool(regex.match('a/b.pyc'))) for negate, regex in groups]
+        [(False, True), (True, False), (False, False)]
+        >>> assert groups[2][1].match('docs/x/y/z.html')
+        >>> assert groups[2][1].match('docs/z.html')
+        >>> assert not groups[2][1].match('a/docs/z.html')
+    """
+    groups = []
+    current_negate = None
+    current = []
+    for line in text.splitlines():
+        rule = _translate_rule(line)
+        if rule is None:
+            continue
+        negate, body = rule
+        if negate != current_negate and current:
+            groups.append((current_negate, current))
+            current = []
+        current_negate = negate
+        current.append(body)
+    if current:
+        groups.append((current_negate, current))
+    escaped_prefix = re.escape(prefix)
+    return [
+        (negate, re.compile(escaped_prefix + '(?:' + '|'.join(bodies) + ')$', re.DOTALL))
+        for negate, bodies in groups
+    ]
+
+
+def _translate_rule(line):
+    """
+    Translate one line of a gitignore file into (negate, regex body) or None
+    if it is blank or a comment. The body matches a path relative to the
+    gitignore file, with a trailing slash for directories.
+    """
+    if not line or line.startswith('#'):
+        return None
+    # Trailing spaces are ignored unless they are escaped
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    negate = line.startswith('!')
+    if negate:
+        line = line[1:]
+    elif line.startswith(('\\!', '\\#')):
+        line = line[1:]
+    if not line:
+        return None
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    anchored = '/' in line
+    line = line.lstrip('/')
+    body = _glob_to_regex(line)
+    if not anchored:
+        body = '(?:.*/)?' + body
+    # The body must not end on the "/" that marks directories, otherwise a
+    # pattern like "foo/*" would match "foo/" itself.
+    body += '(?<!/)' + ('/' if dir_only else '/?')
+    return negate, body
+
+
+def _glob_to_regex(pat):
+    """
+    Translate a gitignore glob (without leading / trailing slashes) to a
+    regex, where ``*``, ``?`` and character classes do not match "/", and
+    ``**`` matches across directories.
+    """
+    parts = []
+    idx = 0
+    num = len(pat)
+    while idx < num:
+        char = pat[idx]
+        if char == '*':
+            if pat[idx:idx + 2] == '**':
+                after = idx + 2
+                at_start = idx == 0 or pat[idx - 1] == '/'
+                if at_start and after < num and pat[after] == '/':
+                    # "**/" matches zero or more directories
+                    parts.append('(?:.*/)?')
+                    idx = after + 1
+                    continue
+                if at_start and after == num:
+                    # A trailing "/**" matches everything inside
+                    parts.append('.*')
+                    idx = after
+                    continue
+                parts.append('[^/]*')
+                idx = after
+                continue
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[':
+            end = pat.find(']', idx + 2)
+            if end < 0:
+                parts.append(re.escape(char))
+            else:
+                inner = pat[idx + 1:end].replace('\\', '\\\\')
+                if inner[0] in '!^':
+                    inner = '^' + inner[1:]
+                parts.append('(?!/)[' + inner + ']')
+                idx = end
+        elif char == '\\' and idx + 1 < num:
+            idx += 1
+            parts.append(re.escape(pat[idx]))
+        else:
+            parts.append(re.escape(char))
+        idx += 1
+    return ''.join(parts)
@@ -108,11 +108,13 @@ def generate_network_text(
     graph : nx.DiGraph | nx.Graph
         Graph to represent
 
-    with_labels : bool | str
+    with_labels : bool | str | Callable
         If True will use the "label" attribute of a node to display if it
         exists otherwise it will use the node value itself. If given as a
         string, then that attribte name will be used instead of "label".
-        Defaults to True.
+        If given as a function, it is called with each node when its line
+        is generated and must return its label, so labels are only computed
+        for the nodes that are displayed. Defaults to True.
 
     sources : List
         Specifies which nodes to start traversal from. Note: nodes that are not
@@ -212,7 +214,11 @@ def generate_network_text(
         succ = graph.adj
         pred = graph.adj
 
-    if isinstance(with_labels, str):
+    label_func = None
+    if callable(with_labels):
+        label_func = with_labels
+        label_attr = None
+    elif isinstance(with_labels, str):
         label_attr = with_labels
     elif with_labels:
         label_attr = "label"
@@ -303,7 +309,9 @@ def generate_network_text(
                 suffix = ""
                 children = []
             else:
-                if label_attr is not None:
+                if label_func is not None:
+                    label = str(label_func(node))
+                elif label_attr is not None:
                     label = str(graph.nodes[node].get(label_attr, node))
                 else:
                     label = str(node)
@@ -353,7 +361,11 @@ def generate_network_text(
                 # are not handled elsewhere.
                 other_parents = [p for p in pred[node] if p not in handled_parents]
                 if other_parents:
-                    if label_attr is not None:
+                    if label_func is not None:
+                        other_parents_labels = ", ".join(
+                            [str(label_func(p)) for p in other_parents]
+                        )
+                    elif label_attr is not None:
                         other_parents_labels = ", ".join(
                             [
                                 str(graph.nodes[p].get(label_attr, p))
@@ -426,11 +438,13 @@ def write_network_text(
        if a function, then it will be called for each generated line.
        if None, this will default to "sys.stdout.write"
 
-    with_labels : bool | str
+    with_labels : bool | str | Callable
         If True will use the "label" attribute of a node to display if it
         exists otherwise it will use the node value itself. If given as a
         string, then that attribte name will be used instead of "label".
-        Defaults to True.
+        If given as a function, it is called with each node when its line
+        is generated and must return its label, so labels are only computed
+        for the nodes that are displayed. Defaults to True.
 
     sources : List
         Specifies which nodes to start traversal from. Note: nodes that are not
@@ -562,6 +576,18 @@ def write_network_text(
         │   │   └─╼  ...
         │   └─╼  ...
         └─╼  ...
+
+    >>> # Labels can be computed on demand for the displayed nodes only
+    >>> graph = nx.balanced_tree(r=2, h=4, create_using=nx.DiGraph)
+    >>> called = []
+    >>> write_network_text(graph, max_depth=2,
+    >>>                    with_labels=lambda n: called.append(n) or f'node{n}')
+    ╙── node0
+        ├─╼ node1
+        │   └─╼  ...
+        └─╼ node2
+            └─╼  ...
+    >>> assert called == [0, 1, 2]
     """
     if path is None:
         # The path is unspecified, write to stdout
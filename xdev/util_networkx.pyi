@@ -1,6 +1,7 @@
 from _typeshed import Incomplete
 from collections.abc import Generator
 from typing import Any
+from typing import Callable
 
 
 class _AsciiBaseGlyphs:
@@ -51,7 +52,7 @@ class UtfUndirectedGlyphs(_UtfBaseGlyphs):
 
 def generate_network_text(
         graph,
-        with_labels: bool = ...,
+        with_labels: bool | str | Callable = ...,
         sources: Incomplete | None = ...,
         max_depth: Incomplete | None = ...,
         ascii_only: bool = ...,
@@ -61,7 +62,7 @@ def generate_network_text(
 
 def write_network_text(graph,
                        path: Incomplete | None = ...,
-                       with_labels: bool = ...,
+                       with_labels: bool | str | Callable = ...,
                        sources: Incomplete | None = ...,
                        max_depth: Incomplete | None = ...,
                        ascii_only: bool = ...,
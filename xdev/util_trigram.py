@@ -0,0 +1,562 @@
+r"""
+A persistent trigram index that narrows down the files :func:`grep` searches.
+
+Every indexed file is stored with the set of byte trigrams (3-byte
+substrings) in its content, and a pattern is decomposed into a boolean query
+over the trigrams that any matching text must contain, as in codesearch or
+zoekt. Only files that satisfy the query need to be searched. The index is
+updated incrementally, so only files whose mtime or size changed are read
+again.
+
+Trigrams are computed after lowercasing ASCII letters and normalizing "\r\n"
+to "\n", which lets case insensitive patterns use the index too.
+
+Example:
+    >>> from xdev.util_trigram import *  # NOQA
+    >>> dpath = ub.Path.appdir('xdev/tests/trigram_index').delete().ensuredir()
+    >>> (dpath / 'a.py').write_text('def foo_bar():\n    return 1\n')
+    >>> (dpath / 'b.py').write_text('def baz():\n    return 2\n')
+    >>> (dpath / 'c.bin').write_bytes(b'\x00\x01foo_bar')
+    >>> fpaths = sorted(dpath.glob('*'))
+    >>> index = TrigramIndex(dpath / 'index.sqlite')
+    >>> def names(pattern):
+    >>>     found = index.candidates(Pattern.coerce(pattern, 'regex'), fpaths)
+    >>>     return [p.name for p in found]
+    >>> # Binary files are not indexed, so they are always candidates
+    >>> print(names(r'def foo_\w+'))
+    ['a.py', 'c.bin']
+    >>> print(names(r'(?i)RETURN [12]'))
+    ['a.py', 'b.py', 'c.bin']
+    >>> print(names(r'return (3|4)'))
+    ['c.bin']
+    >>> print(names(r'def (foo|baz)\('))
+    ['b.py', 'c.bin']
+    >>> # Changed files are indexed again
+    >>> (dpath / 'b.py').write_text('def foo_qux():\n    pass\n')
+    >>> print(names(r'def foo_\w+'))
+    ['a.py', 'b.py', 'c.bin']
+    >>> index.close()
+"""
+import itertools
+import os
+import re
+import ubelt as ub
+from xdev.patterns import Pattern
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # nocover
+    # Python < 3.11
+    import sre_parse
+
+
+class TrigramIndex:
+    r"""
+    A sqlite database of the trigrams in each file.
+
+    Files are keyed on their path, and an entry is only considered valid if
+    the (mtime, size) of the file are unchanged. Binary files (with a NUL byte
+    in the first 8 KiB), files larger than ``max_file_size``, and files that
+    cannot be read are recorded as not indexed and are always candidates.
+
+    Example:
+        >>> from xdev.util_trigram import *  # NOQA
+        >>> dpath = ub.Path.appdir('xdev/tests/trigram_update').delete().ensuredir()
+        >>> fpath = dpath / 'file.txt'
+        >>> fpath.write_text('hello world\n')
+        >>> index = TrigramIndex(dpath / 'index.sqlite')
+        >>> assert index.update([fpath]) == 1
+        >>> # Unchanged files are not read again
+        >>> assert index.update([fpath]) == 0
+        >>> assert len(index) == 1
+        >>> fpath.delete()
+        >>> index.prune()
+        >>> assert len(index) == 0
+        >>> index.close()
+    """
+    # Increment when the stored trigrams change so old entries are discarded.
+    version = 1
+
+    def __init__(self, fpath=None, max_file_size=16 * 2 ** 20):
+        """
+        Args:
+            fpath (str | PathLike | None):
+                location of the database. Defaults to a file in the xdev
+                application cache directory.
+
+            max_file_size (int):
+                files larger than this many bytes are not indexed.
+        """
+        if fpath is None:
+            dpath = ub.Path.appdir('xdev', 'grep_index').ensuredir()
+            fpath = dpath / 'trigram_index.sqlite'
+        self.fpath = ub.Path(fpath)
+        self.max_file_size = max_file_size
+        self._conn = None
+
+    @classmethod
+    def coerce(cls, data):
+        """
+        Args:
+            data (bool | str | PathLike | TrigramIndex):
+                True for the default location, or a custom location.
+
+        Returns:
+            TrigramIndex
+        """
+        if isinstance(data, cls):
+            return data
+        elif data is True:
+            return cls()
+        else:
+            return cls(data)
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            import sqlite3
+            self.fpath.parent.ensuredir()
+            self._conn = sqlite3.connect(os.fspath(self.fpath))
+            found = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if found != self.version:
+                self._conn.execute('DROP TABLE IF EXISTS files')
+                self._conn.execute('DROP TABLE IF EXISTS postings')
+                self._conn.execute(f'PRAGMA user_version = {self.version:d}')
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE,
+                    mtime_ns INTEGER,
+                    size INTEGER,
+                    indexed INTEGER,
+                    trigrams BLOB
+                )
+                """)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS postings (
+                    trigram INTEGER,
+                    file_id INTEGER,
+                    PRIMARY KEY (trigram, file_id)
+                ) WITHOUT ROWID
+                """)
+        return self._conn
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def update(self, fpaths, verbose=0):
+        """
+        Index the files that are new or changed since they were indexed.
+
+        Args:
+            fpaths (Iterable[str | PathLike]): the files to index
+            verbose (int): verbosity level
+
+        Returns:
+            int: the number of files that were read
+        """
+        _, num_read = self._sync(fpaths, verbose=verbose)
+        return num_read
+
+    def candidates(self, pattern, fpaths, verbose=0):
+        """
+        Update the index and find the files that could contain a match.
+
+        Args:
+            pattern (str | Pattern): the pattern that will be searched for
+            fpaths (Iterable[str | PathLike]): the files to consider
+            verbose (int): verbosity level
+
+        Returns:
+            List[str | PathLike]: the candidate files in the given order
+        """
+        pattern = Pattern.coerce(pattern, hint='regex')
+        fpaths = list(fpaths)
+        entries, _ = self._sync(fpaths, verbose=verbose)
+        query = trigram_query(pattern)
+        if query is None:
+            return fpaths
+        matched = self._evaluate(query, {})
+        candidates = []
+        for fpath in fpaths:
+            file_id, indexed = entries[os.fspath(fpath)]
+            if not indexed or file_id in matched:
+                candidates.append(fpath)
+        if verbose:
+            print('Searching {} / {} files selected by the trigram index'.format(
+                len(candidates), len(fpaths)))
+        return candidates
+
+    def prune(self):
+        """
+        Remove the entries of files that no longer exist.
+        """
+        conn = self.conn
+        rows = conn.execute('SELECT id, path, trigrams FROM files').fetchall()
+        for file_id, path, blob in rows:
+            if not os.path.exists(path):
+                self._remove(file_id, blob)
+        conn.commit()
+
+    def clear(self):
+        self.conn.execute('DELETE FROM files')
+        self.conn.execute('DELETE FROM postings')
+        self.conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _sync(self, fpaths, verbose=0):
+        """
+        Index new and changed files.
+
+        Returns:
+            Tuple[Dict[str, Tuple[int, bool]], int]:
+                the id of each file and if it is indexed, and the number of
+                files that were read.
+        """
+        conn = self.conn
+        paths = list(ub.unique(map(os.fspath, fpaths)))
+        known = {}
+        for chunk in ub.chunks(paths, chunksize=500):
+            query = 'SELECT path, id, mtime_ns, size, indexed, trigrams FROM files WHERE path IN ({})'.format(
+                ','.join(['?'] * len(chunk)))
+            for path, *row in conn.execute(query, chunk):
+                known[path] = row
+
+        entries = {}
+        stale = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Let the search report files that cannot be stat-ed
+                entries[path] = (None, False)
+                continue
+            key = (st.st_mtime_ns, st.st_size)
+            row = known.get(path)
+            if row is not None and (row[1], row[2]) == key:
+                entries[path] = (row[0], bool(row[3]))
+            else:
+                stale.append((path, key, row))
+
+        postings = []
+        prog = ub.ProgIter(stale, desc='indexing trigrams', enabled=verbose > 0)
+        for path, key, row in prog:
+            if row is not None:
+                self._remove(row[0], row[4])
+            trigrams = self._read_trigrams(path, key[1])
+            indexed = trigrams is not None
+            blob = _pack(trigrams) if indexed else None
+            cursor = conn.execute(
+                'INSERT INTO files (path, mtime_ns, size, indexed, trigrams) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (path, key[0], key[1], int(indexed), blob))
+            file_id = cursor.lastrowid
+            if indexed:
+                postings.extend(zip(trigrams, itertools.repeat(file_id)))
+                if len(postings) >= 1_000_000:
+                    self._insert_postings(postings)
+                    postings = []
+            entries[path] = (file_id, indexed)
+        if stale:
+            self._insert_postings(postings)
+            conn.commit()
+        return entries, len(stale)
+
+    def _insert_postings(self, postings):
+        # Inserting in key order is much faster than in file order
+        postings.sort()
+        self.conn.executemany('INSERT INTO postings VALUES (?, ?)', postings)
+
+    def _read_trigrams(self, path, size):
+        """
+        Returns:
+            List[int] | None: None if the file is not indexed
+        """
+        if size > self.max_file_size:
+            return None
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        if b'\x00' in data[:8 * 1024]:
+            return None
+        return file_trigrams(data)
+
+    def _remove(self, file_id, blob):
+        conn = self.conn
+        if blob is not None:
+            conn.executemany(
+                'DELETE FROM postings WHERE trigram = ? AND file_id = ?',
+                [(trigram, file_id) for trigram in _unpack(blob)])
+        conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def _evaluate(self, query, memo):
+        """
+        Find the ids of the indexed files that satisfy a trigram query.
+        """
+        if isinstance(query, int):
+            if query not in memo:
+                rows = self.conn.execute(
+                    'SELECT file_id FROM postings WHERE trigram = ?', (query,))
+                memo[query] = {file_id for file_id, in rows}
+            return memo[query]
+        op, args = query
+        if op == 'and':
+            # Start from the rarest trigrams so the intersection stays small
+            sets = sorted((self._evaluate(arg, memo) for arg in args), key=len)
+            result = set(sets[0])
+            for other in sets[1:]:
+                if not result:
+                    break
+                result &= other
+            return result
+        else:
+            result = set()
+            for arg in args:
+                result |= self._evaluate(arg, memo)
+            return result
+
+
+def file_trigrams(data):
+    r"""
+    Find the distinct trigrams in the content of a file.
+
+    Args:
+        data (bytes): the content
+
+    Returns:
+        List[int]: sorted trigrams, each packed into an integer as three bytes
+
+    Example:
+        >>> from xdev.util_trigram import file_trigrams
+        >>> print([t.to_bytes(3, 'big') for t in file_trigrams(b'ABab\r\n')])
+        [b'ab\n', b'aba', b'bab']
+    """
+    data = data.replace(b'\r\n', b'\n').lower()
+    if len(data) < 3:
+        return []
+    try:
+        import numpy as np
+    except ImportError:
+        return sorted({int.from_bytes(data[idx:idx + 3], 'big')
+                       for idx in range(len(data) - 2)})
+    arr = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    trigrams = (arr[:-2] << 16) | (arr[1:-1] << 8) | arr[2:]
+    return np.unique(trigrams).tolist()
+
+
+def _pack(trigrams):
+    import array
+    return array.array('I', trigrams).tobytes()
+
+
+def _unpack(blob):
+    import array
+    trigrams = array.array('I')
+    trigrams.frombytes(blob)
+    return trigrams.tolist()
+
+
+def trigram_query(pattern):
+    r"""
+    Decompose a pattern into the trigrams that a matching text must contain.
+
+    Literal runs of a regex are combined with alternations, optional parts,
+    and small character classes into sets of exact strings, which become the
+    conjunction of their trigrams. Parts that cannot be described this way
+    (e.g. wildcards and character categories) impose no constraint.
+
+    Args:
+        pattern (Pattern): the pattern
+
+    Returns:
+        None | int | Tuple[str, List]:
+            None if any text could match, a trigram, or an ('and', args) or
+            ('or', args) combination of queries.
+
+    Example:
+        >>> from xdev.util_trigram import trigram_query
+        >>> def show(query):
+        >>>     if query is None or isinstance(query, tuple):
+        >>>         return query if query is None else (query[0], [show(q) for q in query[1]])
+        >>>     return query.to_bytes(3, 'big').decode()
+        >>> print(show(trigram_query(Pattern.coerce(r'def \w+Cache', 'regex'))))
+        ('and', ['def', 'ef ', 'cac', 'ach', 'che'])
+        >>> print(show(trigram_query(Pattern.coerce(r'get_(size|name)', 'regex'))))
+        ('or', [('and', ['get', 'et_', 't_n', '_na', 'nam', 'ame']), ('and', ['get', 'et_', 't_s', '_si', 'siz', 'ize'])])
+        >>> print(show(trigram_query(Pattern.coerce(r'ab[cd]', 'regex'))))
+        ('or', ['abc', 'abd'])
+        >>> print(show(trigram_query(Pattern.coerce(r'a.*b', 'regex'))))
+        None
+    """
+    if pattern.backend == 'strict':
+        return _strings_query({pattern.pattern}, _encoder(pattern.pattern))
+    if pattern.backend != 'regex':
+        return None
+    regex = pattern.pattern
+    try:
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+    except Exception:
+        return None
+    encode = _encoder(regex.pattern)
+    info = _sequence_info(parsed, parsed.state.flags, encode)
+    return _info_query(info, encode)
+
+
+# The maximum number of exact strings tracked for a part of a regex
+_MAX_EXACT = 16
+
+
+def _encoder(source):
+    """
+    Get the function that converts the characters of a pattern to the bytes
+    they match in a file.
+    """
+    if isinstance(source, bytes):
+        return lambda text: text.encode('latin1')
+    else:
+        return lambda text: text.encode('utf8')
+
+
+def _sequence_info(items, flags, encode):
+    """
+    Describe a sequence of parsed regex items as (exact, query), where exact is
+    the set of strings the sequence can match (or None if it is unknown) and
+    query must be satisfied by the text in any case.
+    """
+    queries = []
+    # The exact strings of the items since the last unknown part
+    exact = frozenset([''])
+    is_whole = True
+    for op, av in items:
+        item_exact, item_query = _item_info(op, av, flags, encode)
+        queries.append(item_query)
+        if item_exact is not None and len(exact) * len(item_exact) <= _MAX_EXACT:
+            exact = frozenset(a + b for a in exact for b in item_exact)
+        else:
+            queries.append(_strings_query(exact, encode))
+            exact = frozenset(['']) if item_exact is None else item_exact
+            is_whole = False
+    if is_whole:
+        return exact, _and(queries)
+    return None, _and(queries + [_strings_query(exact, encode)])
+
+
+def _item_info(op, av, flags, encode):
+    unknown = (None, None)
+    if op is sre_parse.LITERAL:
+        return _chars_info([av], flags)
+    elif op is sre_parse.IN:
+        chars = []
+        for set_op, set_av in av:
+            if set_op is sre_parse.LITERAL:
+                chars.append(set_av)
+            elif set_op is sre_parse.RANGE and set_av[1] - set_av[0] < _MAX_EXACT:
+                chars.extend(range(set_av[0], set_av[1] + 1))
+            else:
+                return unknown
+        if len(chars) > _MAX_EXACT:
+            return unknown
+        return _chars_info(chars, flags)
+    elif op is sre_parse.SUBPATTERN:
+        _, add_flags, del_flags, sub = av
+        return _sequence_info(sub, (flags | add_flags) & ~del_flags, encode)
+    elif op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+        return _sequence_info(av, flags, encode)
+    elif op is sre_parse.BRANCH:
+        infos = [_sequence_info(sub, flags, encode) for sub in av[1]]
+        if all(exact is not None for exact, _ in infos):
+            exact = frozenset().union(*(exact for exact, _ in infos))
+            if len(exact) <= _MAX_EXACT:
+                return exact, _or([query for _, query in infos])
+        return None, _or([_info_query(info, encode) for info in infos])
+    elif op in {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT,
+                getattr(sre_parse, 'POSSESSIVE_REPEAT', None)}:
+        min_count, max_count, sub = av
+        info = _sequence_info(sub, flags, encode)
+        if min_count == 0:
+            if max_count == 1 and info[0] is not None and len(info[0]) < _MAX_EXACT:
+                return info[0] | {''}, None
+            return unknown
+        if min_count == max_count == 1:
+            return info
+        return None, _info_query(info, encode)
+    elif op in {sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT}:
+        # Zero width items do not add to the matched text
+        return frozenset(['']), None
+    return unknown
+
+
+def _chars_info(chars, flags):
+    chars = [chr(c) for c in chars]
+    if flags & re.IGNORECASE:
+        # The index only folds the case of ASCII letters, and with unicode
+        # matching "i", "k", and "s" also match some non-ASCII letters.
+        if not all(c.isascii() for c in chars):
+            return None, None
+        if flags & re.UNICODE and any(c.lower() in 'iks' for c in chars):
+            return None, None
+    return frozenset(chars), None
+
+
+def _info_query(info, encode):
+    exact, query = info
+    if exact is None:
+        return query
+    return _and([query, _strings_query(exact, encode)])
+
+
+def _strings_query(strings, encode):
+    """
+    The query that a text contains one of the strings.
+    """
+    queries = []
+    for text in sorted(strings):
+        data = encode(text).replace(b'\r\n', b'\n').lower()
+        if len(data) < 3:
+            return None
+        queries.append(_and([int.from_bytes(data[idx:idx + 3], 'big')
+                             for idx in range(len(data) - 2)]))
+    return _or(queries)
+
+
+def _and(queries):
+    args = []
+    for query in queries:
+        if query is None:
+            continue
+        if isinstance(query, tuple) and query[0] == 'and':
+            args.extend(query[1])
+        else:
+            args.append(query)
+    args = list(ub.unique(args, key=repr))
+    if not args:
+        return None
+    if len(args) == 1:
+        return args[0]
+    return ('and', args)
+
+
+def _or(queries):
+    args = []
+    for query in queries:
+        if query is None:
+            # One of the alternatives imposes no constraint
+            return None
+        if isinstance(query, tuple) and query[0] == 'or':
+            args.extend(query[1])
+        else:
+            args.append(query)
+    args = list(ub.unique(args, key=repr))
+    if not args:
+        return None
+    if len(args) == 1:
+        return args[0]
+    return ('or', args)